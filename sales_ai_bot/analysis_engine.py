@@ -1,5 +1,9 @@
 import pandas as pd
+from perf import instrument
+from chart_data import grid_bins
+from cube import build_cube, query
 
+@instrument()
 def sales_summary(df, cols):
     summary = {}
     rev_col = cols.get('revenue')
@@ -48,47 +52,30 @@ def _monthly(df, date_col, value_col, group_col=None):
     d[date_col] = pd.to_datetime(d[date_col], errors='coerce')
     d = d.dropna(subset=[date_col])
     if group_col:
-        g = d.groupby([pd.Grouper(key=date_col, freq="M"), group_col])[value_col].sum().reset_index()
+        g = d.groupby([pd.Grouper(key=date_col, freq="ME"), group_col])[value_col].sum().reset_index()
     else:
-        g = d.resample("M", on=date_col)[value_col].sum().reset_index()
+        g = d.resample("ME", on=date_col)[value_col].sum().reset_index()
     return g
 
-def product_zone_analysis(df, cols):
-    rev = cols.get("revenue")
-    prod = cols.get("product")
-    date = cols.get("date")
-    mar = cols.get("margin")
-    if not rev or not prod:
-        return pd.DataFrame(columns=["product", "revenue", "growth_pct", "revenue_percentile", "margin_value", "category"])
-    d = df.copy()
-    d[rev] = pd.to_numeric(d[rev], errors="coerce").fillna(0)
-    if mar and mar in d.columns:
-        d[mar] = pd.to_numeric(d[mar], errors="coerce").fillna(0)
-    by_prod = d.groupby(prod)[rev].sum().sort_values(ascending=False)
+def _recent_growth(values):
+    if len(values) < 6:
+        return 0.0
+    recent = float(values.tail(3).mean())
+    prior = float(values.iloc[-6:-3].mean())
+    if prior == 0:
+        return 0.0
+    return (recent - prior) / prior
+
+def _growth_by_group(m, group_col, date_col, value_col):
+    return m.groupby(group_col)[[date_col, value_col]].apply(lambda x: _recent_growth(x.sort_values(date_col)[value_col]))
+
+def _product_zones(by_prod, growth, margin_series=None):
     ranks = by_prod.rank(pct=True, ascending=True)
     rev_pct = (ranks * 100).round(2)
-    growth = pd.Series(0.0, index=by_prod.index)
-    if date:
-        m = _monthly(d, date, rev, prod)
-        def grp_growth(x):
-            x = x.sort_values(date)
-            if len(x) < 6:
-                return 0.0
-            recent = x[rev].tail(3).mean()
-            prior = x[rev].iloc[-6:-3].mean()
-            if prior == 0:
-                return 0.0
-            return (recent - prior) / prior
-        gr = m.groupby(prod).apply(grp_growth)
-        growth = gr.reindex(by_prod.index).fillna(0.0)
-    margin_series = pd.Series([], dtype="float64")
-    if mar and mar in d.columns:
-        margin_series = d.groupby(prod)[mar].sum().reindex(by_prod.index).fillna(0.0)
     categories = []
     for p in by_prod.index:
         hr = rev_pct.loc[p] >= 80.0
         hg = growth.loc[p] > 0.0
-        mg = margin_series.loc[p] if mar and mar in d.columns else None
         if hr and hg:
             c = "Star Products"
         elif hr and not hg:
@@ -98,30 +85,50 @@ def product_zone_analysis(df, cols):
         else:
             c = "Dead Products"
         categories.append(c)
-    out = pd.DataFrame({
+    return pd.DataFrame({
         "product": by_prod.index,
         "revenue": by_prod.values,
         "growth_pct": growth.reindex(by_prod.index).values,
         "revenue_percentile": rev_pct.reindex(by_prod.index).values,
-        "margin_value": margin_series.reindex(by_prod.index).values if mar and mar in d.columns else None,
+        "margin_value": margin_series.reindex(by_prod.index).values if margin_series is not None else None,
         "category": categories
     })
-    return out
 
-def customer_zone_analysis(df, cols):
+@instrument()
+def product_zone_analysis(df, cols):
     rev = cols.get("revenue")
-    cust = cols.get("customer")
+    prod = cols.get("product")
     date = cols.get("date")
+    mar = cols.get("margin")
+    if not rev or not prod:
+        return pd.DataFrame(columns=["product", "revenue", "growth_pct", "revenue_percentile", "margin_value", "category"])
+    d = df.copy()
+    d[rev] = pd.to_numeric(d[rev], errors="coerce").fillna(0)
+    if mar and mar in d.columns:
+        d[mar] = pd.to_numeric(d[mar], errors="coerce").fillna(0)
+    by_prod = d.groupby(prod)[rev].sum().sort_values(ascending=False)
+    growth = pd.Series(0.0, index=by_prod.index)
+    if date:
+        m = _monthly(d, date, rev, prod)
+        growth = _growth_by_group(m, prod, date, rev).reindex(by_prod.index).fillna(0.0)
+    margin_series = None
+    if mar and mar in d.columns:
+        margin_series = d.groupby(prod)[mar].sum().reindex(by_prod.index).fillna(0.0)
+    return _product_zones(by_prod, growth, margin_series)
+
+@instrument()
+def customer_zone_analysis(df, cols, cube=None):
+    rev = cols.get("revenue")
+    cust = cols.get("customer")
     if not rev or not cust:
         return {
             "by_customer": pd.Series([], dtype="float64"),
             "repeat_count": 0,
             "one_time_count": 0
         }
-    d = df.copy()
-    d[rev] = pd.to_numeric(d[rev], errors="coerce").fillna(0)
-    by_customer = d.groupby(cust)[rev].sum().sort_values(ascending=False)
-    counts = d.groupby(cust).size()
+    cube = cube if cube is not None else build_cube(df, cols, ("customer",))
+    by_customer = query(cube, ("customer",)).sort_values(ascending=False).rename_axis(cust).rename(rev)
+    counts = query(cube, ("customer",), metric="rows")
     repeat_count = int((counts > 1).sum())
     one_time_count = int((counts == 1).sum())
     return {
@@ -130,6 +137,7 @@ def customer_zone_analysis(df, cols):
         "one_time_count": one_time_count
     }
 
+@instrument()
 def top5_customer_pct(df, customer_col, revenue_col):
     d = df.copy()
     d[revenue_col] = pd.to_numeric(d[revenue_col], errors="coerce").fillna(0)
@@ -139,7 +147,8 @@ def top5_customer_pct(df, customer_col, revenue_col):
         return 0.0
     return float(by.head(5).sum() / total * 100.0)
 
-def region_zone_analysis(df, cols):
+@instrument()
+def region_zone_analysis(df, cols, cube=None):
     rev = cols.get("revenue")
     reg = cols.get("region")
     date = cols.get("date")
@@ -148,33 +157,24 @@ def region_zone_analysis(df, cols):
             "by_region": pd.Series([], dtype="float64"),
             "growth": pd.Series([], dtype="float64")
         }
-    d = df.copy()
-    d[rev] = pd.to_numeric(d[rev], errors="coerce").fillna(0)
-    by_region = d.groupby(reg)[rev].sum().sort_values(ascending=False)
+    cube = cube if cube is not None else build_cube(df, cols, ("region",))
+    by_region = query(cube, ("region",)).sort_values(ascending=False).rename_axis(reg).rename(rev)
     growth = pd.Series(0.0, index=by_region.index)
     if date:
-        m = _monthly(d, date, rev, reg)
-        def grp_growth(x):
-            x = x.sort_values(date)
-            if len(x) < 6:
-                return 0.0
-            recent = x[rev].tail(3).mean()
-            prior = x[rev].iloc[-6:-3].mean()
-            if prior == 0:
-                return 0.0
-            return (recent - prior) / prior
-        gr = m.groupby(reg).apply(grp_growth)
-        growth = gr.reindex(by_region.index).fillna(0.0)
+        m = query(cube, ("month", "region")).reset_index()
+        if len(m) > 0:
+            growth = _growth_by_group(m, "region", "month", "revenue").reindex(by_region.index).fillna(0.0)
     return {
         "by_region": by_region,
         "growth": growth
     }
 
+@instrument()
 def product_zone_bcg(df, product_col, revenue_col, date_col):
     d = df.copy()
     d[date_col] = pd.to_datetime(d[date_col], errors="coerce")
     d = d.dropna(subset=[date_col])
-    monthly = d.groupby([product_col, pd.Grouper(key=date_col, freq="M")])[revenue_col].sum().reset_index()
+    monthly = d.groupby([product_col, pd.Grouper(key=date_col, freq="ME")])[revenue_col].sum().reset_index()
     gr = monthly.groupby(product_col)[revenue_col].pct_change().groupby(monthly[product_col]).mean().fillna(0)
     revenue = d.groupby(product_col)[revenue_col].sum()
     percentile = revenue.rank(pct=True)
@@ -194,6 +194,7 @@ def product_zone_bcg(df, product_col, revenue_col, date_col):
     out = pd.DataFrame(zones, columns=["Product", "Revenue", "Growth_Rate", "Category"])
     return out
 
+@instrument()
 def seasonality_analysis(df, cols):
     rev = cols.get("revenue")
     date = cols.get("date")
@@ -238,6 +239,7 @@ def seasonality_analysis(df, cols):
         baseline_acc = float(1 - baseline_err.mean()) if len(baseline_err) > 0 else None
     return {"monthly": monthly, "forecast": next_pred, "forecast_accuracy": forecast_accuracy, "forecast_accuracy_mape_last3": mape_last3, "baseline_naive_accuracy": baseline_acc}
 
+@instrument()
 def price_discount_effectiveness(df, cols):
     rev = cols.get("revenue")
     disc = cols.get("discount")
@@ -250,9 +252,10 @@ def price_discount_effectiveness(df, cols):
     if qty and qty in d.columns:
         d[qty] = pd.to_numeric(d[qty], errors="coerce").fillna(0)
     corr = float(d[[disc, rev]].corr().iloc[0, 1])
-    scatter = d[[disc, rev]].rename(columns={disc: "discount", rev: "revenue"})
+    scatter = grid_bins(d[[disc, rev]].rename(columns={disc: "discount", rev: "revenue"}), "discount", "revenue")
     return {"scatter": scatter, "corr": corr}
 
+@instrument()
 def compute_kpis(df, summary, cols):
     rev = cols.get("revenue")
     prod = cols.get("product")
@@ -267,13 +270,7 @@ def compute_kpis(df, summary, cols):
         d = df.copy()
         d[rev] = pd.to_numeric(d[rev], errors="coerce").fillna(0)
         m = _monthly(d, date, rev)
-        if len(m) >= 6:
-            recent = float(m[rev].tail(3).mean())
-            prior = float(m[rev].iloc[-6:-3].mean())
-            growth = ((recent - prior) / prior) if prior != 0 else 0.0
-        else:
-            growth = 0.0
-        kpis["growth_pct"] = growth
+        kpis["growth_pct"] = _recent_growth(m[rev])
     else:
         kpis["growth_pct"] = 0.0
     kpis["top5_products_pct"] = (top5p / total) if total > 0 else 0.0
@@ -282,6 +279,7 @@ def compute_kpis(df, summary, cols):
     kpis["forecast_accuracy"] = None
     return kpis
 
+@instrument()
 def six_month_forecast(df, cols):
     rev = cols.get("revenue")
     date = cols.get("date")
@@ -304,18 +302,19 @@ def six_month_forecast(df, cols):
     out = pd.DataFrame({"month": future_months, "forecast": preds})
     return out
 
-def top_bottom_products(df, cols):
+@instrument()
+def top_bottom_products(df, cols, cube=None):
     rev = cols.get("revenue")
     prod = cols.get("product")
     if not rev or not prod:
         return pd.DataFrame(columns=["product","revenue"]), pd.DataFrame(columns=["product","revenue"])
-    d = df.copy()
-    d[rev] = pd.to_numeric(d[rev], errors="coerce").fillna(0)
-    by = d.groupby(prod)[rev].sum().sort_values(ascending=False)
-    top5 = by.head(5).reset_index().rename(columns={prod:"product", rev:"revenue"})
-    bottom5 = by.tail(5).reset_index().rename(columns={prod:"product", rev:"revenue"})
+    cube = cube if cube is not None else build_cube(df, cols, ("product",))
+    by = query(cube, ("product",)).sort_values(ascending=False)
+    top5 = by.head(5).reset_index()
+    bottom5 = by.tail(5).reset_index()
     return top5, bottom5
 
+@instrument()
 def uplift_plan_for_bottom(bottom_df, cols):
     actions = []
     if len(bottom_df) == 0:
@@ -1,14 +1,24 @@
 import pandas as pd
+from perf import instrument
 
-def auto_segment(df, cols):
+@instrument()
+def auto_segment(df, cols, sketch=None):
     rev = cols.get("revenue")
     if not rev or rev not in df.columns:
         return {}
-    r = pd.to_numeric(df[rev], errors="coerce").fillna(0)
-    q80 = r.quantile(0.8)
-    q40 = r.quantile(0.4)
+    r = df[rev]
+    if not pd.api.types.is_numeric_dtype(r):
+        r = pd.to_numeric(r, errors="coerce")
+    if sketch is not None:
+        q80 = sketch.revenue_quantile(0.8)
+        q40 = sketch.revenue_quantile(0.4)
+    else:
+        r = r.fillna(0)
+        q80 = r.quantile(0.8)
+        q40 = r.quantile(0.4)
+    # missing revenue compares False everywhere, so it lands in Low Value
     return {
         "High Value": df[r >= q80],
         "Mid Value": df[(r < q80) & (r >= q40)],
-        "Low Value": df[r < q40],
+        "Low Value": df[~(r >= q40)],
     }
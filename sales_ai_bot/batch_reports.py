@@ -0,0 +1,147 @@
+import argparse
+import csv
+import html
+import json
+import os
+import re
+import signal
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Monthly multi-client run: python sales_ai_bot/batch_reports.py clients.csv --out-dir out/2024-06
+# The manifest (CSV or JSON list) has one row per client: client, file, and
+# optional brand and logo_path (relative paths resolve against the manifest).
+# Clients share one process pool; each worker handles a single client and then
+# exits, so memory is returned between clients, and --max-memory-mb caps a
+# worker's address space and --timeout its wall-clock time. A failing, killed
+# or crashing client is recorded in the index and the rest carry on.
+BATCH_WORKERS = int(os.getenv("SALES_BOT_BATCH_WORKERS", str(os.cpu_count() or 2)))
+# Seconds a client may run before its worker is killed (0 = no limit).
+BATCH_TIMEOUT = int(os.getenv("SALES_BOT_BATCH_TIMEOUT", "1800"))
+DEFAULT_BRAND = "AI Sales Strategy Bot"
+
+def load_manifest(path):
+    with open(path, newline="") as f:
+        rows = json.load(f) if path.lower().endswith(".json") else list(csv.DictReader(f))
+    base = os.path.dirname(os.path.abspath(path))
+    clients, seen = [], set()
+    for i, row in enumerate(rows, 1):
+        row = {k.strip().lower(): (v.strip() if isinstance(v, str) else v) for k, v in row.items() if k}
+        if not row.get("file"):
+            raise ValueError(f"manifest row {i}: 'file' is required")
+        client = row.get("client") or os.path.splitext(os.path.basename(row["file"]))[0]
+        slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", client).strip("_") or f"client_{i}"
+        if slug in seen:
+            raise ValueError(f"manifest row {i}: duplicate client {client!r}")
+        seen.add(slug)
+        clients.append({
+            "client": client,
+            "slug": slug,
+            "file": os.path.join(base, row["file"]),
+            "brand": row.get("brand") or DEFAULT_BRAND,
+            "logo_path": os.path.join(base, row["logo_path"]) if row.get("logo_path") else None,
+        })
+    return clients
+
+def _limit_worker(max_mb):
+    # Workers run one client each, so per-process limits are per-client limits.
+    if max_mb:
+        import resource
+        limit = int(max_mb) * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+def run_client(client, out_dir, pdf=True, threads=1, appendix=False, history=False, timeout=None):
+    if timeout:
+        # Armed when the client starts, not when the worker is spawned; the
+        # default SIGALRM action kills the process even if it is stuck in C code.
+        signal.alarm(int(timeout))
+    from cli import run_file
+    out = run_file(client["file"], os.path.join(out_dir, client["slug"]), pdf=pdf, brand=client["brand"], threads=threads, logo_path=client["logo_path"], name=client["slug"], appendix=appendix, client=client["client"] if history else None)
+    return dict(out, client=client["client"])
+
+def _crashed(client):
+    return {"client": client["client"], "file": client["file"], "status": "error", "error": "worker process died (memory limit, timeout or crash)", "seconds": None}
+
+def run_batch(clients, out_dir, workers=BATCH_WORKERS, pdf=True, threads=1, max_memory_mb=None, timeout=BATCH_TIMEOUT, appendix=False, history=False, on_result=None):
+    results = {}
+
+    def done(client, out):
+        results[client["slug"]] = out
+        if on_result:
+            on_result(out)
+
+    def pool(n):
+        return ProcessPoolExecutor(max_workers=n, max_tasks_per_child=1, initializer=_limit_worker, initargs=(max_memory_mb,))
+
+    retry = []
+    with pool(max(1, min(workers, len(clients)))) as ex:
+        futures = {ex.submit(run_client, c, out_dir, pdf, threads, appendix, history, timeout): c for c in clients}
+        for fut in as_completed(futures):
+            try:
+                done(futures[fut], fut.result())
+            except BrokenProcessPool:
+                retry.append(futures[fut])
+    # A dead worker breaks every future still pending in its pool; rerun those
+    # clients one at a time so only the one that actually crashes is failed.
+    for c in retry:
+        with pool(1) as ex:
+            try:
+                done(c, ex.submit(run_client, c, out_dir, pdf, threads, appendix, history, timeout).result())
+            except BrokenProcessPool:
+                done(c, _crashed(c))
+    return [results[c["slug"]] for c in clients]
+
+def write_index(out_dir, results, seconds):
+    os.makedirs(out_dir, exist_ok=True)
+    failed = sum(r["status"] != "ok" for r in results)
+    with open(os.path.join(out_dir, "index.json"), "w") as f:
+        json.dump({"clients": results, "failed": failed, "seconds": round(seconds, 3)}, f, indent=2, default=str)
+    rows = []
+    for r in results:
+        links = " ".join(f'<a href="{html.escape(os.path.relpath(p, out_dir))}">{html.escape(k)}</a>' for k, p in (r.get("reports") or {}).items())
+        m = r.get("metrics") or {}
+        revenue = f"{m['total_revenue']:,.2f}" if "total_revenue" in m else ""
+        detail = links if r["status"] == "ok" else html.escape(r.get("error", ""))
+        rows.append(f"<tr><td>{html.escape(str(r['client']))}</td><td>{r['status']}</td><td>{m.get('rows', '')}</td><td>{revenue}</td><td>{r.get('seconds') or ''}</td><td>{detail}</td></tr>")
+    page = (
+        "<!doctype html><meta charset=\"utf-8\"><title>Sales reports</title>"
+        f"<h1>Sales reports</h1><p>{len(results)} clients, {failed} failed, {seconds:.1f}s</p>"
+        "<table border=\"1\" cellpadding=\"4\"><tr><th>Client</th><th>Status</th><th>Rows</th><th>Revenue</th><th>Seconds</th><th>Reports / error</th></tr>"
+        + "".join(rows) + "</table>"
+    )
+    with open(os.path.join(out_dir, "index.html"), "w") as f:
+        f.write(page)
+    return os.path.join(out_dir, "index.html")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate reports for many clients from a manifest.")
+    parser.add_argument("manifest", help="CSV or JSON with client, file, brand, logo_path")
+    parser.add_argument("--out-dir", default="sales_ai_bot/pdf/clients", help="one sub-folder per client plus index.html / index.json")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS, help="clients processed in parallel (default: CPU count)")
+    parser.add_argument("--threads", type=int, default=1, help="analysis stages run concurrently within a client")
+    parser.add_argument("--max-memory-mb", type=int, help="address-space limit per worker process")
+    parser.add_argument("--timeout", type=int, default=BATCH_TIMEOUT, help="seconds before a client's worker is killed (default: SALES_BOT_BATCH_TIMEOUT or 1800; 0 = no limit)")
+    parser.add_argument("--csv-appendix", action="store_true", help="write each client's full product list as CSV next to its PDFs")
+    parser.add_argument("--history", action="store_true", help="record each client's KPIs in the KPI history store")
+    parser.add_argument("--no-pdf", action="store_true", help="metrics only")
+    args = parser.parse_args(argv)
+
+    clients = load_manifest(args.manifest)
+    start = time.perf_counter()
+
+    def report(r):
+        status = "ok" if r["status"] == "ok" else "error"
+        print(f"[{status}] {r['client']}" + ("" if status == "ok" else f": {r['error']}"), file=sys.stderr)
+
+    results = run_batch(clients, args.out_dir, args.workers, not args.no_pdf, args.threads, args.max_memory_mb, args.timeout, args.csv_appendix, args.history, on_result=report)
+    index = write_index(args.out_dir, results, time.perf_counter() - start)
+    failed = sum(r["status"] != "ok" for r in results)
+    print(f"{len(results) - failed}/{len(results)} clients ok -> {index}", file=sys.stderr)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
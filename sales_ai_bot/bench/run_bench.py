@@ -0,0 +1,182 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+import numpy as np
+import pandas as pd
+from synthetic import write_sales_csv, parse_rows
+
+# Per-stage benchmarks: python sales_ai_bot/bench/run_bench.py --rows 100k,1M,10M
+# Results are written as JSON; pass --baseline to flag stages that got slower.
+DEFAULT_ROWS = "100k,1M,10M"
+DATA_DIR = "sales_ai_bot/cache/bench"
+RESULTS_DIR = "sales_ai_bot/bench/results"
+REGRESSION_PCT = 20
+MIN_DELTA_SECONDS = 0.05
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=HERE).stdout.strip() or None
+    except Exception:
+        return None
+
+# Generator settings exposed on the command line (see synthetic.generate_sales).
+SHAPE_FLAGS = {"products": int, "customers": int, "regions": int, "days": int, "skew": float}
+
+def dataset(rows, data_dir=DATA_DIR, seed=42, **shape):
+    # shape: products, customers, regions, days and/or skew overrides; each
+    # combination is cached under its own file name.
+    tag = "".join(f"_{k}{v:g}" for k, v in sorted(shape.items()))
+    path = os.path.join(data_dir, f"sales_{rows}_s{seed}{tag}.csv")
+    if not os.path.exists(path):
+        write_sales_csv(path, rows, seed=seed, **shape)
+    return path
+
+def bench_rows(path, out_dir, repeat=1, stages=None):
+    from data_loader import load_sales_file
+    from profiler import detect_columns
+    from analysis_engine import sales_summary, compute_kpis, product_zone_analysis, customer_zone_analysis, region_zone_analysis, seasonality_analysis
+    from analysis_engine import product_zone_bcg, six_month_forecast, top_bottom_products
+    from strategy_engine import generate_strategy
+    from upgrade.forecasting import forecast_sales
+    from upgrade.churn import churn_model
+    from upgrade.segmentation import customer_segmentation
+    from auto_segmentation import auto_segment
+    from segment_runner import run_segments
+    from data_understanding import analyze_segment
+    from charts import create_charts
+    from final_full_report import build_full_pdf
+    from reports import build_sales_report
+    from pipeline import monthly_revenue, revenue_by
+    from report_model import report_input
+
+    timings = {}
+
+    def timed(name, fn, *args, **kwargs):
+        best, value = None, None
+        runs = repeat if stages is None or name in stages else 0
+        for _ in range(max(runs, 1)):
+            start = time.perf_counter()
+            value = fn(*args, **kwargs)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        if runs:
+            timings[name] = round(best, 4)
+        return value
+
+    def load():
+        with open(path, "rb") as f:
+            return load_sales_file(f)
+
+    df = timed("load_sales_file", load)
+    cols = timed("detect_columns", detect_columns, df)
+    date, rev, cust, prod = cols["date"], cols["revenue"], cols["customer"], cols["product"]
+    summary = timed("sales_summary", sales_summary, df, cols)
+    kpis = timed("compute_kpis", compute_kpis, df, summary, cols)
+    pza = timed("product_zone_analysis", product_zone_analysis, df, cols)
+    cz = timed("customer_zone_analysis", customer_zone_analysis, df, cols)
+    rz = timed("region_zone_analysis", region_zone_analysis, df, cols)
+    season = timed("seasonality_analysis", seasonality_analysis, df, cols)
+    bcg = timed("product_zone_bcg", product_zone_bcg, df, prod, rev, date)
+    forecast = timed("forecast_sales", forecast_sales, df, date, rev, model="linear", val_months=3)
+    churn = timed("churn_model", churn_model, df, cust, date)
+    timed("customer_segmentation", customer_segmentation, df, cust, rev)
+    segments = timed("auto_segment", auto_segment, df, cols)
+    timed("run_segments", run_segments, segments, cols)
+
+    seg_data = {name: analyze_segment(segments[name], cols) for name in list(segments)[:6]}
+    strategies = generate_strategy(summary)
+    monthly = monthly_revenue(df, date, rev).reset_index().rename(columns={date: "date", rev: "revenue"})
+    top = revenue_by(df, prod, rev).sort_values(ascending=False).head(5).reset_index().rename(columns={prod: "product", rev: "revenue"})
+    charts = timed("create_charts", create_charts, monthly, top, out_dir=os.path.join(out_dir, "charts"))
+    report = report_input({
+        "summary": summary, "strategies": strategies, "kpis": kpis, "forecast": forecast, "churn": churn,
+        "product_zones": pza, "bcg": bcg, "customer_zone": cz, "region_zone": rz,
+        "seasonality": season, "six_month_forecast": six_month_forecast(df, cols), "top_bottom_products": top_bottom_products(df, cols),
+        "segment_analysis": seg_data, "charts": charts,
+    })
+    timed("build_full_pdf", build_full_pdf, report, os.path.join(out_dir, "stakeholder.pdf"))
+    timed("build_sales_report", build_sales_report, report, output_dir=out_dir, file_name="sales_report.pdf")
+    timings["total"] = round(sum(timings.values()), 4)
+    return timings
+
+def compare(current, baseline, pct=REGRESSION_PCT, min_delta=MIN_DELTA_SECONDS):
+    flagged = []
+    for rows, stages in current["results"].items():
+        base = baseline.get("results", {}).get(rows, {})
+        for stage, secs in stages.items():
+            old = base.get(stage)
+            if old is None:
+                continue
+            if secs > old * (1 + pct / 100.0) and secs - old > min_delta:
+                flagged.append({"rows": int(rows), "stage": stage, "baseline": old, "current": secs, "change_pct": round((secs / old - 1) * 100, 1) if old else None})
+    return flagged
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark each pipeline stage on synthetic sales data.")
+    parser.add_argument("--rows", default=DEFAULT_ROWS, help="comma-separated sizes, e.g. 100k,1M,10M")
+    parser.add_argument("--stages", help="comma-separated stage names to time (default: all)")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per stage; the fastest is kept")
+    parser.add_argument("--seed", type=int, default=42)
+    for name, kind in SHAPE_FLAGS.items():
+        parser.add_argument(f"--{name}", type=kind, help=f"synthetic data: {name} (default: generator default)")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--out", help=f"results JSON (default: {RESULTS_DIR}/bench_<timestamp>.json)")
+    parser.add_argument("--baseline", help="earlier results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_PCT, help="percent slowdown flagged as a regression")
+    args = parser.parse_args(argv)
+
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    out = args.out or os.path.join(RESULTS_DIR, f"bench_{stamp}.json")
+    stages = set(args.stages.split(",")) if args.stages else None
+    shape = {k: getattr(args, k) for k in SHAPE_FLAGS if getattr(args, k) is not None}
+    report = {
+        "meta": {
+            "timestamp": stamp,
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "data": shape,
+        },
+        "results": {},
+    }
+    for size in args.rows.split(","):
+        rows = parse_rows(size)
+        print(f"== {rows:,} rows", file=sys.stderr)
+        path = dataset(rows, args.data_dir, args.seed, **shape)
+        timings = bench_rows(path, os.path.join(args.data_dir, f"out_{rows}"), args.repeat, stages)
+        report["results"][str(rows)] = timings
+        for stage, secs in timings.items():
+            print(f"  {stage:<24} {secs:10.3f}s", file=sys.stderr)
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        report["regressions"] = compare(report, baseline, args.threshold)
+        for r in report["regressions"]:
+            print(f"REGRESSION {r['rows']:,} rows {r['stage']}: {r['baseline']:.3f}s -> {r['current']:.3f}s (+{r['change_pct']}%)", file=sys.stderr)
+        status = 1 if report["regressions"] else 0
+
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(out)
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
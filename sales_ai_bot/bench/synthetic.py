@@ -0,0 +1,58 @@
+import os
+import numpy as np
+import pandas as pd
+
+# Seeded synthetic sales data. Product and customer popularity follow a Zipf-like
+# power law (skew), order dates carry a yearly seasonal cycle. Large files are
+# written chunk by chunk so 10M+ rows never sit in memory at once.
+REGIONS = ["North", "South", "East", "West", "Central", "North-East", "South-West", "North-West"]
+DISCOUNTS = np.array([0.0, 0.05, 0.1, 0.2])
+DISCOUNT_P = np.array([0.6, 0.2, 0.15, 0.05])
+
+def _power_weights(n, skew):
+    w = 1.0 / np.arange(1, n + 1) ** skew
+    return w / w.sum()
+
+def _labels(prefix, n):
+    width = len(str(n - 1))
+    return np.array([f"{prefix}{i:0{width}d}" for i in range(n)], dtype=object)
+
+def _catalog(products, seed):
+    return np.round(np.random.default_rng(seed).lognormal(4.0, 0.8, products), 2)
+
+def generate_sales(rows, products=500, customers=50_000, regions=8, start="2023-01-01", days=730, skew=1.1, seed=42, chunk=0, first_order=0):
+    rng = np.random.default_rng([seed, chunk])
+    region_names = np.array(REGIONS[:regions] + [f"Region-{i}" for i in range(len(REGIONS), regions)], dtype=object)
+    day = np.arange(days)
+    day_w = 1.0 + 0.3 * np.sin(2 * np.pi * day / 365.0) + 0.2 * day / days
+    day_labels = (pd.Timestamp(start) + pd.to_timedelta(day, unit="D")).strftime("%Y-%m-%d").to_numpy(dtype=object)
+    prod = rng.choice(products, rows, p=_power_weights(products, skew))
+    cust = rng.choice(customers, rows, p=_power_weights(customers, skew))
+    qty = rng.integers(1, 6, rows)
+    price = _catalog(products, seed)[prod]
+    discount = rng.choice(DISCOUNTS, rows, p=DISCOUNT_P)
+    return pd.DataFrame({
+        "bill_no": np.arange(first_order, first_order + rows),
+        "order_date": day_labels[rng.choice(days, rows, p=day_w / day_w.sum())],
+        "customer_id": _labels("C", customers)[cust],
+        "product_name": _labels("P", products)[prod],
+        "region": region_names[rng.integers(0, regions, rows)],
+        "quantity": qty,
+        "unit_price": price,
+        "discount": discount,
+        "revenue": np.round(qty * price * (1 - discount), 2),
+    })
+
+def write_sales_csv(path, rows, chunk_rows=1_000_000, seed=42, **kwargs):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = path + ".part"
+    for i, begin in enumerate(range(0, rows, chunk_rows)):
+        df = generate_sales(min(chunk_rows, rows - begin), seed=seed, chunk=i, first_order=begin, **kwargs)
+        df.to_csv(tmp, mode="w" if i == 0 else "a", header=(i == 0), index=False)
+    os.replace(tmp, path)
+    return path
+
+def parse_rows(text):
+    text = str(text).strip().lower().replace("_", "")
+    scale = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    return int(float(text.rstrip("km")) * scale)
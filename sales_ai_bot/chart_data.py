@@ -0,0 +1,64 @@
+import os
+import numpy as np
+import pandas as pd
+from perf import instrument
+
+# Bounded chart payloads: whatever the row count, Streamlit charts get at most
+# CHART_POINTS line points, SCATTER_BINS² scatter cells and CHART_BARS bars.
+CHART_POINTS = int(os.getenv("SALES_BOT_CHART_POINTS", "1000"))
+CHART_BARS = int(os.getenv("SALES_BOT_CHART_BARS", "20"))
+SCATTER_BINS = int(os.getenv("SALES_BOT_SCATTER_BINS", "40"))
+
+@instrument()
+def grid_bins(df, x, y, bins=SCATTER_BINS, max_points=CHART_POINTS):
+    # 2-D grid aggregate: one point per non-empty cell at the cell centre, with
+    # the row count and a display size scaled to the densest cell.
+    d = df[[x, y]].apply(pd.to_numeric, errors="coerce").dropna()
+    if len(d) <= max_points:
+        return d.assign(count=1, size=20.0).reset_index(drop=True)
+    counts, xe, ye = np.histogram2d(d[x].to_numpy(), d[y].to_numpy(), bins=bins)
+    ix, iy = np.nonzero(counts)
+    n = counts[ix, iy]
+    return pd.DataFrame({
+        x: (xe[ix] + xe[ix + 1]) / 2,
+        y: (ye[iy] + ye[iy + 1]) / 2,
+        "count": n.astype(int),
+        "size": 20 + 380 * np.sqrt(n / n.max()),
+    })
+
+@instrument()
+def lttb(series, n=CHART_POINTS):
+    # Largest-Triangle-Three-Buckets: keeps first/last points and, per bucket,
+    # the point spanning the largest triangle with its neighbours, so peaks
+    # and dips survive the downsampling.
+    s = series.dropna()
+    if n < 3 or len(s) <= n:
+        return s
+    if isinstance(s.index, pd.DatetimeIndex):
+        xs = s.index.asi8.astype(float)
+    elif pd.api.types.is_numeric_dtype(s.index):
+        xs = s.index.to_numpy(dtype=float)
+    else:
+        xs = np.arange(len(s), dtype=float)
+    ys = s.to_numpy(dtype=float)
+    edges = np.floor(np.linspace(1, len(s) - 1, n - 1)).astype(int)
+    keep = [0]
+    a = 0
+    for i in range(n - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt = edges[i + 2] if i + 2 < len(edges) else len(s)
+        avg_x, avg_y = xs[hi:nxt].mean(), ys[hi:nxt].mean()
+        area = np.abs((xs[a] - avg_x) * (ys[lo:hi] - ys[a]) - (xs[a] - xs[lo:hi]) * (avg_y - ys[a]))
+        a = lo + int(area.argmax())
+        keep.append(a)
+    keep.append(len(s) - 1)
+    return s.iloc[keep]
+
+def top_n(series, n=CHART_BARS, other="Other"):
+    s = series.sort_values(ascending=False)
+    if len(s) <= n:
+        return s
+    out = pd.concat([s.iloc[:n - 1], pd.Series({other: s.iloc[n - 1:].sum()})])
+    out.index.name = s.index.name
+    out.name = s.name
+    return out
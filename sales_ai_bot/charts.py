@@ -1,26 +1,119 @@
+import atexit
+import hashlib
+import json
+import multiprocessing as mp
 import os
-import matplotlib
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
+import shutil
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import pandas as pd
+from perf import instrument
 
-def create_charts(monthly_df, product_df, out_dir="reports/charts"):
+# Charts are content-addressed: the file name is a hash of the plotted data
+# plus the chart spec, so unchanged data is never re-rendered and concurrent
+# exports never write to the same path. Rendering uses the Figure API (no
+# pyplot state) on a small process pool; SALES_BOT_CHART_WORKERS=0 renders
+# in-process.
+CHART_CACHE_DIR = os.getenv("SALES_BOT_CHART_CACHE", "sales_ai_bot/cache/charts")
+CHART_WORKERS = int(os.getenv("SALES_BOT_CHART_WORKERS", "2"))
+# PNG is always rendered (the PDF builders embed it); e.g. "svg" adds vector copies.
+CHART_FORMATS = ("png",) + tuple(f.strip() for f in os.getenv("SALES_BOT_CHART_FORMATS", "").split(",") if f.strip() and f.strip() != "png")
+CHART_SPEC_VERSION = 1
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _get_pool():
+    # Worker processes (CLI --workers, batch runner, service) render inline: a
+    # pool owned by a worker keeps it from exiting once its task is done.
+    global _pool
+    if CHART_WORKERS <= 0 or mp.parent_process() is not None:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=CHART_WORKERS, mp_context=mp.get_context("spawn"))
+            atexit.register(_pool.shutdown, wait=True, cancel_futures=True)
+        return _pool
+
+def _reset_pool(pool):
+    # A worker died (e.g. killed for memory); render inline now and start a fresh pool next time.
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def chart_key(df, spec):
+    h = hashlib.sha256(json.dumps(dict(spec, v=CHART_SPEC_VERSION), sort_keys=True).encode("utf-8"))
+    h.update(pd.util.hash_pandas_object(df[[spec["x"], spec["y"]]], index=False).to_numpy().tobytes())
+    return h.hexdigest()[:24]
+
+def render_chart(spec, x, y, paths):
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    fig = Figure(figsize=spec["figsize"])
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    if spec["kind"] == "line":
+        ax.plot(x, y, marker="o")
+    else:
+        ax.bar(x, y)
+        ax.tick_params(axis="x", labelrotation=30)
+    ax.set_title(spec["title"])
+    fig.tight_layout()
+    for fmt, path in paths.items():
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        fig.savefig(tmp, format=fmt)
+        os.replace(tmp, path)
+    return paths
+
+def _place(src, dst):
+    # Per-request copy of a cached artifact; a hard link when the filesystem allows.
+    tmp = f"{dst}.{uuid.uuid4().hex}.tmp"
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
+    return dst
+
+@instrument()
+def render_charts(charts, out_dir=None, formats=CHART_FORMATS, cache_dir=CHART_CACHE_DIR):
+    # charts: {name: (df, spec)} -> {name: {fmt: path}}. Missing artifacts are
+    # rendered in parallel; with out_dir, each chart is also placed there as
+    # <name>.<fmt> so callers get paths of their own.
+    os.makedirs(cache_dir, exist_ok=True)
+    cached, jobs = {}, {}
+    for name, (df, spec) in charts.items():
+        key = chart_key(df, spec)
+        cached[name] = {fmt: os.path.join(cache_dir, f"{key}.{fmt}") for fmt in formats}
+        missing = {fmt: p for fmt, p in cached[name].items() if not os.path.exists(p)}
+        if missing:
+            jobs[name] = (spec, df[spec["x"]].tolist(), df[spec["y"]].astype(float).tolist(), missing)
+    pool = _get_pool() if len(jobs) > 1 else None
+    if pool is not None:
+        try:
+            for f in [pool.submit(render_chart, *args) for args in jobs.values()]:
+                f.result()
+            jobs = {}
+        except BrokenProcessPool:
+            _reset_pool(pool)
+    for args in jobs.values():
+        render_chart(*args)
+    if out_dir is None:
+        return cached
     os.makedirs(out_dir, exist_ok=True)
-    p1 = os.path.join(out_dir, "monthly_trend.png")
-    plt.figure(figsize=(8, 4))
-    plt.plot(monthly_df["date"], monthly_df["revenue"], marker="o")
-    plt.title("Monthly Sales Trend")
-    plt.tight_layout()
-    plt.savefig(p1)
-    plt.close()
-    p2 = os.path.join(out_dir, "top_products.png")
-    plt.figure(figsize=(8, 4))
-    plt.bar(product_df["product"], product_df["revenue"])
-    plt.title("Top Products by Revenue")
-    plt.xticks(rotation=30)
-    plt.tight_layout()
-    plt.savefig(p2)
-    plt.close()
+    return {name: {fmt: _place(p, os.path.join(out_dir, f"{name}.{fmt}")) for fmt, p in paths.items()} for name, paths in cached.items()}
+
+@instrument()
+def create_charts(monthly_df, product_df, out_dir=None):
+    paths = render_charts({
+        "monthly_trend": (monthly_df, {"kind": "line", "x": "date", "y": "revenue", "title": "Monthly Sales Trend", "figsize": [8, 4]}),
+        "top_products": (product_df, {"kind": "bar", "x": "product", "y": "revenue", "title": "Top Products by Revenue", "figsize": [8, 4]}),
+    }, out_dir)
     return {
-        "Monthly Sales Trend": {"path": p1, "df": monthly_df},
-        "Top Products by Revenue": {"path": p2, "df": product_df}
+        "Monthly Sales Trend": {"path": paths["monthly_trend"]["png"], "files": paths["monthly_trend"], "df": monthly_df},
+        "Top Products by Revenue": {"path": paths["top_products"]["png"], "files": paths["top_products"], "df": product_df}
     }
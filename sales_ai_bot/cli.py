@@ -0,0 +1,105 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from functools import partial
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Headless batch runner: python sales_ai_bot/cli.py data/*.csv --workers 4 --out-dir out
+
+def run_file(path, out_dir, pdf=True, brand="AI Sales Strategy Bot", perf_mode=None, threads=None, logo_path=None, name=None, appendix=False, snapshot=False, client=None, date_range=None, regions=None):
+    import perf
+    from pipeline import load_path, prepare, run_pipeline, metrics, DAG_WORKERS
+    from result_cache import fingerprint_file
+    from partitions import partition_meta, window_key
+    threads = threads or DAG_WORKERS
+    start = time.perf_counter()
+    name = name or os.path.splitext(os.path.basename(path))[0]
+    with (perf.collect(memory=perf_mode == "memory") if perf_mode else nullcontext()) as col:
+        try:
+            # A fingerprint also keeps the file as partitioned Parquet, so
+            # later runs and date/region filters skip re-parsing the file.
+            file_key = fingerprint_file(path) if snapshot or client or date_range or regions else None
+            df = load_path(path, file_key, date_range, regions)
+            cols = prepare(df)
+            snap = {"name": os.path.basename(path)} if snapshot else None
+            history = {"client": client, "source": os.path.basename(path)} if client else None
+            key = window_key(file_key, date_range, regions, partition_meta(file_key)) if file_key else None
+            r = run_pipeline(df, cols, dataset_key=key, workers=threads, report={"out_dir": out_dir, "name": name, "brand": brand, "logo_path": logo_path, "appendix": appendix} if pdf else None, snapshot=snap, history=history)
+            out = {"file": path, "status": "ok", "columns": cols, "metrics": metrics(r)}
+            if snapshot:
+                out["snapshot"] = r["snapshot"]
+            if pdf:
+                out["reports"] = r["report"]
+        except Exception as e:
+            out = {"file": path, "status": "error", "error": f"{type(e).__name__}: {e}"}
+    out["seconds"] = round(time.perf_counter() - start, 3)
+    if col is not None:
+        out["spans"] = sorted(col.spans, key=lambda s: s["start_ms"])
+    return out
+
+def write_json(path, payload):
+    text = json.dumps(payload, indent=2, default=str)
+    if path == "-":
+        print(text)
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(text)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the sales analysis pipeline without Streamlit.")
+    parser.add_argument("files", nargs="+", help="CSV or Excel sales files")
+    parser.add_argument("--out-dir", default="sales_ai_bot/pdf/batch", help="where PDF reports are written")
+    parser.add_argument("--workers", type=int, default=1, help="files processed in parallel")
+    parser.add_argument("--threads", type=int, help="independent analysis stages run concurrently per file (default: SALES_BOT_DAG_WORKERS or 4)")
+    parser.add_argument("--metrics-json", help="write per-file metrics to this path ('-' for stdout)")
+    parser.add_argument("--no-pdf", action="store_true", help="skip PDF generation")
+    parser.add_argument("--brand", default="AI Sales Strategy Bot")
+    parser.add_argument("--csv-appendix", action="store_true", help="write the full product list as CSV next to each PDF")
+    parser.add_argument("--snapshot", action="store_true", help="reuse and update the saved analysis snapshot of each file (see snapshots.py)")
+    parser.add_argument("--history-client", help="record each file's KPIs and monthly aggregates under this client in the KPI history store (see history.py)")
+    parser.add_argument("--since", help="only rows from this month or day on (YYYY-MM or YYYY-MM-DD)")
+    parser.add_argument("--until", help="only rows up to and including this month or day")
+    parser.add_argument("--region", action="append", help="only rows in this region (repeatable)")
+    parser.add_argument("--perf-json", help="write per-stage timing spans to this path ('-' for stdout)")
+    parser.add_argument("--perf-memory", action="store_true", help="also record peak memory per stage (slower)")
+    args = parser.parse_args(argv)
+
+    perf_mode = ("memory" if args.perf_memory else "time") if args.perf_json else None
+    date_range = (args.since, args.until) if args.since or args.until else None
+    job = partial(
+        run_file, out_dir=args.out_dir, pdf=not args.no_pdf, brand=args.brand, perf_mode=perf_mode, threads=args.threads,
+        appendix=args.csv_appendix, snapshot=args.snapshot, client=args.history_client, date_range=date_range, regions=args.region,
+    )
+    if args.workers > 1 and len(args.files) > 1:
+        with ProcessPoolExecutor(max_workers=min(args.workers, len(args.files))) as pool:
+            results = list(pool.map(job, args.files))
+    else:
+        results = [job(f) for f in args.files]
+
+    for r in results:
+        if r["status"] == "ok":
+            m = r["metrics"]
+            print(f"[ok] {r['file']}: {m['rows']:,} rows, revenue {m['total_revenue']:,.2f} ({r['seconds']}s)", file=sys.stderr)
+            for path in (r.get("reports") or {}).values():
+                print(f"     {path}", file=sys.stderr)
+            if r.get("snapshot"):
+                snap = r["snapshot"]
+                print(f"     snapshot {snap['id']}: {len(snap['reused'])} stages reused, {len(snap['computed'])} computed", file=sys.stderr)
+        else:
+            print(f"[error] {r['file']}: {r['error']}", file=sys.stderr)
+
+    spans = [{"file": r["file"], "spans": r.pop("spans", [])} for r in results]
+    if args.metrics_json:
+        write_json(args.metrics_json, {"files": results, "failed": sum(r["status"] != "ok" for r in results)})
+    if args.perf_json:
+        write_json(args.perf_json, {"files": spans})
+    return 1 if any(r["status"] != "ok" for r in results) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+import os
+from itertools import combinations
+import numpy as np
+import pandas as pd
+from perf import instrument
+from result_cache import ResultCache
+
+# Drill-down queries over a month x dimension aggregate cube, e.g. the
+# products of one region over a date range:
+#   query(cube, by=("product",), where={"region": "East"}, date_range=("2024-01", "2024-06"))
+# build_cube groups the frame once by month x region x product and rolls that
+# up into month x (each subset of those dimensions) views. Customers are too
+# many to pre-aggregate against, so queries that group or filter on them read
+# the row-level codes kept next to the views. A query is answered from the
+# smallest view holding the dimensions it groups and filters on, and its
+# result is kept in an LRU cache keyed by dataset, mapping and query.
+CUBE_DIMENSIONS = ("region", "product", "customer")
+# Dimensions answered from rows instead of pre-aggregated views.
+ROW_DIMENSIONS = ("customer",)
+QUERY_CACHE_MB = float(os.getenv("SALES_BOT_QUERY_CACHE_MB", "64"))
+# Members listed per drill-down level.
+DRILL_ROWS = int(os.getenv("SALES_BOT_DRILL_ROWS", "20"))
+
+_results = ResultCache(max_mb=QUERY_CACHE_MB)
+
+def _categorical(values):
+    try:
+        return pd.Categorical(values)
+    except TypeError:
+        # unsortable mix of types: categories in order of appearance
+        codes, uniq = pd.factorize(values)
+        return pd.Categorical.from_codes(codes, uniq)
+
+@instrument()
+def build_cube(df, cols, dims=CUBE_DIMENSIONS, key=None):
+    # Metrics: revenue (summed), rows (order lines) and quantity when mapped.
+    # Rows with no date or no dimension value are kept, so totals match the
+    # frame; queries drop them only from the dimensions they group on.
+    # key: stable id of the dataset and mapping (e.g. the pipeline stage key);
+    # query results are cached only for cubes that have one.
+    rev = cols.get("revenue")
+    if not rev:
+        return None
+    keys = {}
+    date = cols.get("date")
+    if date:
+        d = pd.to_datetime(df[date], errors="coerce")
+        codes, uniq = pd.factorize(d.dt.year * 100 + d.dt.month, sort=True)
+        keys["month"] = pd.Categorical.from_codes(codes, [f"{int(v) // 100:04d}-{int(v) % 100:02d}" for v in uniq])
+    else:
+        keys["month"] = pd.Categorical.from_codes(np.full(len(df), -1), [])
+    dims = tuple(dim for dim in dims if cols.get(dim))
+    for dim in dims:
+        keys[dim] = _categorical(df[cols[dim]].to_numpy())
+    data = pd.DataFrame(keys)
+    data["revenue"] = pd.to_numeric(df[rev], errors="coerce").fillna(0).to_numpy()
+    data["rows"] = 1
+    metrics = ["revenue", "rows"]
+    if cols.get("quantity"):
+        data["quantity"] = pd.to_numeric(df[cols["quantity"]], errors="coerce").fillna(0).to_numpy()
+        metrics.append("quantity")
+    grouped = tuple(dim for dim in dims if dim not in ROW_DIMENSIONS)
+    views = {grouped: data.groupby(["month", *grouped], observed=True, dropna=False, sort=False)[metrics].sum().reset_index()}
+    for n in range(len(grouped) - 1, -1, -1):
+        for sub in combinations(grouped, n):
+            src = min((v for k, v in views.items() if set(sub) <= set(k)), key=len)
+            views[sub] = src.groupby(["month", *sub], observed=True, dropna=False, sort=False)[metrics].sum().reset_index()
+    if grouped != dims:
+        # row grain: "rows" is a count here, not a column
+        views[dims] = data.drop(columns="rows")
+    return {"key": key, "dims": dims, "metrics": tuple(metrics), "months": list(keys["month"].categories), "views": views}
+
+def _values(v):
+    return tuple(sorted({str(x) for x in (v if isinstance(v, (list, tuple, set)) else [v])}))
+
+def _plain(index):
+    if isinstance(index, pd.CategoricalIndex):
+        return index.astype(index.categories.dtype)
+    return index
+
+def _query(cube, by, where, start, end, metric):
+    needed = set(by) | set(where)
+    needed.discard("month")
+    view = min((v for k, v in cube["views"].items() if needed <= set(k)), key=len)
+    keep = np.ones(len(view), dtype=bool)
+    if start or end:
+        months = [m for m in cube["months"] if (not start or m >= start) and (not end or m <= end)]
+        keep &= view["month"].isin(months).to_numpy()
+    for dim, values in where.items():
+        cats = view[dim].cat.categories
+        keep &= view[dim].isin(cats[cats.astype(str).isin(values)]).to_numpy()
+    if not keep.all():
+        view = view[keep]
+    counted = metric not in view
+    if not by:
+        return len(view) if counted else view[metric].sum().item()
+    g = view.groupby(list(by), observed=True, sort=True)
+    out = g.size() if counted else g[metric].sum()
+    if isinstance(out.index, pd.MultiIndex):
+        out.index = out.index.set_levels([_plain(level) for level in out.index.levels])
+    else:
+        out.index = _plain(out.index)
+    return out
+
+@instrument()
+def query(cube, by=(), where=None, date_range=None, metric="revenue", top=None):
+    # by: dimensions to group on ("month" and any of the cube's dims);
+    # where: {dimension: value or list of values}; date_range: (start, end)
+    # months, inclusive, either may be None. Returns a Series indexed by `by`
+    # in key order (or its `top` largest values, largest first), or a single
+    # number for by=(). Results are shared through the cache: do not modify.
+    by = (by,) if isinstance(by, str) else tuple(by)
+    where = {dim: _values(v) for dim, v in (where or {}).items()}
+    for dim in (*by, *where):
+        if dim != "month" and dim not in cube["dims"]:
+            raise ValueError(f"Dimension '{dim}' is not in the cube (has: month, {', '.join(cube['dims'])})")
+    if metric not in cube["metrics"]:
+        raise ValueError(f"Metric '{metric}' is not in the cube (has: {', '.join(cube['metrics'])})")
+    start, end = date_range or (None, None)
+    start, end = (str(start)[:7] if start else None), (str(end)[:7] if end else None)
+    key = (cube["key"], by, tuple(sorted(where.items())), start, end, metric, top)
+    out = _results.get(key) if cube["key"] is not None else None
+    if out is None:
+        out = _query(cube, by, where, start, end, metric)
+        if top is not None and by:
+            out = out.sort_values(ascending=False).head(top)
+        if cube["key"] is not None:
+            _results.put(key, out)
+    return out
+
+def cache_stats():
+    return _results.stats()
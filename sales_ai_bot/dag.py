@@ -0,0 +1,229 @@
+import contextvars
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+# Dependency-aware stage runner. Each stage declares the stages it consumes
+# (deps), the column-mapping keys it reads (uses) and any run parameters it
+# depends on (params). A stage's cache key hashes exactly those inputs plus
+# its upstream keys, so remapping e.g. the discount column only invalidates
+# stages that read discount and whatever sits downstream of them.
+DAG_WORKERS = int(os.getenv("SALES_BOT_DAG_WORKERS", "4"))
+_MISSING = object()
+
+class Cancelled(Exception):
+    pass
+
+class Stage:
+    def __init__(self, name, fn, deps=(), uses=(), params=(), cache=True, snapshot=True):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.uses = tuple(uses)
+        self.params = tuple(params)
+        self.cache = cache
+        # False for row-level results that are cheap to rebuild but as large
+        # as the upload; they stay out of on-disk snapshots
+        self.snapshot = snapshot
+
+class StageContext:
+    def __init__(self, df, cols, params, resources, key=None):
+        self.df = df
+        self.cols = cols
+        self.params = params
+        self.resources = resources
+        # the stage's cache key; None when the run has no dataset_key
+        self.key = key
+
+class AnalysisDAG:
+    def __init__(self, stages):
+        self.stages = {}
+        for s in stages:
+            missing = [d for d in s.deps if d not in self.stages]
+            if missing:
+                raise ValueError(f"stage {s.name!r} depends on undefined {missing} (declare dependencies first)")
+            self.stages[s.name] = s
+
+    def upstream(self, targets):
+        order, seen = [], set()
+
+        def visit(name):
+            if name in seen:
+                return
+            seen.add(name)
+            for d in self.stages[name].deps:
+                visit(d)
+            order.append(name)
+        for t in targets:
+            visit(t)
+        return order
+
+    def downstream(self, names):
+        hit = set(names)
+        for s in self.stages.values():
+            if any(d in hit for d in s.deps):
+                hit.add(s.name)
+        return [n for n in self.stages if n in hit]
+
+    def bind(self, df, cols, dataset_key, cache=None, params=None, resources=None):
+        # Stage keys start with dataset_key; without one, results of different
+        # datasets would share cache entries.
+        if cache is not None and dataset_key is None:
+            raise ValueError("a cache needs a dataset_key to key stage results by")
+        return DagRun(self, df, cols, dataset_key, cache, params or {}, resources or {})
+
+class DagRun:
+    def __init__(self, dag, df, cols, dataset_key, cache, params, resources):
+        self.dag = dag
+        self.df = df
+        self.cols = cols
+        self.dataset_key = dataset_key
+        self.cache = cache
+        self.params = params
+        self.resources = resources
+        self.values = {}
+        self.computed = []
+        self.reused = []
+        self._keys = {}
+        self._lock = threading.RLock()
+
+    def _signature(self, uses):
+        sig = {k: self.cols.get(k) for k in uses}
+        # A derived revenue column ("revenue" = quantity * price) changes with its inputs.
+        if "revenue" in uses and self.cols.get("revenue") == "revenue" and self.cols.get("quantity") and self.cols.get("price"):
+            sig["revenue_from"] = [self.cols.get("quantity"), self.cols.get("price")]
+        return sig
+
+    def key(self, name):
+        if name not in self._keys:
+            s = self.dag.stages[name]
+            payload = json.dumps([name, self._signature(s.uses), {p: self.params.get(p) for p in s.params}, [self.key(d) for d in s.deps]], sort_keys=True, default=str)
+            self._keys[name] = (self.dataset_key, "stage", name, hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16])
+        return self._keys[name]
+
+    def _context(self, s):
+        key = self.key(s.name) if self.dataset_key is not None else None
+        return StageContext(self.df, {k: self.cols.get(k) for k in s.uses}, {p: self.params.get(p) for p in s.params}, self.resources, key)
+
+    def _cached(self, name):
+        s = self.dag.stages[name]
+        if self.cache is None or not s.cache:
+            return _MISSING
+        return self.cache.get(self.key(name), _MISSING)
+
+    def _store(self, name, value, computed):
+        with self._lock:
+            self.values[name] = value
+            (self.computed if computed else self.reused).append(name)
+            s = self.dag.stages[name]
+            if computed and self.cache is not None and s.cache:
+                self.cache.put(self.key(name), value)
+        return value
+
+    def _execute(self, name):
+        s = self.dag.stages[name]
+        return s.fn(self._context(s), **{d: self.values[d] for d in s.deps})
+
+    def get(self, name):
+        with self._lock:
+            if name in self.values:
+                return self.values[name]
+        for d in self.dag.stages[name].deps:
+            self.get(d)
+        value = self._cached(name)
+        if value is not _MISSING:
+            return self._store(name, value, False)
+        return self._store(name, self._execute(name), True)
+
+    def run(self, targets=None, workers=DAG_WORKERS, progress=None, cancel=None):
+        order = self.dag.upstream(targets or list(self.dag.stages))
+        pending = []
+        for name in order:
+            if name in self.values:
+                continue
+            value = self._cached(name)
+            if value is not _MISSING:
+                self._store(name, value, False)
+            else:
+                pending.append(name)
+        if workers <= 1:
+            for name in pending:
+                if cancel is not None and cancel.is_set():
+                    raise Cancelled()
+                if progress:
+                    progress(name)
+                self._store(name, self._execute(name), True)
+        else:
+            running = {}
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dag") as pool:
+                while pending or running:
+                    if cancel is not None and cancel.is_set():
+                        # stages already running finish (pool exit waits); nothing new starts
+                        raise Cancelled()
+                    ready = [n for n in pending if all(d in self.values for d in self.dag.stages[n].deps)]
+                    for name in ready:
+                        pending.remove(name)
+                        if progress:
+                            progress(name)
+                        # copy_context so perf spans recorded in workers reach the caller's collector
+                        running[pool.submit(contextvars.copy_context().run, self._execute, name)] = name
+                    done, _ = wait(running, return_when=FIRST_COMPLETED, timeout=None if cancel is None else 0.5)
+                    for fut in done:
+                        self._store(running.pop(fut), fut.result(), True)
+        return {name: self.values[name] for name in order}
+
+class DagJob:
+    # Runs a DagRun's targets on a daemon thread. `slots` (a semaphore) caps how
+    # many jobs compute at once; later jobs wait as "queued". Cancelling stops
+    # before the next stage starts.
+    def __init__(self, run, targets, workers=DAG_WORKERS, slots=None, name="dag-job"):
+        self.run = run
+        self.targets = list(targets)
+        self.stages = run.dag.upstream(self.targets)
+        self.status = "queued"
+        self.started = []
+        self.result = None
+        self.error = None
+        self.submitted = time.time()
+        self.finished = None
+        self.cancelled = threading.Event()
+        self._slots = slots
+        self._thread = threading.Thread(target=self._work, args=(workers,), name=name, daemon=True)
+        self._thread.start()
+
+    def _work(self, workers):
+        if self._slots is not None:
+            while not self._slots.acquire(timeout=0.5):
+                if self.cancelled.is_set():
+                    self.status = "cancelled"
+                    self.finished = time.time()
+                    return
+        try:
+            self.status = "running"
+            self.result = self.run.run(self.targets, workers=workers, progress=self.started.append, cancel=self.cancelled)
+            self.status = "done"
+        except Cancelled:
+            self.status = "cancelled"
+        except Exception as e:
+            self.error = e
+            self.status = "failed"
+        finally:
+            if self._slots is not None:
+                self._slots.release()
+            self.finished = time.time()
+
+    def done(self):
+        return not self._thread.is_alive()
+
+    def progress(self):
+        return sum(n in self.run.values for n in self.stages) / len(self.stages) if self.stages else 1.0
+
+    def stage(self):
+        running = [n for n in self.started if n not in self.run.values]
+        return running[-1] if running else None
+
+    def cancel(self):
+        self.cancelled.set()
@@ -1,4 +1,5 @@
 import streamlit as st
+from chart_data import lttb
 
 def render_dashboard(summary):
     st.metric("Total Revenue", f"{summary['total_revenue']:,.2f}")
@@ -8,3 +9,37 @@ def render_dashboard(summary):
         st.bar_chart(summary["top_customers"])
     if len(summary.get("top_regions", [])) > 0:
         st.bar_chart(summary["top_regions"])
+
+def render_approx_badge(what="approximate"):
+    st.markdown(f'<span class="approx-badge">≈ Approximate: {what}</span>', unsafe_allow_html=True)
+
+def render_provisional(prov, progress):
+    st.markdown(f'<span class="provisional-badge">⏳ Provisional: estimated from a {prov["sample_rows"]:,}-row stratified sample of {prov["rows"]:,} rows; exact figures replace these when the full computation finishes</span>', unsafe_allow_html=True)
+    st.progress(progress, text="Computing on the full dataset…")
+    st.subheader("📈 Sales Insights")
+    st.write(prov["strategies"])
+    st.subheader("📊 Dashboard")
+    render_dashboard(prov["summary"])
+    kpis = prov["kpis"]
+    st.write({
+        "Growth": f"{('+' if kpis['growth_pct']>=0 else '-')}{abs(kpis['growth_pct']*100):,.1f}%",
+        "Top 5 Products %": f"{kpis['top5_products_pct']*100:,.1f}%"
+    })
+    if prov["monthly_revenue"] is not None and len(prov["monthly_revenue"]) > 0:
+        st.line_chart(lttb(prov["monthly_revenue"]))
+
+def render_perf_panel(spans):
+    import json
+    import pandas as pd
+    from perf import summarize
+    with st.expander("⏱️ Performance", expanded=False):
+        if not spans:
+            st.caption("No analysis ran in this rerun — every result came from the cache.")
+            return
+        top = [s for s in spans if s["depth"] == 0]
+        st.caption(f"{len(spans)} spans · {sum(s['wall_ms'] for s in top) / 1000:.2f}s wall · {sum(s['cpu_ms'] for s in top) / 1000:.2f}s CPU in analysis calls this rerun (cached results are not re-measured)")
+        st.dataframe(summarize(spans), hide_index=True)
+        timeline = pd.DataFrame(sorted(spans, key=lambda s: s["start_ms"]))
+        timeline["name"] = ["  " * d + n for d, n in zip(timeline["depth"], timeline["name"])]
+        st.dataframe(timeline.drop(columns=["depth"]), hide_index=True)
+        st.download_button("Download spans (JSON)", json.dumps(spans, indent=2), file_name="perf_spans.json", mime="application/json")
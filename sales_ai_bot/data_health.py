@@ -1,10 +1,20 @@
-def data_health(df, cols):
+from perf import instrument
+
+@instrument()
+def data_health(df, cols, sketch=None):
     issues = []
-    if df is None or len(df) == 0:
+    rows = sketch.rows if sketch is not None else (0 if df is None else len(df))
+    if rows == 0:
         issues.append("Dataset is empty")
         return issues
     rev = cols.get("revenue")
     cust = cols.get("customer")
+    if sketch is not None:
+        if rev and sketch.revenue_missing / rows > 0.1:
+            issues.append("Revenue column has >10% missing values")
+        if cust and sketch.distinct("customer") < 5:
+            issues.append("Very few unique customers")
+        return issues
     if rev and rev in df.columns:
         if df[rev].isna().mean() > 0.1:
             issues.append("Revenue column has >10% missing values")
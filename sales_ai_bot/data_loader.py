@@ -1,6 +1,7 @@
 import pandas as pd
+from perf import instrument
 
-def load_sales_file(file):
+def _read(file):
     if file.name.endswith(".csv"):
         try:
             df = pd.read_csv(file, engine="python")
@@ -12,3 +13,25 @@ def load_sales_file(file):
     df.columns = df.columns.str.lower().str.strip()
     df = df.dropna(how="all")
     return df
+
+@instrument()
+def load_sales_file(file, dataset_key=None, date_range=None, regions=None):
+    # With a dataset_key (the file's fingerprint) the parsed frame is also
+    # kept as a month-partitioned Parquet dataset (see partitions.py); later
+    # loads of the same file read it instead of re-parsing, and date_range /
+    # regions filters open only the partitions they need.
+    if dataset_key is None:
+        return _read(file)
+    from partitions import read_partitioned, write_partitioned, filter_rows
+    df = read_partitioned(dataset_key, date_range, regions)
+    if df is not None:
+        return df
+    df = _read(file)
+    meta = write_partitioned(df, dataset_key)
+    if not (date_range or regions):
+        return df
+    if meta is None:
+        from profiler import detect_columns
+        meta = detect_columns(df)
+    # first load: the whole file is in memory already, so filter it here
+    return filter_rows(df, meta.get("date"), meta.get("region"), date_range, regions)
@@ -3,8 +3,10 @@ from analysis_engine import sales_summary
 from strategy_engine import generate_strategy
 from upgrade.forecasting import forecast_sales
 from upgrade.churn import churn_model
+from perf import instrument
 
-def detect_patterns(df, cols):
+@instrument()
+def detect_patterns(df, cols, sketch=None):
     p = {}
     rev_col = cols.get("revenue")
     cust_col = cols.get("customer")
@@ -18,18 +20,23 @@ def detect_patterns(df, cols):
             top10 = df.groupby(cust_col)[rev_col].sum().sort_values(ascending=False).head(10).sum()
             p["customer_concentration"] = float(top10) / total
     if reg_col and reg_col in df.columns:
-        p["region_count"] = int(df[reg_col].nunique())
+        p["region_count"] = sketch.distinct("region") if sketch is not None else int(df[reg_col].nunique())
     if prod_col and prod_col in df.columns:
-        p["product_count"] = int(df[prod_col].nunique())
+        p["product_count"] = sketch.distinct("product") if sketch is not None else int(df[prod_col].nunique())
     return p
 
-def build_segments(df, cols):
+@instrument()
+def build_segments(df, cols, sketch=None):
     segments = {}
     rev_col = cols.get("revenue")
     if rev_col and rev_col in df.columns:
         r = pd.to_numeric(df[rev_col], errors="coerce").fillna(0)
-        q80 = r.quantile(0.8)
-        q40 = r.quantile(0.4)
+        if sketch is not None:
+            q80 = sketch.revenue_quantile(0.8)
+            q40 = sketch.revenue_quantile(0.4)
+        else:
+            q80 = r.quantile(0.8)
+            q40 = r.quantile(0.4)
         segments["High Value"] = df[r > q80]
         segments["Mid Tier"] = df[(r <= q80) & (r >= q40)]
         segments["Low Value"] = df[r < q40]
@@ -43,6 +50,7 @@ def build_segments(df, cols):
             segments[f"Product: {pc}"] = df[df[prod_col] == pc]
     return segments
 
+@instrument()
 def analyze_segment(sdf, cols):
     s = sales_summary(sdf, cols)
     try:
@@ -1,36 +1,316 @@
-import smtplib
-from email.message import EmailMessage
 import os
+import queue
+import threading
+import time
+import uuid
+from contextlib import contextmanager
 
-def send_report(pdf_path, to_emails, subject="AI Sales Strategy Report", body=None):
-    EMAIL = os.getenv("SMTP_EMAIL")
-    PASSWORD = os.getenv("SMTP_PASSWORD")
-    if not EMAIL or not PASSWORD:
-        raise RuntimeError("SMTP_EMAIL or SMTP_PASSWORD not set in environment")
+# Report delivery: a job is queued and sent by background workers over a small
+# pool of reused SMTP connections. Recipients go out in batches (one SMTP
+# transaction per batch, addresses in the envelope and that batch's To header),
+# throttled to SALES_BOT_SMTP_RATE recipients per second. Temporary failures
+# (4xx replies, dropped connections, timeouts) are retried with exponential
+# backoff; permanent ones (5xx) are not. Every recipient has its own status.
+# The server is configurable, so a local stand-in (e.g. aiosmtpd on port 8025
+# with SMTP_SECURITY=none) can take the place of the real one.
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "465"))
+SMTP_SECURITY = os.getenv("SMTP_SECURITY", "ssl" if SMTP_PORT == 465 else "starttls")  # ssl | starttls | none
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "30"))
+SMTP_POOL = int(os.getenv("SALES_BOT_SMTP_POOL", "2"))
+SMTP_BATCH = int(os.getenv("SALES_BOT_SMTP_BATCH", "50"))
+SMTP_RATE = float(os.getenv("SALES_BOT_SMTP_RATE", "10"))
+SMTP_RETRIES = int(os.getenv("SALES_BOT_SMTP_RETRIES", "4"))
+SMTP_BACKOFF = float(os.getenv("SALES_BOT_SMTP_BACKOFF", "2"))
+# Idle connections older than this are checked with NOOP before reuse.
+SMTP_IDLE_CHECK = 30.0
 
+DEFAULT_BODY = (
+    "Hello,\n\nPlease find attached your AI Sales Strategy Report.\n\n"
+    "This report includes:\n"
+    "- Executive KPIs\n- Product & Customer analysis\n- Sales trends & forecast\n- Actionable recommendations\n\n"
+    "Regards,\nAI Sales Analytics Team\n"
+)
+
+class RateLimiter:
+    # Spaces sends so that at most `rate` recipients go out per second (0 = no limit).
+    def __init__(self, rate):
+        self.rate = rate
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, n=1):
+        if self.rate <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + n / self.rate
+        time.sleep(max(0.0, start - now))
+
+class SMTPPool:
+    # At most `size` open connections; a connection is returned to the pool
+    # after a successful send and dropped after any error.
+    def __init__(self, host=SMTP_HOST, port=SMTP_PORT, security=SMTP_SECURITY, user=None, password=None, size=SMTP_POOL, timeout=SMTP_TIMEOUT):
+        self.host, self.port, self.security = host, port, security
+        self.user, self.password, self.timeout = user, password, timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _connect(self):
+        import smtplib
+        import ssl
+        if self.security == "ssl":
+            conn = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout, context=ssl.create_default_context())
+        else:
+            conn = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.security == "starttls":
+                conn.starttls(context=ssl.create_default_context())
+        if self.password:
+            conn.login(self.user, self.password)
+        return conn
+
+    @staticmethod
+    def _quit(conn):
+        try:
+            conn.quit()
+        except Exception:
+            conn.close()
+
+    def _checkout(self):
+        while True:
+            try:
+                conn, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            if time.monotonic() - last_used < SMTP_IDLE_CHECK:
+                return conn
+            try:
+                if conn.noop()[0] == 250:
+                    return conn
+            except Exception:
+                pass
+            self._quit(conn)
+
+    @contextmanager
+    def connection(self):
+        self._slots.acquire()
+        conn = None
+        try:
+            conn = self._checkout()
+            yield conn
+            self._idle.put((conn, time.monotonic()))
+            conn = None
+        finally:
+            if conn is not None:
+                self._quit(conn)
+            self._slots.release()
+
+    def close(self):
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._quit(conn)
+
+class DeliveryJob:
+    # Status per recipient: queued -> sent | retrying -> ... | failed. The job
+    # is "done" when every recipient was accepted, "partial" when some failed
+    # and "failed" when none got through.
+    def __init__(self, sender, recipients, subject, data):
+        self.id = uuid.uuid4().hex[:12]
+        self.sender = sender
+        self.subject = subject
+        self.data = data
+        self.recipients = {r: {"status": "queued", "attempts": 0, "error": None, "sent_at": None} for r in recipients}
+        self.status = "queued"
+        self.submitted = time.time()
+        self.finished = None
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        if not self.recipients:
+            self._finish()
+
+    def _update(self, results, attempt):
+        # results: {recipient: (status, error)}
+        with self._lock:
+            now = time.time()
+            for r, (status, error) in results.items():
+                self.recipients[r].update(status=status, error=error, attempts=attempt + 1, sent_at=now if status == "sent" else None)
+            if all(s["status"] in ("sent", "failed") for s in self.recipients.values()):
+                self._finish()
+            else:
+                self.status = "sending"
+
+    def _finish(self):
+        sent = sum(s["status"] == "sent" for s in self.recipients.values())
+        self.status = "done" if sent == len(self.recipients) else ("partial" if sent else "failed")
+        self.finished = time.time()
+        self._done.set()
+
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        self._done.wait(timeout)
+        return self
+
+    def counts(self):
+        out = {}
+        for s in self.recipients.values():
+            out[s["status"]] = out.get(s["status"], 0) + 1
+        return out
+
+    def failed(self):
+        return {r: s["error"] for r, s in self.recipients.items() if s["status"] == "failed"}
+
+class Mailer:
+    def __init__(self, sender, host=SMTP_HOST, port=SMTP_PORT, security=SMTP_SECURITY, user=None, password=None,
+                 pool_size=SMTP_POOL, batch_size=SMTP_BATCH, rate=SMTP_RATE, retries=SMTP_RETRIES, backoff=SMTP_BACKOFF, timeout=SMTP_TIMEOUT):
+        self.sender = sender
+        self.batch_size = max(1, batch_size)
+        self.retries = retries
+        self.backoff = backoff
+        self.pool = SMTPPool(host, port, security, user or sender, password, pool_size, timeout)
+        self.limiter = RateLimiter(rate)
+        self._queue = queue.Queue()
+        # backoff timers not yet fired -> the batch they will re-queue
+        self._timers = {}
+        self._lock = threading.Lock()
+        self._closed = False
+        self._workers = [threading.Thread(target=self._work, name=f"smtp-{i}", daemon=True) for i in range(max(1, pool_size))]
+        for t in self._workers:
+            t.start()
+
+    def submit(self, recipients, subject, data):
+        # data: the message as bytes without a To header (see build_message).
+        recipients = list(dict.fromkeys(r.strip() for r in recipients if r and r.strip()))
+        job = DeliveryJob(self.sender, recipients, subject, data)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Mailer is closed")
+            for i in range(0, len(recipients), self.batch_size):
+                self._queue.put((job, recipients[i:i + self.batch_size], 0))
+        return job
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            try:
+                self._send(*item)
+            except Exception as e:
+                job, batch, attempt = item
+                job._update({r: ("failed", f"{type(e).__name__}: {e}") for r in batch}, attempt)
+
+    def _send(self, job, batch, attempt):
+        import smtplib
+        from email.policy import SMTP as SMTP_POLICY
+        self.limiter.acquire(len(batch))
+        data = SMTP_POLICY.fold_binary("To", ", ".join(batch)) + job.data
+        try:
+            with self.pool.connection() as conn:
+                try:
+                    refused = conn.sendmail(job.sender, batch, data)
+                except smtplib.SMTPRecipientsRefused as e:
+                    # every address rejected; the session is still usable
+                    refused = e.recipients
+        except smtplib.SMTPResponseException as e:
+            refused = {r: (e.smtp_code, e.smtp_error) for r in batch}
+        except (smtplib.SMTPException, OSError) as e:
+            # no reply code: connection dropped, timed out or refused
+            refused = {r: (421, str(e) or type(e).__name__) for r in batch}
+        results, retry = {}, []
+        for r in batch:
+            if r not in refused:
+                results[r] = ("sent", None)
+                continue
+            code, msg = refused[r]
+            error = f"{code} {msg.decode(errors='replace') if isinstance(msg, bytes) else msg}"
+            if 400 <= code < 500 and attempt < self.retries:
+                results[r] = ("retrying", error)
+                retry.append(r)
+            else:
+                results[r] = ("failed", error)
+        job._update(results, attempt)
+        if retry:
+            self._schedule((job, retry, attempt + 1), self.backoff * 2 ** attempt)
+
+    def _schedule(self, item, delay):
+        with self._lock:
+            if not self._closed:
+                timer = threading.Timer(delay, lambda: self._retry(timer))
+                timer.daemon = True
+                self._timers[timer] = item
+                timer.start()
+                return
+        self._abandon([item])
+
+    def _retry(self, timer):
+        # queued under the lock so a retry is never put behind close()'s stop markers
+        with self._lock:
+            item = self._timers.pop(timer, None)
+            if item is not None:
+                self._queue.put(item)
+
+    @staticmethod
+    def _abandon(items):
+        for job, batch, attempt in items:
+            job._update({r: ("failed", f"mailer closed before retry (last error: {job.recipients[r]['error']})") for r in batch}, attempt - 1)
+
+    def close(self):
+        # Queued batches are still sent; batches waiting out a backoff are
+        # failed, so every job finishes and wait() returns.
+        with self._lock:
+            self._closed = True
+            pending = list(self._timers.items())
+            self._timers.clear()
+            for _ in self._workers:
+                self._queue.put(None)
+        for timer, _ in pending:
+            timer.cancel()
+        self._abandon([item for _, item in pending])
+        for t in self._workers:
+            t.join()
+        self.pool.close()
+
+def build_message(sender, subject, body, attachments=()):
+    # Serialised once per job and shared by every batch; the per-batch To
+    # header is prepended at send time.
+    from email.message import EmailMessage
+    from email.policy import SMTP as SMTP_POLICY
     msg = EmailMessage()
-    msg["From"] = EMAIL
-    msg["To"] = ", ".join(to_emails)
+    msg["From"] = sender
     msg["Subject"] = subject
-
-    body = body or (
-        "Hello,\n\nPlease find attached your AI Sales Strategy Report.\n\n"
-        "This report includes:\n"
-        "- Executive KPIs\n- Product & Customer analysis\n- Sales trends & forecast\n- Actionable recommendations\n\n"
-        "Regards,\nAI Sales Analytics Team\n"
-    )
     msg.set_content(body)
+    for path in attachments:
+        with open(path, "rb") as f:
+            msg.add_attachment(f.read(), maintype="application", subtype="pdf", filename=os.path.basename(path))
+    return msg.as_bytes(policy=SMTP_POLICY)
+
+_mailer = None
+_mailer_lock = threading.Lock()
 
-    with open(pdf_path, "rb") as f:
-        msg.add_attachment(
-            f.read(),
-            maintype="application",
-            subtype="pdf",
-            filename=os.path.basename(pdf_path),
-        )
+def get_mailer():
+    global _mailer
+    with _mailer_lock:
+        if _mailer is None:
+            sender = os.getenv("SMTP_EMAIL")
+            if not sender:
+                raise RuntimeError("SMTP_EMAIL not set in environment")
+            _mailer = Mailer(sender, password=os.getenv("SMTP_PASSWORD"))
+        return _mailer
 
-    with smtplib.SMTP_SSL("smtp.gmail.com", 465) as server:
-        server.login(EMAIL, PASSWORD)
-        server.send_message(msg)
+def queue_report(pdf_path, to_emails, subject="AI Sales Strategy Report", body=None, mailer=None):
+    mailer = mailer or get_mailer()
+    return mailer.submit(to_emails, subject, build_message(mailer.sender, subject, body or DEFAULT_BODY, [pdf_path]))
 
+def send_report(pdf_path, to_emails, subject="AI Sales Strategy Report", body=None, mailer=None):
+    job = queue_report(pdf_path, to_emails, subject, body, mailer).wait()
+    failed = job.failed()
+    if failed:
+        r, error = next(iter(failed.items()))
+        raise RuntimeError(f"Report not delivered to {len(failed)} of {len(job.recipients)} recipients (e.g. {r}: {error})")
     return True
@@ -1,10 +1,11 @@
 import os
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, PageBreak, Table, TableStyle
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib import colors
 from ai_chart_insights import chart_insight
-SPACE = Spacer(1, 6)
+from perf import instrument
+from report_model import stakeholder_sections, write_appendix
+
+# Rows per LongTable flowable; splitting one huge table across pages costs
+# more than laying out a run of page-sized ones.
+TABLE_CHUNK = 200
 
 def _safe_html(text):
     if text is None:
@@ -14,28 +15,35 @@ def _safe_html(text):
     text = text.replace("\n", "<br/>")
     return text
 
-def build_full_pdf(sections, charts, output_path, brand=None, logo_path=None):
+@instrument()
+def build_full_pdf(report, output_path):
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, PageBreak, Table, LongTable, TableStyle
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib import colors
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
     styles = getSampleStyleSheet()
     story = []
+    brand, logo_path, charts = report.get("brand"), report.get("logo_path"), report.get("charts")
+    appendix = write_appendix(report.get("product_zones"), output_path) if report.get("appendix") else None
 
     if brand:
         story.append(Paragraph(_safe_html(brand), styles["Title"]))
         if logo_path and os.path.exists(logo_path):
             story.append(Image(logo_path, width=120, height=60))
-        story.append(SPACE)
+        story.append(Spacer(1, 6))
 
     def title(txt):
         story.append(Paragraph(f"<b>{_safe_html(txt)}</b>", styles["Title"]))
-        story.append(SPACE)
+        story.append(Spacer(1, 6))
 
     def h(txt):
         story.append(Paragraph(f"<b>{_safe_html(txt)}</b>", styles["Heading2"]))
-        story.append(SPACE)
+        story.append(Spacer(1, 6))
 
     def p(txt):
         story.append(Paragraph(_safe_html(txt), styles["Normal"]))
-        story.append(SPACE)
+        story.append(Spacer(1, 6))
 
     def kpi_cards(kpis):
         data = [
@@ -60,18 +68,47 @@ def build_full_pdf(sections, charts, output_path, brand=None, logo_path=None):
             ("TOPPADDING", (0,0), (-1,-1), 14),
         ]))
         story.append(t)
-        story.append(SPACE)
+        story.append(Spacer(1, 6))
+
+    def table(tbl):
+        header = tbl["columns"]
+        rows = [[r[0], r[1], f"{r[2]:,.0f}"] for r in tbl["rows"]]
+        summary = [[r[0], r[1], f"{r[2]:,.0f}"] for r in tbl["summary"]]
+        chunks = [rows[i:i + TABLE_CHUNK] for i in range(0, len(rows), TABLE_CHUNK)] or [[]]
+        chunks[-1] = chunks[-1] + summary
+        for i, chunk in enumerate(chunks):
+            t = LongTable([header] + chunk, colWidths=[110, 260, 110], repeatRows=1)
+            style = [
+                ("BACKGROUND", (0,0), (-1,0), colors.HexColor("#0a2540")),
+                ("TEXTCOLOR", (0,0), (-1,0), colors.white),
+                ("FONT", (0,0), (-1,0), "Helvetica-Bold"),
+                ("FONTSIZE", (0,0), (-1,-1), 8),
+                ("ALIGN", (2,0), (2,-1), "RIGHT"),
+                ("LINEBELOW", (0,0), (-1,-1), 0.25, colors.lightgrey),
+            ]
+            if i == len(chunks) - 1 and summary:
+                style += [
+                    ("BACKGROUND", (0,-len(summary)), (-1,-1), colors.whitesmoke),
+                    ("FONT", (0,-len(summary)), (-1,-1), "Helvetica-Bold"),
+                ]
+            t.setStyle(TableStyle(style))
+            story.append(t)
+        story.append(Spacer(1, 6))
+        if appendix:
+            p(f"Full product list: {os.path.basename(appendix)}")
 
-    for sec in sections or []:
+    for sec in stakeholder_sections(report):
         if "kpis" in sec:
             kpi_cards(sec["kpis"])
         title(sec.get("title", ""))
         for block in sec.get("text", []):
             p(block)
+        if sec.get("table"):
+            table(sec["table"])
         img_path = sec.get("image")
         if isinstance(img_path, str) and os.path.exists(img_path):
             story.append(Image(img_path, width=440, height=220))
-            story.append(SPACE)
+            story.append(Spacer(1, 6))
         if sec.get("pagebreak"):
             story.append(PageBreak())
 
@@ -82,13 +119,13 @@ def build_full_pdf(sections, charts, output_path, brand=None, logo_path=None):
             img = obj.get("path")
             df_ref = obj.get("df")
             story.append(Paragraph(f"<b>{_safe_html(label)}</b>", styles["Heading2"]))
-            story.append(SPACE)
+            story.append(Spacer(1, 6))
             if isinstance(img, str) and os.path.exists(img):
                 story.append(Image(img, width=440, height=220))
-                story.append(SPACE)
+                story.append(Spacer(1, 6))
             if df_ref is not None:
                 story.append(Paragraph(f"<i>Insight:</i> {_safe_html(chart_insight(label, df_ref))}", styles["Normal"]))
-                story.append(SPACE)
+                story.append(Spacer(1, 6))
             count += 1
             if count % 2 == 0:
                 story.append(PageBreak())
@@ -0,0 +1,217 @@
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from contextlib import closing
+import pandas as pd
+
+# Cross-upload KPI history: python sales_ai_bot/history.py clients | trend CLIENT | compare CLIENT 2024-05 2024-06
+# A local SQLite file with one row per recorded run (client, period = last
+# month in the data, KPIs, churn and forecast figures) and a monthly cube of
+# revenue by dimension (total, region, product, customer). A newer upload
+# replaces the cube months it covers, so monthly refreshes that re-send full
+# history and ones that send a single month both end up with one value per
+# month. Trend and comparison views read only this store.
+HISTORY_DB = os.getenv("SALES_BOT_HISTORY_DB", "sales_ai_bot/history/kpi_history.sqlite")
+# Members kept per dimension and upload; the rest are summed into "(other)".
+HISTORY_MEMBERS = int(os.getenv("SALES_BOT_HISTORY_MEMBERS", "500"))
+KPI_COLUMNS = ("total_revenue", "growth_pct", "top5_products_pct", "top5_customers_pct", "churn_count", "next_month_forecast", "forecast_accuracy")
+CUBE_DIMENSIONS = ("region", "product", "customer")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    client TEXT NOT NULL,
+    period TEXT NOT NULL,
+    dataset_key TEXT,
+    source TEXT,
+    rows INTEGER,
+    first_month TEXT,
+    last_month TEXT,
+    recorded REAL NOT NULL,
+    total_revenue REAL,
+    growth_pct REAL,
+    top5_products_pct REAL,
+    top5_customers_pct REAL,
+    churn_count INTEGER,
+    next_month_forecast REAL,
+    forecast_accuracy REAL
+);
+CREATE INDEX IF NOT EXISTS runs_client_period ON runs (client, period, run_id);
+CREATE UNIQUE INDEX IF NOT EXISTS runs_client_dataset ON runs (client, dataset_key) WHERE dataset_key IS NOT NULL;
+CREATE TABLE IF NOT EXISTS monthly (
+    client TEXT NOT NULL,
+    dimension TEXT NOT NULL,
+    member TEXT NOT NULL,
+    month TEXT NOT NULL,
+    revenue REAL NOT NULL,
+    run_id INTEGER NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE,
+    PRIMARY KEY (client, dimension, member, month)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS monthly_client_dimension_month ON monthly (client, dimension, month);
+"""
+
+def connect(db=HISTORY_DB):
+    if db != ":memory:":
+        os.makedirs(os.path.dirname(os.path.abspath(db)), exist_ok=True)
+    con = sqlite3.connect(db, timeout=30)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("PRAGMA foreign_keys=ON")
+    con.executescript(SCHEMA)
+    return con
+
+def monthly_cube(df, cols, top=HISTORY_MEMBERS):
+    # Long frame: month (YYYY-MM), dimension, member, revenue.
+    date = cols.get("date")
+    if not date:
+        return None
+    month = pd.to_datetime(df[date], errors="coerce").dt.to_period("M")
+    valid = month.notna().to_numpy()
+    d = pd.DataFrame({"month": month[valid], "revenue": pd.to_numeric(df[cols["revenue"]], errors="coerce").fillna(0.0)[valid]})
+    frames = [d.groupby("month")["revenue"].sum().reset_index().assign(dimension="total", member="")]
+    for dim in CUBE_DIMENSIONS:
+        col = cols.get(dim)
+        if not col:
+            continue
+        member = df[col][valid].astype(str)
+        keep = d["revenue"].groupby(member).sum().nlargest(top).index
+        member = member.where(member.isin(keep), "(other)")
+        g = d.groupby([d["month"], member.rename("member")])["revenue"].sum().reset_index()
+        frames.append(g.assign(dimension=dim))
+    out = pd.concat(frames, ignore_index=True)
+    out["month"] = out["month"].astype(str)
+    return out[["month", "dimension", "member", "revenue"]]
+
+def _float(v):
+    return None if v is None or v != v else float(v)
+
+def record_run(client, r, dataset_key=None, source=None, db=HISTORY_DB):
+    # r: pipeline results with kpis, churn_count, forecast, monthly_cube, rows.
+    # Re-recording the same dataset for a client replaces the earlier run.
+    kpis = r["kpis"]
+    fc = r.get("forecast") or {}
+    cube = r.get("monthly_cube")
+    months = sorted(cube["month"].unique()) if cube is not None and len(cube) else []
+    period = months[-1] if months else time.strftime("%Y-%m")
+    row = {
+        "client": client,
+        "period": period,
+        "dataset_key": dataset_key,
+        "source": source,
+        "rows": r.get("rows"),
+        "first_month": months[0] if months else None,
+        "last_month": months[-1] if months else None,
+        "recorded": time.time(),
+        "total_revenue": _float(kpis.get("total_revenue")),
+        "growth_pct": _float(kpis.get("growth_pct")),
+        "top5_products_pct": _float(kpis.get("top5_products_pct")),
+        "top5_customers_pct": _float(kpis.get("top5_customers_pct")),
+        "churn_count": r.get("churn_count"),
+        "next_month_forecast": _float(fc.get("next_month_forecast")),
+        "forecast_accuracy": _float(fc.get("forecast_accuracy")),
+    }
+    with closing(connect(db)) as con, con:
+        if dataset_key is not None:
+            # drop the earlier run's cube rows explicitly: its run_id may be
+            # reused by the insert below
+            old = [i for (i,) in con.execute("SELECT run_id FROM runs WHERE client = ? AND dataset_key = ?", (client, dataset_key))]
+            con.executemany("DELETE FROM monthly WHERE run_id = ?", [(i,) for i in old])
+            con.executemany("DELETE FROM runs WHERE run_id = ?", [(i,) for i in old])
+        cur = con.execute(f"INSERT INTO runs ({', '.join(row)}) VALUES ({', '.join('?' * len(row))})", list(row.values()))
+        run_id = cur.lastrowid
+        if months:
+            # the new cube replaces whole months: members that dropped into
+            # "(other)" or were renamed must not keep their old rows
+            con.executemany("DELETE FROM monthly WHERE client = ? AND month = ?", [(client, mo) for mo in months])
+            con.executemany(
+                "INSERT OR REPLACE INTO monthly (client, dimension, member, month, revenue, run_id) VALUES (?, ?, ?, ?, ?, ?)",
+                ((client, d, m, mo, float(v), run_id) for mo, d, m, v in cube.itertuples(index=False)),
+            )
+    return run_id
+
+def clients(db=HISTORY_DB):
+    with closing(connect(db)) as con:
+        return [c for (c,) in con.execute("SELECT DISTINCT client FROM runs ORDER BY client")]
+
+def kpi_history(client, since=None, db=HISTORY_DB):
+    # One row per period: the latest run recorded for it.
+    sql = f"""
+        SELECT period, {', '.join(KPI_COLUMNS)}, rows, source, recorded FROM runs
+        WHERE run_id IN (SELECT MAX(run_id) FROM runs WHERE client = ? AND period >= ? GROUP BY period)
+        ORDER BY period
+    """
+    with closing(connect(db)) as con:
+        return pd.read_sql_query(sql, con, params=(client, since or "")).set_index("period")
+
+def monthly_series(client, dimension="total", members=None, since=None, until=None, db=HISTORY_DB):
+    # month x member revenue from the cube; dimension "total" has a single column.
+    sql = "SELECT month, member, revenue FROM monthly WHERE client = ? AND dimension = ? AND month >= ? AND month <= ?"
+    params = [client, dimension, since or "", until or "9999"]
+    if members:
+        sql += f" AND member IN ({', '.join('?' * len(members))})"
+        params += list(members)
+    with closing(connect(db)) as con:
+        d = pd.read_sql_query(sql, con, params=params)
+    out = d.pivot_table(index="month", columns="member", values="revenue", aggfunc="sum").sort_index()
+    if out.empty:
+        # e.g. only runs of files without a date column
+        return pd.DataFrame(columns=["revenue"]) if dimension == "total" else out
+    if dimension == "total":
+        out.columns = ["revenue"]
+    return out
+
+def top_members(client, dimension, n=10, since=None, db=HISTORY_DB):
+    sql = """
+        SELECT member, SUM(revenue) AS revenue FROM monthly
+        WHERE client = ? AND dimension = ? AND month >= ? AND member != '(other)'
+        GROUP BY member ORDER BY revenue DESC LIMIT ?
+    """
+    with closing(connect(db)) as con:
+        return [m for m, _ in con.execute(sql, (client, dimension, since or "", n))]
+
+def compare_periods(client, before, after, dimension="region", db=HISTORY_DB):
+    # Member revenue in two months with absolute and relative change.
+    sql = """
+        SELECT member,
+               SUM(CASE WHEN month = ? THEN revenue ELSE 0 END) AS before,
+               SUM(CASE WHEN month = ? THEN revenue ELSE 0 END) AS after
+        FROM monthly WHERE client = ? AND dimension = ? AND month IN (?, ?)
+        GROUP BY member
+    """
+    with closing(connect(db)) as con:
+        d = pd.read_sql_query(sql, con, params=(before, after, client, dimension, before, after))
+    d["change"] = d["after"] - d["before"]
+    d["change_pct"] = d["change"] / d["before"].where(d["before"] != 0)
+    return d.set_index("member").sort_values("change")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query the local KPI history store.")
+    parser.add_argument("--db", default=HISTORY_DB)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("clients")
+    trend = sub.add_parser("trend")
+    trend.add_argument("client")
+    trend.add_argument("--since")
+    trend.add_argument("--dimension", default="total", help="monthly revenue by total, region, product or customer")
+    compare = sub.add_parser("compare")
+    compare.add_argument("client")
+    compare.add_argument("before", help="month, e.g. 2024-05")
+    compare.add_argument("after")
+    compare.add_argument("--dimension", default="region")
+    args = parser.parse_args(argv)
+
+    pd.set_option("display.width", 160)
+    if args.cmd == "clients":
+        print("\n".join(clients(args.db)))
+    elif args.cmd == "trend":
+        print(kpi_history(args.client, args.since, args.db).drop(columns=["source", "recorded"]).to_string())
+        print()
+        members = top_members(args.client, args.dimension, since=args.since, db=args.db) if args.dimension != "total" else None
+        print(monthly_series(args.client, args.dimension, members, args.since, db=args.db).to_string(float_format=lambda v: f"{v:,.0f}"))
+    else:
+        print(compare_periods(args.client, args.before, args.after, args.dimension, args.db).to_string(float_format=lambda v: f"{v:,.2f}"))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+# Import-time budget check: python sales_ai_bot/import_budget.py [modules...]
+# Runs the imports in a fresh interpreter under -X importtime, prints the
+# slowest modules and fails if the app's own import time exceeds the budget
+# or a heavy dependency is pulled in before it is actually needed. The
+# dataframe stack every module needs (BASE) is reported but not budgeted: it
+# alone takes ~1 s cold and varies by machine, which no app change can fix.
+# dashboard is left out because it is streamlit, which the server has
+# already loaded before the app module runs.
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP_MODULES = [
+    "data_loader", "profiler", "analysis_engine", "strategy_engine", "ai_insights",
+    "upgrade.forecasting", "upgrade.segmentation", "upgrade.churn", "upgrade.smart_strategy",
+    "charts", "emailer", "final_full_report", "data_health", "pattern_detector", "auto_segmentation",
+    "segment_runner", "sketches", "sql_backend", "result_cache", "snapshots", "history", "partitions", "cube", "pipeline", "ai_reasoning", "data_understanding",
+]
+HEAVY = ("sklearn", "scipy", "matplotlib", "reportlab", "fpdf", "smtplib", "prophet", "duckdb")
+BASE = ("pandas", "numpy", "pyarrow")
+IMPORT_BUDGET_MS = float(os.getenv("SALES_BOT_IMPORT_BUDGET_MS", "400"))
+
+def measure(modules):
+    env = dict(os.environ, PYTHONPATH=HERE + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import " + ", ".join(modules)], capture_output=True, text=True, env=env, cwd=HERE)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cum_us, name = line.split(":", 1)[1].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((int(self_us), int(cum_us), depth, name.strip()))
+    return rows
+
+def breakdown(rows):
+    # -X importtime lists children before their parent; attribute every module
+    # to the top-level import that pulled it in.
+    top, by_package, heavy, pending = [], defaultdict(int), {}, []
+    for self_us, cum_us, depth, name in rows:
+        by_package[name.split(".")[0]] += self_us
+        pending.append(name)
+        if depth == 0:
+            top.append((cum_us, name))
+            for child in pending:
+                if child.split(".")[0] in HEAVY:
+                    heavy.setdefault(child.split(".")[0], name)
+            pending = []
+    return top, by_package, heavy
+
+def base_time(rows):
+    # Self time of every module imported inside a BASE package's subtree. In
+    # reverse the listing is parent-first, so a depth stack gives ancestry.
+    total, stack = 0, []
+    for self_us, _, depth, name in reversed(rows):
+        while stack and stack[-1][0] >= depth:
+            stack.pop()
+        inside = name.split(".")[0] in BASE or bool(stack and stack[-1][1])
+        stack.append((depth, inside))
+        if inside:
+            total += self_us
+    return total
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check cold-start import time of the app modules.")
+    parser.add_argument("modules", nargs="*", default=APP_MODULES)
+    parser.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--allow", nargs="*", default=[], help="heavy packages allowed at import time")
+    args = parser.parse_args(argv)
+
+    rows = measure(args.modules)
+    top, by_package, heavy = breakdown(rows)
+    total_ms = sum(c for c, _ in top) / 1000
+    base_ms = base_time(rows) / 1000
+    app_ms = total_ms - base_ms
+    print(f"{'cumulative ms':>14}  top-level import")
+    for cum_us, name in sorted(top, reverse=True)[:args.top]:
+        print(f"{cum_us / 1000:14.1f}  {name}")
+    print(f"\n{'self ms':>14}  package")
+    for name, self_us in sorted(by_package.items(), key=lambda kv: -kv[1])[:args.top]:
+        print(f"{self_us / 1000:14.1f}  {name}")
+    print(f"\ntotal {total_ms:.1f} ms = {', '.join(BASE)} {base_ms:.1f} ms + app {app_ms:.1f} ms (budget {args.budget_ms:.0f} ms)")
+
+    failed = False
+    for pkg, via in sorted(heavy.items()):
+        if pkg not in args.allow:
+            print(f"FAIL: {pkg} imported at startup (via {via})")
+            failed = True
+    if app_ms > args.budget_ms:
+        print(f"FAIL: app import time {app_ms:.1f} ms exceeds budget {args.budget_ms:.0f} ms")
+        failed = True
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,231 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+import numpy as np
+import pandas as pd
+
+# Month-partitioned Parquet copy of a loaded sales file, one folder per file
+# hash: p_month=YYYY-MM/[p_region=East/]part-0.parquet. Rows keep every
+# original column; p_row restores the file's row order. Loads with a date
+# range or region filter open only the matching partition folders. Rows with
+# no parseable date sit in p_month=(none) and are skipped by date filters.
+PARTITION_DIR = os.getenv("SALES_BOT_PARTITION_DIR", "sales_ai_bot/cache/partitions")
+# Regions become a second partition level when there are at most this many
+# (0 = months only).
+PARTITION_MAX_REGIONS = int(os.getenv("SALES_BOT_PARTITION_MAX_REGIONS", "32"))
+# Datasets unused for longer than this, then the least recently used beyond
+# the size bound, are deleted after each write.
+PARTITION_MAX_MB = float(os.getenv("SALES_BOT_PARTITION_MB", "2048"))
+PARTITION_TTL_DAYS = float(os.getenv("SALES_BOT_PARTITION_TTL_DAYS", "30"))
+NO_VALUE = "(none)"
+WINDOWS = {
+    "All data": None,
+    "Last 3 months": 3,
+    "Last 6 months": 6,
+    "Last 12 months": 12,
+    "This quarter": "q0",
+    "Last quarter": "q1",
+}
+
+def dataset_dir(dataset_key, root=PARTITION_DIR):
+    return os.path.join(root, str(dataset_key))
+
+def partition_meta(dataset_key, root=PARTITION_DIR):
+    try:
+        with open(os.path.join(dataset_dir(dataset_key, root), "_meta.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _schema(by_region):
+    import pyarrow as pa
+    return pa.schema([("p_month", pa.string())] + ([("p_region", pa.string())] if by_region else []))
+
+def _matches(meta, cols):
+    return cols is None or (meta["date"], meta["region"]) == (cols.get("date"), cols.get("region"))
+
+def write_partitioned(df, dataset_key, cols=None, root=PARTITION_DIR):
+    # Returns the partition metadata, or None when the frame cannot be stored
+    # as Parquet (e.g. mixed-type object columns); callers then keep the
+    # in-memory frame only. cols: the confirmed column mapping (detected when
+    # None); a dataset stored under a different date/region column is
+    # re-partitioned.
+    meta = partition_meta(dataset_key, root)
+    if meta is not None and _matches(meta, cols):
+        return meta
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    if cols is None:
+        from profiler import detect_columns
+        cols = detect_columns(df)
+    date, region = cols.get("date"), cols.get("region")
+    # Partition keys as integer codes + labels (strftime on every row is slow);
+    # rows are written grouped by partition so each file is one row group.
+    if date:
+        d = pd.to_datetime(df[date], errors="coerce")
+        month, uniq = pd.factorize(d.dt.year * 100 + d.dt.month)
+        month_labels = [f"{int(v) // 100:04d}-{int(v) % 100:02d}" for v in uniq]
+    else:
+        month, month_labels = np.zeros(len(df), dtype=np.intp) - 1, []
+    by_region = bool(region) and 0 < df[region].nunique(dropna=False) <= PARTITION_MAX_REGIONS
+    if by_region:
+        reg, uniq = pd.factorize(df[region])
+        region_labels = [str(v) for v in uniq]
+        order = np.lexsort((reg, month))
+    else:
+        region_labels = []
+        order = np.argsort(month, kind="stable")
+    keys = {"p_month": np.array(month_labels + [NO_VALUE], dtype=object)[month[order]], "p_row": order}
+    if by_region:
+        keys["p_region"] = np.array(region_labels + [NO_VALUE], dtype=object)[reg[order]]
+    try:
+        table = pa.Table.from_pandas(df.take(order).assign(**keys), preserve_index=False)
+    except (pa.ArrowException, TypeError, ValueError):
+        return None
+    months = sorted(set(month_labels) | ({NO_VALUE} if (month < 0).any() else set()))
+    regions = sorted(set(region_labels) | ({NO_VALUE} if by_region and (reg < 0).any() else set()))
+    final = dataset_dir(dataset_key, root)
+    tmp = f"{final}.tmp-{uuid.uuid4().hex[:8]}"
+    try:
+        ds.write_dataset(
+            table, tmp, format="parquet", basename_template="part-{i}.parquet",
+            partitioning=ds.partitioning(_schema(by_region), flavor="hive"),
+            max_partitions=len(months) * max(1, len(regions)) + 1,
+        )
+        meta = {"date": date, "region": region, "by_region": by_region, "rows": int(len(df)), "months": months, "regions": regions}
+        with open(os.path.join(tmp, "_meta.json"), "w") as f:
+            json.dump(meta, f)
+        if os.path.isdir(final):
+            old = f"{final}.old-{uuid.uuid4().hex[:8]}"
+            os.replace(final, old)
+            shutil.rmtree(old, ignore_errors=True)
+        os.replace(tmp, final)
+    except OSError:
+        # another process stored the same file first
+        shutil.rmtree(tmp, ignore_errors=True)
+        return partition_meta(dataset_key, root)
+    evict(root, keep=dataset_key)
+    return meta
+
+def _size(folder):
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(folder) for f in files)
+
+def evict(root=PARTITION_DIR, keep=None, max_mb=PARTITION_MAX_MB, ttl_days=PARTITION_TTL_DAYS):
+    # Last use is the mtime of _meta.json, which reads refresh.
+    try:
+        names = [n for n in os.listdir(root) if "." not in n and n != str(keep)]
+    except FileNotFoundError:
+        return []
+    entries = []
+    for name in names:
+        folder = os.path.join(root, name)
+        try:
+            entries.append((os.path.getmtime(os.path.join(folder, "_meta.json")), _size(folder), name))
+        except OSError:
+            continue
+    total = sum(size for _, size, _ in entries) + (_size(dataset_dir(keep, root)) if keep is not None else 0)
+    now, removed = time.time(), []
+    for used, size, name in sorted(entries):
+        if now - used <= ttl_days * 86400 and total <= max_mb * 1024 * 1024:
+            break
+        shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+        total -= size
+        removed.append(name)
+    return removed
+
+def _bounds(date_range):
+    start, end = date_range or (None, None)
+    start = str(start)[:10] if start else None
+    end = str(end)[:10] if end else None
+    return start, end
+
+def _dataset(meta, dataset_key, root):
+    import pyarrow.dataset as ds
+    return ds.dataset(dataset_dir(dataset_key, root), format="parquet", partitioning=ds.partitioning(_schema(meta["by_region"]), flavor="hive"))
+
+def _filter(meta, start, end, regions):
+    import pyarrow.dataset as ds
+    expr = None
+    if start or end:
+        if not meta["date"]:
+            raise ValueError("Date filter needs a date column")
+        # "(none)" sorts before any YYYY-MM, so undated rows never match
+        expr = ds.field("p_month") >= (start[:7] if start else "0000")
+        if end:
+            expr = expr & (ds.field("p_month") <= end[:7])
+    if regions and meta["by_region"]:
+        part = ds.field("p_region").isin([str(r) for r in regions])
+        expr = part if expr is None else expr & part
+    return expr
+
+def read_partitioned(dataset_key, date_range=None, regions=None, columns=None, root=PARTITION_DIR):
+    # date_range: (start, end), inclusive, as YYYY-MM or YYYY-MM-DD (either
+    # may be None). Month bounds are answered from partitions alone; day
+    # bounds also filter rows in the first and last month.
+    meta = partition_meta(dataset_key, root)
+    if meta is None:
+        return None
+    try:
+        os.utime(os.path.join(dataset_dir(dataset_key, root), "_meta.json"))
+    except OSError:
+        pass
+    start, end = _bounds(date_range)
+    dataset = _dataset(meta, dataset_key, root)
+    names = [c for c in dataset.schema.names if not c.startswith("p_")]
+    if columns is not None:
+        names = [c for c in names if c in columns]
+    df = dataset.to_table(columns=names + ["p_row"], filter=_filter(meta, start, end, regions)).to_pandas()
+    df = df.sort_values("p_row", kind="stable").drop(columns="p_row").reset_index(drop=True)
+    day_bounds = (start and len(start) > 7) or (end and len(end) > 7)
+    if day_bounds or (regions and not meta["by_region"]):
+        df = filter_rows(df, meta["date"] if day_bounds else None, meta["region"], (start, end), regions)
+    return df
+
+def filter_rows(df, date, region, date_range=None, regions=None):
+    # In-memory version of the partition filters, for frames that were not
+    # (or could not be) partitioned.
+    start, end = _bounds(date_range)
+    keep = pd.Series(True, index=df.index)
+    if date and (start or end):
+        d = pd.to_datetime(df[date], errors="coerce")
+        if start:
+            keep &= d >= pd.Timestamp(start)
+        if end:
+            keep &= d < (pd.Timestamp(end) + pd.Timedelta(days=1) if len(end) > 7 else pd.Period(end, freq="M").end_time.ceil("D"))
+    if region and regions:
+        keep &= df[region].astype(str).isin([str(r) for r in regions])
+    return df if keep.all() else df[keep.to_numpy()].reset_index(drop=True)
+
+def partition_files(dataset_key, date_range=None, regions=None, root=PARTITION_DIR):
+    # Parquet files a filtered load opens.
+    meta = partition_meta(dataset_key, root)
+    if meta is None:
+        return []
+    start, end = _bounds(date_range)
+    return [f.path for f in _dataset(meta, dataset_key, root).get_fragments(filter=_filter(meta, start, end, regions))]
+
+def window_range(meta, window):
+    # (start, end) months for a WINDOWS entry, counted back from the latest
+    # month in the data.
+    spec = WINDOWS.get(window)
+    months = [m for m in (meta or {}).get("months", []) if m != NO_VALUE]
+    if spec is None or not months:
+        return None
+    last = pd.Period(months[-1], freq="M")
+    if isinstance(spec, int):
+        return str(last - (spec - 1)), str(last)
+    q = last.asfreq("Q") - int(spec[1:])
+    return str(q.asfreq("M", how="start")), str(q.asfreq("M", how="end"))
+
+def window_key(dataset_key, date_range=None, regions=None, meta=None):
+    # Cache/snapshot/history key of a filtered view; the full file keeps its own key.
+    # meta: the partition metadata, so a window over another date/region
+    # column gets its own key.
+    if not date_range and not regions:
+        return dataset_key
+    by = [meta["date"], meta["region"]] if meta else []
+    spec = json.dumps([dataset_key, list(_bounds(date_range)), sorted(str(r) for r in regions or [])] + ([by] if by else []))
+    return hashlib.sha256(spec.encode("utf-8")).hexdigest()[:32]
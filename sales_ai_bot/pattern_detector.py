@@ -1,6 +1,23 @@
 import pandas as pd
+from perf import instrument
 
-def detect_patterns(df, cols):
+def _sketch_patterns(sketch, cols):
+    patterns = []
+    total = sketch.revenue_total()
+    if cols.get("revenue"):
+        if sketch.revenue_skew() > 2:
+            patterns.append("Highly skewed revenue (few dominate)")
+        if cols.get("customer") and total > 0:
+            if float(sketch.top("customer", 10).sum()) / total > 0.4:
+                patterns.append("Revenue concentration risk")
+    if cols.get("region") and sketch.distinct("region") > 5:
+        patterns.append("Multi-region behavior")
+    return patterns
+
+@instrument()
+def detect_patterns(df, cols, sketch=None):
+    if sketch is not None:
+        return _sketch_patterns(sketch, cols)
     patterns = []
     rev = cols.get("revenue")
     cust = cols.get("customer")
@@ -5,7 +5,48 @@ from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
 
-def build_executive_report(data, charts, output_path, brand=None, logo_path=None):
+def _executive_data(report):
+    kpis = report["kpis"]
+    churn = report["churn"]
+    findings = [f"Top 5 products contribute {kpis['top5_products_pct']*100:.1f}% of revenue"]
+    if kpis.get("top5_customers_pct", 0.0) > 0.0:
+        findings.append(f"Top 5 customers contribute {kpis['top5_customers_pct']*100:.1f}% of revenue")
+    if churn:
+        findings.append(f"{churn['count']} customers at risk of churn")
+    growth = kpis.get("growth_pct", 0.0)
+    if growth > 0:
+        comment = "Trend indicates growth; prepare inventory and marketing."
+    elif growth < 0:
+        comment = "Trend indicates decline; adjust pricing and promotions."
+    else:
+        comment = "Stable trend; maintain balanced operations."
+    risks = []
+    growth_by_region = report["region_zone"].get("growth")
+    if growth_by_region is not None and len(growth_by_region) > 0:
+        pos = [str(r) for r, v in growth_by_region.items() if v > 0][:10]
+        neg = [str(r) for r, v in growth_by_region.items() if v < 0][:10]
+        if pos:
+            risks.append(f"High-growth regions: {', '.join(pos)}")
+        if neg:
+            risks.append(f"Underperforming regions: {', '.join(neg)}")
+    if report["customer_zone"].get("one_time_count"):
+        risks.append(f"One-time buyers: {report['customer_zone']['one_time_count']}")
+    return {
+        "revenue": kpis["total_revenue"],
+        "growth": growth,
+        "forecast": report["forecast"]["next_month_forecast"] if report["forecast"] else 0.0,
+        "risk": "High" if churn and churn["count"] > 0 else "Low",
+        "findings": findings,
+        "sales_comment": comment,
+        "product_actions": report["uplift_plan"],
+        "customer_region_risk": risks,
+        "strategies": report["strategies"] + report["smart"],
+    }
+
+def build_executive_report(report, output_path):
+    data = _executive_data(report)
+    charts = report["chart_paths"] or {}
+    brand, logo_path = report.get("brand"), report.get("logo_path")
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
     doc = SimpleDocTemplate(output_path, pagesize=A4)
     styles = getSampleStyleSheet()
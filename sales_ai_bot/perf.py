@@ -0,0 +1,155 @@
+import contextvars
+import functools
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+import pandas as pd
+
+# Lightweight stage instrumentation. Spans are only recorded while a collector
+# is active (perf.collect()); otherwise @instrument costs one ContextVar lookup
+# and span() returns a shared no-op context.
+# Peak memory uses tracemalloc and is per-span; with several threads tracing at
+# once the numbers include allocations from the other threads.
+
+_collector = contextvars.ContextVar("perf_collector", default=None)
+_NOOP = nullcontext()
+_tracemalloc_users = 0
+_tracemalloc_lock = threading.Lock()
+
+class Collector:
+    def __init__(self, memory=False):
+        self.memory = memory
+        self.closed = False
+        self.spans = []
+        self.origin = time.perf_counter()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def add(self, record):
+        with self._lock:
+            self.spans.append(record)
+
+def _rows(value):
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(len(value))
+    if isinstance(value, int):
+        return value
+    return None
+
+@contextmanager
+def _record(col, name, rows=None):
+    stack = col._stack()
+    rec = {"name": name, "depth": len(stack), "rows": _rows(rows), "thread": threading.current_thread().name}
+    peak_seen = [0]
+    if col.memory:
+        cur, peak = tracemalloc.get_traced_memory()
+        if stack:
+            stack[-1][1][0] = max(stack[-1][1][0], peak)
+        tracemalloc.reset_peak()
+        start_mem = cur
+    stack.append((rec, peak_seen))
+    start = time.perf_counter()
+    cpu = time.thread_time()
+    try:
+        yield rec
+    finally:
+        rec["start_ms"] = round((start - col.origin) * 1000, 2)
+        rec["wall_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        rec["cpu_ms"] = round((time.thread_time() - cpu) * 1000, 2)
+        stack.pop()
+        if col.memory:
+            peak = max(tracemalloc.get_traced_memory()[1], peak_seen[0])
+            rec["peak_mb"] = round((peak - start_mem) / 1024 / 1024, 2)
+            if stack:
+                stack[-1][1][0] = max(stack[-1][1][0], peak)
+        col.add(rec)
+
+def span(name, rows=None):
+    col = _collector.get()
+    if col is None:
+        return _NOOP
+    return _record(col, name, rows)
+
+def instrument(name=None):
+    def wrap(fn):
+        label = name or f"{fn.__module__}.{fn.__name__}"
+
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            col = _collector.get()
+            if col is None:
+                return fn(*args, **kwargs)
+            with _record(col, label, next((a for a in args if isinstance(a, pd.DataFrame)), None)) as rec:
+                result = fn(*args, **kwargs)
+                if rec["rows"] is None:
+                    rec["rows"] = _rows(result if isinstance(result, pd.DataFrame) else None)
+                return result
+        return inner
+    return wrap
+
+def _open(memory):
+    global _tracemalloc_users
+    col = Collector(memory)
+    if memory:
+        with _tracemalloc_lock:
+            if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start()
+            _tracemalloc_users += 1
+    return col
+
+def _close(col):
+    global _tracemalloc_users
+    if col.memory and not col.closed:
+        with _tracemalloc_lock:
+            _tracemalloc_users -= 1
+            if _tracemalloc_users == 0:
+                tracemalloc.stop()
+    col.closed = True
+
+def begin(memory=False):
+    # For callers that cannot wrap their work in `with collect()` (the Streamlit
+    # script). A collector left open by an interrupted run is closed first.
+    end()
+    col = _open(memory)
+    _collector.set(col)
+    return col
+
+def end(col=None):
+    active = _collector.get()
+    col = col or active
+    if col is None:
+        return None
+    if active is col:
+        _collector.set(None)
+    _close(col)
+    return col
+
+@contextmanager
+def collect(memory=False):
+    col = _open(memory)
+    token = _collector.set(col)
+    try:
+        yield col
+    finally:
+        _collector.reset(token)
+        _close(col)
+
+def enabled():
+    return _collector.get() is not None
+
+def summarize(spans):
+    if not spans:
+        return pd.DataFrame(columns=["name", "calls", "wall_ms", "cpu_ms", "peak_mb", "rows"])
+    df = pd.DataFrame(spans)
+    if "peak_mb" not in df.columns:
+        df["peak_mb"] = None
+    out = df.groupby("name").agg(calls=("name", "size"), wall_ms=("wall_ms", "sum"), cpu_ms=("cpu_ms", "sum"), peak_mb=("peak_mb", "max"), rows=("rows", "max")).reset_index()
+    return out.sort_values("wall_ms", ascending=False).reset_index(drop=True)
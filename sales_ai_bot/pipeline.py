@@ -0,0 +1,269 @@
+import os
+import pandas as pd
+from data_loader import load_sales_file
+from profiler import detect_columns
+from analysis_engine import sales_summary, product_zone_analysis, customer_zone_analysis, region_zone_analysis, seasonality_analysis, compute_kpis, six_month_forecast, product_zone_bcg
+from analysis_engine import price_discount_effectiveness, top_bottom_products, top5_customer_pct
+from strategy_engine import generate_strategy
+from upgrade.forecasting import forecast_sales
+from upgrade.segmentation import customer_segmentation
+from upgrade.churn import churn_risk, churn_model
+from upgrade.rfm import rfm_table
+from upgrade.smart_strategy import smart_strategy
+from auto_segmentation import auto_segment
+from segment_runner import run_segments
+from data_understanding import analyze_segment
+from data_health import data_health
+from pattern_detector import detect_patterns
+from sketches import sketch_frame
+import sql_backend
+from report_model import REPORT_INPUTS, report_input
+from dag import Stage, AnalysisDAG, DAG_WORKERS
+from result_cache import ResultCache
+from history import monthly_cube
+from cube import CUBE_DIMENSIONS, build_cube
+
+# Streamlit-free version of the dashboard pipeline, shared by the app, the
+# batch CLI and the HTTP service. Load/profile/prepare happen up front (the
+# app's mapping UI sits between them); everything after is the ANALYSIS DAG.
+
+def monthly_revenue(df, date_col, revenue_col):
+    monthly = df[[date_col, revenue_col]].copy()
+    monthly[revenue_col] = pd.to_numeric(monthly[revenue_col].astype(str).str.replace(r"[^\d\.\-]", "", regex=True), errors="coerce").fillna(0)
+    monthly[date_col] = pd.to_datetime(monthly[date_col], errors="coerce")
+    monthly = monthly.dropna(subset=[date_col])
+    return monthly.resample("ME", on=date_col)[revenue_col].sum()
+
+def revenue_by(df, key_col, revenue_col):
+    return df.groupby(key_col)[revenue_col].sum()
+
+def load_path(path, dataset_key=None, date_range=None, regions=None):
+    with open(path, "rb") as f:
+        return load_sales_file(f, dataset_key, date_range, regions)
+
+def prepare(df, overrides=None):
+    cols = detect_columns(df)
+    cols.update(overrides or {})
+    if not cols.get("revenue"):
+        qty = cols.get("quantity")
+        price = cols.get("price")
+        if qty and price:
+            df["revenue"] = pd.to_numeric(df[qty], errors="coerce").fillna(0) * pd.to_numeric(df[price], errors="coerce").fillna(0)
+            cols["revenue"] = "revenue"
+    if not cols.get("revenue"):
+        raise ValueError("Revenue/Amount column not detected")
+    return cols
+
+def smart_actions(summary, forecast, churn_count, by_customer):
+    if by_customer is not None:
+        total = float(summary["total_revenue"])
+        threshold = 0.05 * total if total > 0 else 0
+        high_value_customers = int((by_customer >= threshold).sum())
+    else:
+        high_value_customers = 0
+    return smart_strategy(forecast["next_month_forecast"] if forecast else 0, churn_count, high_value_customers)
+
+SEGMENT_COLUMNS = ("revenue", "customer", "date", "product", "region")
+SKETCH_COLUMNS = ("revenue", "quantity", "price", "customer", "region", "product")
+REPORT_JOBS = int(os.getenv("SALES_BOT_REPORT_JOBS", "2"))
+
+def _con(c):
+    return c.resources.get("con") if c.params.get("backend") == "duckdb" else None
+
+def _summary(c):
+    con = _con(c)
+    return sql_backend.sales_summary(con, c.cols) if con else sales_summary(c.df, c.cols)
+
+def _kpis(c, summary):
+    con = _con(c)
+    return sql_backend.compute_kpis(con, summary, c.cols) if con else compute_kpis(c.df, summary, c.cols)
+
+def _sketch(c):
+    # A sketch streamed from the file while loading (resources["sketch"]) is
+    # used as is; otherwise it is built over the loaded frame.
+    if not c.params.get("approx"):
+        return None
+    sketch = c.resources.get("sketch")
+    return sketch if sketch is not None else sketch_frame(c.df, c.cols)
+
+def _cube(c):
+    # DuckDB answers the zone stages itself; the drill-down views need pandas.
+    return None if _con(c) else build_cube(c.df, c.cols, key=c.key)
+
+def _customer_zone(c, cube):
+    con = _con(c)
+    return sql_backend.customer_zone_analysis(con, c.cols) if con else customer_zone_analysis(c.df, c.cols, cube)
+
+def _region_zone(c, cube):
+    con = _con(c)
+    return sql_backend.region_zone_analysis(con, c.cols) if con else region_zone_analysis(c.df, c.cols, cube)
+
+def _bcg(c):
+    if not (c.cols["product"] and c.cols["revenue"] and c.cols["date"]):
+        return None
+    return product_zone_bcg(c.df, c.cols["product"], c.cols["revenue"], c.cols["date"])
+
+def _forecast(c):
+    if not (c.cols["date"] and c.cols["revenue"]):
+        return None
+    try:
+        return forecast_sales(c.df, c.cols["date"], c.cols["revenue"], model="linear", val_months=3)
+    except ValueError:
+        return None
+
+def _rfm(c):
+    cust, date = c.cols["customer"], c.cols["date"]
+    if not (cust and date):
+        return None
+    # the profiler's "order" pattern also matches e.g. order_date
+    order = c.cols["order_id"] if c.cols["order_id"] not in (cust, date, c.cols["revenue"]) else None
+    rfm = rfm_table(c.df, cust, date, c.cols["revenue"], order)
+    return rfm if len(rfm) else None
+
+def _churn(c, rfm):
+    cust, date = c.cols["customer"], c.cols["date"]
+    if not (cust and date):
+        return None
+    con = _con(c)
+    return churn_model(c.df, cust, date, rfm=sql_backend.churn_recency(con, cust, date) if con else rfm)
+
+def _churn_count(c):
+    cust, date = c.cols["customer"], c.cols["date"]
+    return int(len(churn_risk(c.df, cust, date))) if cust and date else 0
+
+def _revenue_by(key):
+    def fn(c):
+        return revenue_by(c.df, c.cols[key], c.cols["revenue"]) if c.cols[key] else None
+    return fn
+
+def _monthly_revenue(c):
+    return monthly_revenue(c.df, c.cols["date"], c.cols["revenue"]) if c.cols["date"] else None
+
+def _monthly(c, monthly_revenue):
+    if monthly_revenue is None:
+        return None
+    return monthly_revenue.rename_axis("date").rename("revenue").reset_index()
+
+def _top_products(c, revenue_by_product):
+    if revenue_by_product is None:
+        return None
+    return revenue_by_product.sort_values(ascending=False).head(5).rename_axis("product").rename("revenue").reset_index()
+
+def _customer_segments(c, rfm):
+    # Without a date column there is no RFM table; segment on revenue alone.
+    return customer_segmentation(c.df, c.cols["customer"], c.cols["revenue"], rfm=rfm) if c.cols["customer"] else None
+
+def _segment_results(c, segments):
+    return run_segments(segments, c.cols) if len(segments) > 0 else {}
+
+def _segment_analysis(c, segments):
+    return {name: analyze_segment(segments[name], c.cols) for name in list(segments)[:6]}
+
+def _smart(c, summary, forecast, churn_count, revenue_by_customer):
+    return smart_actions(summary, forecast, churn_count, revenue_by_customer)
+
+def _charts(c, monthly, top_products):
+    return build_charts({"monthly": monthly, "top_products": top_products}, c.params["out_dir"], c.params["name"])
+
+def _report_input(c, **r):
+    return report_input(r, brand=c.params.get("brand") or "AI Sales Strategy Bot", logo_path=c.params.get("logo_path"), appendix=c.params.get("appendix", False))
+
+def _stakeholder_pdf(c, report_input):
+    from final_full_report import build_full_pdf
+    return build_full_pdf(report_input, os.path.join(c.params["out_dir"], f"{c.params['name']}_stakeholder.pdf"))
+
+def _sales_report_pdf(c, report_input):
+    from reports import build_sales_report
+    return build_sales_report(report_input, output_dir=c.params["out_dir"], file_name=f"{c.params['name']}_sales_report.pdf")
+
+ANALYSIS = AnalysisDAG([
+    # aggregates
+    Stage("summary", _summary, uses=("revenue", "product", "customer", "region"), params=("backend",)),
+    Stage("strategies", lambda c, summary: generate_strategy(summary), deps=("summary",)),
+    Stage("kpis", _kpis, deps=("summary",), uses=("revenue", "product", "customer", "date"), params=("backend",)),
+    Stage("monthly_revenue", _monthly_revenue, uses=("date", "revenue")),
+    Stage("monthly", _monthly, deps=("monthly_revenue",)),
+    Stage("revenue_by_customer", _revenue_by("customer"), uses=("customer", "revenue")),
+    Stage("revenue_by_product", _revenue_by("product"), uses=("product", "revenue")),
+    Stage("top_products", _top_products, deps=("revenue_by_product",)),
+    Stage("top5_customer_pct", lambda c: top5_customer_pct(c.df, c.cols["customer"], c.cols["revenue"]), uses=("customer", "revenue")),
+    Stage("sketch", _sketch, uses=SKETCH_COLUMNS, params=("approx",), snapshot=False),
+    Stage("health", lambda c, sketch: data_health(c.df, c.cols, sketch), deps=("sketch",), uses=("customer", "revenue")),
+    Stage("cube", _cube, uses=("date", "revenue", "quantity") + CUBE_DIMENSIONS, params=("backend",), snapshot=False),
+    Stage("patterns", lambda c, sketch: detect_patterns(c.df, c.cols, sketch), deps=("sketch",), uses=("customer", "region", "revenue")),
+    # zones
+    Stage("product_zones", lambda c: product_zone_analysis(c.df, c.cols), uses=("revenue", "product", "date", "margin")),
+    Stage("bcg", _bcg, uses=("product", "revenue", "date")),
+    Stage("customer_zone", _customer_zone, deps=("cube",), uses=("customer", "date", "revenue"), params=("backend",)),
+    Stage("region_zone", _region_zone, deps=("cube",), uses=("region", "date", "revenue"), params=("backend",)),
+    Stage("price_discount", lambda c: price_discount_effectiveness(c.df, c.cols), uses=("discount", "quantity", "revenue")),
+    Stage("top_bottom_products", lambda c, cube: top_bottom_products(c.df, c.cols, cube), deps=("cube",), uses=("product", "revenue")),
+    # forecast
+    Stage("seasonality", lambda c: seasonality_analysis(c.df, c.cols), uses=("date", "revenue")),
+    Stage("six_month_forecast", lambda c: six_month_forecast(c.df, c.cols), uses=("date", "revenue")),
+    Stage("forecast", _forecast, uses=("date", "revenue")),
+    # churn
+    Stage("rfm", _rfm, uses=("customer", "date", "revenue", "order_id")),
+    Stage("churn", _churn, deps=("rfm",), uses=("customer", "date"), params=("backend",)),
+    Stage("churn_count", _churn_count, uses=("customer", "date")),
+    # segments
+    Stage("customer_segments", _customer_segments, deps=("rfm",), uses=("customer", "revenue")),
+    Stage("segments", lambda c, sketch: auto_segment(c.df, c.cols, sketch), deps=("sketch",), uses=("revenue",), snapshot=False),
+    Stage("segment_results", _segment_results, deps=("segments",), uses=SEGMENT_COLUMNS),
+    Stage("segment_analysis", _segment_analysis, deps=("segments",), uses=SEGMENT_COLUMNS),
+    Stage("smart", _smart, deps=("summary", "forecast", "churn_count", "revenue_by_customer")),
+    Stage("monthly_cube", lambda c: monthly_cube(c.df, c.cols), uses=("date", "revenue", "region", "product", "customer")),
+    # charts and reports write files, so they always run
+    Stage("charts", _charts, deps=("monthly", "top_products"), params=("out_dir", "name"), cache=False),
+    Stage("report_input", _report_input, deps=REPORT_INPUTS, params=("brand", "logo_path", "appendix"), cache=False),
+    Stage("stakeholder_pdf", _stakeholder_pdf, deps=("report_input",), params=("out_dir", "name"), cache=False),
+    Stage("sales_report_pdf", _sales_report_pdf, deps=("report_input",), params=("out_dir", "name"), cache=False),
+    Stage("report", lambda c, stakeholder_pdf, sales_report_pdf: {"stakeholder_pdf": stakeholder_pdf, "sales_report_pdf": sales_report_pdf}, deps=("stakeholder_pdf", "sales_report_pdf"), cache=False),
+])
+
+PIPELINE_STAGES = ["summary", "strategies", "kpis", "product_zones", "bcg", "customer_zone", "region_zone", "seasonality", "six_month_forecast", "forecast", "churn", "churn_count", "customer_segments", "segment_results", "segment_analysis", "smart", "monthly", "top_products"]
+
+def run_pipeline(df, cols, progress=None, dataset_key=None, cache=None, workers=DAG_WORKERS, report=None, snapshot=None, history=None):
+    # snapshot: metadata dict (e.g. {"name": ...}) to reuse and update the
+    # on-disk snapshot for dataset_key + cols; needs a dataset_key.
+    # history: {"client": ..., "source": ...} to record KPIs and the monthly
+    # cube in the KPI history store.
+    if snapshot is not None and cache is None:
+        cache = ResultCache()
+    run = ANALYSIS.bind(df, cols, dataset_key, cache=cache, params=dict(report or {}, approx=False, backend="pandas"))
+    if snapshot is not None:
+        from snapshots import load_snapshot, save_snapshot, seed_cache, snapshot_id
+        seed_cache(run, load_snapshot(snapshot_id(dataset_key, cols)))
+    r = run.run(PIPELINE_STAGES + (["monthly_cube"] if history else []) + (["report"] if report else []), workers=workers, progress=progress)
+    r["rows"] = int(len(df))
+    if history:
+        from history import record_run
+        r["history_run"] = record_run(history["client"], r, dataset_key, history.get("source"))
+    if snapshot is not None:
+        save_snapshot(run, meta=dict(snapshot, rows=r["rows"]))
+        r["snapshot"] = {"id": snapshot_id(dataset_key, cols), "reused": list(run.reused), "computed": list(run.computed)}
+    return r
+
+def build_charts(r, out_dir, name):
+    from charts import create_charts
+    if r["monthly"] is None or r["top_products"] is None:
+        return None
+    return create_charts(r["monthly"], r["top_products"], out_dir=os.path.join(out_dir, f"{name}_charts"))
+
+def metrics(r):
+    fc = r.get("forecast") or {}
+    churn = r.get("churn") or {}
+    k = r["kpis"]
+    return {
+        "rows": r["rows"],
+        "total_revenue": k["total_revenue"],
+        "growth_pct": k["growth_pct"],
+        "top5_products_pct": k["top5_products_pct"],
+        "top5_customers_pct": k["top5_customers_pct"],
+        "next_month_forecast": fc.get("next_month_forecast"),
+        "forecast_accuracy": fc.get("forecast_accuracy"),
+        "customers_at_risk": int(len(churn["customers_at_risk"])) if churn else 0,
+        "churn_precision": churn.get("precision"),
+        "churn_recall": churn.get("recall"),
+        "segments": len(r.get("segment_results") or {}),
+    }
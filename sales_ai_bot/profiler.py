@@ -1,5 +1,7 @@
 import pandas as pd
+from perf import instrument
 
+@instrument()
 def detect_columns(df):
     columns = df.columns
     date_candidates = ['date', 'order_date', 'invoice_date', 'transaction_date', 'posting_date', 'period', 'month']
@@ -0,0 +1,64 @@
+import os
+import numpy as np
+import pandas as pd
+from perf import instrument
+from analysis_engine import sales_summary, compute_kpis
+from strategy_engine import generate_strategy
+from pipeline import monthly_revenue
+
+# Progressive mode: headline numbers from a stratified sample first, exact
+# full-data stages computed by a background DagJob and swapped in when done.
+# Sampled revenue is multiplied by its inverse inclusion probability, so the
+# sums behind totals, top-N and the monthly trend are unbiased estimates and
+# the regular analysis functions can run on the sample unchanged.
+PROGRESSIVE_MIN_ROWS = int(os.getenv("SALES_BOT_PROGRESSIVE_ROWS", "500000"))
+SAMPLE_ROWS = int(os.getenv("SALES_BOT_SAMPLE_ROWS", "50000"))
+MIN_PER_STRATUM = 200
+MAX_STRATA = 1000
+REFINE_STAGES = ("summary", "strategies", "kpis", "monthly_revenue")
+
+@instrument()
+def stratified_sample(df, cols, n=SAMPLE_ROWS, seed=0):
+    rev = cols["revenue"]
+    if len(df) <= n:
+        out = df.copy()
+        out[rev] = pd.to_numeric(out[rev], errors="coerce").fillna(0)
+        return out
+    # Strata are regions (when mapped and not too many); proportional allocation
+    # with a floor so small regions still show up in the top-N.
+    codes = np.zeros(len(df), dtype=np.int64)
+    if cols.get("region"):
+        region_codes = pd.factorize(df[cols["region"]])[0] + 1
+        if region_codes.max() < MAX_STRATA:
+            codes = region_codes
+    codes = codes.astype(np.int16 if codes.max() < 2 ** 15 else np.int64)
+    order = np.argsort(codes, kind="stable")
+    sizes = np.bincount(codes)
+    rng = np.random.default_rng(seed)
+    picks, weights = [], []
+    start = 0
+    for size in sizes:
+        if size == 0:
+            continue
+        k = int(min(size, max(MIN_PER_STRATUM, round(n * size / len(df)))))
+        picks.append(order[start + rng.choice(size, k, replace=False)])
+        weights.append(np.full(k, size / k))
+        start += size
+    picks = np.concatenate(picks)
+    out = df.iloc[picks].copy()
+    out[rev] = pd.to_numeric(out[rev], errors="coerce").fillna(0) * np.concatenate(weights)
+    return out
+
+@instrument()
+def provisional_results(df, cols, n=SAMPLE_ROWS):
+    sample = stratified_sample(df, cols, n)
+    summary = sales_summary(sample, cols)
+    date = cols.get("date")
+    return {
+        "summary": summary,
+        "strategies": generate_strategy(summary),
+        "kpis": compute_kpis(sample, summary, cols),
+        "monthly_revenue": monthly_revenue(sample, date, cols["revenue"]) if date else None,
+        "sample_rows": int(len(sample)),
+        "rows": int(len(df)),
+    }
@@ -0,0 +1,167 @@
+import os
+import pandas as pd
+from analysis_engine import uplift_plan_for_bottom
+
+# Everything the PDF builders render, computed once by the analysis DAG. The
+# builders never see the raw frame, so report build time depends on the size
+# of these results (top-N lists, monthly series, a few segments), not on the
+# number of rows uploaded.
+REPORT_INPUTS = ("summary", "strategies", "smart", "kpis", "forecast", "churn", "product_zones", "bcg", "customer_zone", "region_zone", "seasonality", "six_month_forecast", "top_bottom_products", "segment_analysis", "charts")
+REPORT_SEGMENTS = 6
+# Product tables in the PDFs show the top REPORT_TABLE_ROWS products plus
+# summary rows (the remainder, each category, the total); the full list goes
+# to an optional CSV appendix next to the PDF. 0 puts every product in the PDF.
+REPORT_TABLE_ROWS = int(os.getenv("SALES_BOT_REPORT_TABLE_ROWS", "50"))
+
+def _empty_products():
+    return pd.DataFrame(columns=["product", "revenue"])
+
+def _product_columns(df):
+    lower = {c.lower(): c for c in df.columns}
+    return lower["category"], lower["product"], lower["revenue"]
+
+def product_table(df, n=REPORT_TABLE_ROWS):
+    # df: product_zones or bcg (Category/Product/Revenue in either case).
+    if df is None or len(df) == 0:
+        return None
+    cat, prod, rev = _product_columns(df)
+    d = pd.DataFrame({"category": df[cat].astype(str), "product": df[prod].astype(str), "revenue": pd.to_numeric(df[rev], errors="coerce").fillna(0.0)})
+    top = d.nlargest(n, "revenue") if n and len(d) > n else d.sort_values("revenue", ascending=False)
+    summary = []
+    rest = len(d) - len(top)
+    if rest:
+        summary.append(["Other", f"{rest:,} more products", float(d["revenue"].sum() - top["revenue"].sum())])
+    for c, g in d.groupby("category", sort=True)["revenue"]:
+        summary.append([c, f"{len(g):,} products", float(g.sum())])
+    summary.append(["Total", f"{len(d):,} products", float(d["revenue"].sum())])
+    return {
+        "columns": ["Category", "Product", "Revenue"],
+        "rows": [[c, p, float(v)] for c, p, v in top.itertuples(index=False)],
+        "summary": summary,
+        "total_rows": len(d),
+    }
+
+def appendix_path(pdf_path):
+    return f"{os.path.splitext(pdf_path)[0]}_products.csv"
+
+def write_appendix(df, pdf_path):
+    if df is None or len(df) == 0:
+        return None
+    path = appendix_path(pdf_path)
+    cat, prod, rev = _product_columns(df)
+    df[[cat, prod, rev]].sort_values(rev, ascending=False).to_csv(path, index=False, header=["category", "product", "revenue"])
+    return path
+
+def report_input(r, brand=None, logo_path=None, appendix=False):
+    churn = r.get("churn")
+    top5, bottom5 = r.get("top_bottom_products") or (_empty_products(), _empty_products())
+    segments = []
+    for name, data in list((r.get("segment_analysis") or {}).items())[:REPORT_SEGMENTS]:
+        cmx = data.get("churn")
+        segments.append({
+            "name": name,
+            "total_revenue": data["summary"].get("total_revenue", 0.0),
+            "at_risk": int(len(cmx["customers_at_risk"])) if cmx and "customers_at_risk" in cmx else 0,
+        })
+    charts = r.get("charts")
+    return {
+        "brand": brand,
+        "logo_path": logo_path,
+        "appendix": bool(appendix),
+        "summary": r["summary"],
+        "strategies": list(r["strategies"]),
+        "smart": list(r.get("smart") or []),
+        "kpis": r["kpis"],
+        "forecast": r.get("forecast"),
+        "churn": {"count": int(len(churn["customers_at_risk"])), "precision": churn["precision"], "recall": churn["recall"]} if churn else None,
+        "product_zones": r.get("product_zones"),
+        "bcg": r.get("bcg"),
+        "customer_zone": r.get("customer_zone") or {},
+        "region_zone": r.get("region_zone") or {},
+        "seasonality": r.get("seasonality"),
+        "six_month_forecast": r.get("six_month_forecast"),
+        "top_products": top5,
+        "bottom_products": bottom5,
+        "uplift_plan": uplift_plan_for_bottom(bottom5, {}),
+        "segments": segments,
+        "charts": charts,
+        "chart_paths": {"monthly": charts["Monthly Sales Trend"]["path"], "product": charts["Top Products by Revenue"]["path"]} if charts else None,
+    }
+
+def stakeholder_sections(report):
+    kpis = report["kpis"]
+    forecast = report["forecast"]
+    churn_info = report["churn"]
+    product_zones = report["product_zones"]
+    sections = [{
+        "title": "Executive Overview",
+        "kpis": {
+            "revenue": kpis["total_revenue"],
+            "growth": kpis["growth_pct"],
+            "forecast": forecast["next_month_forecast"] if forecast else 0,
+            "risk": "High" if (churn_info and churn_info.get("count", 0) > 0) else "Low"
+        },
+        "pagebreak": True
+    }]
+    exec_text = [
+        f"Total Revenue: INR {kpis['total_revenue']:,.2f}",
+        f"Growth: {kpis['growth_pct']*100:.1f}%",
+        f"Top 5 Products %: {kpis['top5_products_pct']*100:.1f}%"
+    ]
+    if kpis.get("top5_customers_pct", 0.0) > 0.0:
+        exec_text.append(f"Top 5 Customers %: {kpis['top5_customers_pct']*100:.1f}%")
+    else:
+        exec_text.append("⚠️ Top 5 Customers % unavailable — verify customer/revenue columns.")
+    sections.append({"title": "Executive KPIs", "text": exec_text, "pagebreak": True})
+    if forecast:
+        sections.append({
+            "title": "Forecast Methodology & Accuracy",
+            "text": [
+                f"Model: {forecast['model']}",
+                f"Validation Window: {forecast['validation_window']}",
+                "Accuracy Metric: MAPE",
+                f"Forecast Accuracy: {forecast['forecast_accuracy']}%",
+                f"Baseline (Naive): {forecast['baseline_accuracy']}%",
+                f"RMSE: {forecast['rmse']}",
+                f"Next Month Forecast: INR {forecast['next_month_forecast']:,.2f}"
+            ],
+            "pagebreak": True
+        })
+    if churn_info:
+        sections.append({
+            "title": "Churn Risk (Probabilistic Model)",
+            "text": [
+                "Algorithm: Logistic Regression",
+                "Feature: Recency (days since last purchase)",
+                "Threshold: P(churn) > 0.70",
+                f"Customers at Risk: {churn_info['count']}",
+                f"Precision: {churn_info['precision']}",
+                f"Recall: {churn_info['recall']}"
+            ],
+            "pagebreak": True
+        })
+    table = product_table(product_zones)
+    if table:
+        sections.append({
+            "title": "Product Zone Classification (BCG)",
+            "text": [
+                "Rules Used:",
+                "Revenue percentile ≥ 80% → High share",
+                "Growth rate > 0 → Growing",
+                "Margin proxy if available",
+                f"Top {len(table['rows']):,} of {table['total_rows']:,} products by revenue:" if len(table["rows"]) < table["total_rows"] else "Products by revenue:",
+            ],
+            "table": table,
+            "pagebreak": True
+        })
+    for seg in report["segments"]:
+        sections.append({
+            "title": f"Segment — {seg['name']}",
+            "text": [
+                f"Revenue: INR {seg['total_revenue']:,.2f}",
+                f"Risk: {seg['at_risk']} customers at risk"
+            ],
+            "pagebreak": True
+        })
+    sections.append({"title": "AI Strategy & What To Do Next", "text": report["strategies"] + report["smart"], "pagebreak": False})
+    return sections
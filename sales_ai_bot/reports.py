@@ -2,7 +2,8 @@ import os
 import re
 from datetime import datetime
 from fpdf import FPDF
-import pandas as pd
+from perf import instrument
+from report_model import product_table, write_appendix
 
 def _list_text(items):
     if not items:
@@ -22,7 +23,20 @@ def _safe_text(s):
     s = re.sub(r"[^\x20-\x7E\n]", "", s)
     return s
 
-def build_sales_report(summary, strategies, product_zone_df, customer_analysis, region_analysis, seasonality, kpis, output_dir="sales_ai_bot/pdf", file_name=None, charts=None, brand=None, logo_path=None, forecast_info=None, churn_info=None):
+@instrument()
+def build_sales_report(report, output_dir="sales_ai_bot/pdf", file_name=None):
+    summary = report["summary"]
+    strategies = report["strategies"]
+    kpis = report["kpis"]
+    product_zone_df = report["product_zones"]
+    customer_analysis = report["customer_zone"]
+    region_analysis = report["region_zone"]
+    seasonality = report["seasonality"]
+    forecast_info = report["forecast"]
+    churn_info = report["churn"]
+    charts = report["chart_paths"]
+    brand = report.get("brand")
+    logo_path = report.get("logo_path")
     os.makedirs(output_dir, exist_ok=True)
     ts = datetime.now().strftime("%Y%m%d_%H%M%S")
     name = file_name or f"sales_strategy_{ts}.pdf"
@@ -57,6 +71,38 @@ def build_sales_report(summary, strategies, product_zone_df, customer_analysis,
                 pdf.multi_cell(epw, 8, chunk)
                 t = t[120:]
 
+    def write_table(tbl):
+        # One fixed-height cell per value, header repeated on each new page;
+        # product names are clipped to the column instead of wrapped.
+        widths = [40, epw - 80, 40]
+        def header():
+            pdf.set_font("Helvetica", "B", 9)
+            pdf.set_fill_color(10, 37, 64)
+            pdf.set_text_color(255, 255, 255)
+            for w, c in zip(widths, tbl["columns"]):
+                pdf.cell(w, 6, c, border=1, fill=True, align="R" if c == "Revenue" else "L")
+            pdf.ln()
+            pdf.set_text_color(0, 0, 0)
+        pdf.set_font("Helvetica", "B", 9)
+        # text up to this many characters fits even if every glyph is a "W"
+        fits = [int((w - 2) // pdf.get_string_width("W")) for w in widths]
+        def row(values, bold=False):
+            if pdf.will_page_break(6):
+                pdf.add_page()
+                header()
+            pdf.set_font("Helvetica", "B" if bold else "", 9)
+            for w, n, v, align in zip(widths, fits, values, "LLR"):
+                text = _safe_text(v)
+                while len(text) > n and pdf.get_string_width(text) > w - 2:
+                    text = text[:int(len(text) * (w - 2) / pdf.get_string_width(text)) or 1]
+                pdf.cell(w, 6, text, border="B", align=align)
+            pdf.ln()
+        header()
+        for c, prod, rev in tbl["rows"]:
+            row([c, prod, f"{rev:,.0f}"])
+        for c, label, rev in tbl["summary"]:
+            row([c, label, f"{rev:,.0f}"], bold=True)
+
     pdf.set_font("Helvetica", "B", 14)
     pdf.cell(0, 10, _safe_text("Executive KPIs (Clean)"), ln=True)
     write_lines([f"Total Revenue: {kpis.get('total_revenue', 0):,.2f}"])
@@ -127,36 +173,18 @@ def build_sales_report(summary, strategies, product_zone_df, customer_analysis,
         "• Growth rate > 0 → Growing",
         "• Margin proxy used if available"
     ])
-    # Try to compute BCG classification if source data is available
-    bcg_rows = []
-    try:
-        df_src = summary.get("df_source")
-        cols_src = summary.get("cols_source", {})
-        prod = cols_src.get("product")
-        rev = cols_src.get("revenue")
-        date = cols_src.get("date")
-        if isinstance(df_src, pd.DataFrame) and prod and rev and date:
-            from analysis_engine import product_zone_bcg
-            bcg = product_zone_bcg(df_src, prod, rev, date)
-            if bcg is not None and len(bcg) > 0:
-                bcg_rows = bcg.values.tolist()
-    except Exception:
-        bcg_rows = []
-    if len(bcg_rows) > 0:
-        classes = []
-        for row in bcg_rows:
-            p = row[0]
-            cat = row[3]
-            if cat == "Star":
-                desc = "High Share + Growth"
-            elif cat == "Cash Cow":
-                desc = "High Share + Stable"
-            elif cat == "Question Mark":
-                desc = "Low Share + Growth"
-            else:
-                desc = "Low Share + Decline"
-            classes.append(f"• {cat}: {p} ({desc})")
-        write_lines(["Classification:"] + classes)
+    bcg = report["bcg"]
+    table = product_table(bcg)
+    if table:
+        write_lines([
+            "Star: High Share + Growth; Cash Cow: High Share + Stable;",
+            "Question Mark: Low Share + Growth; Dead: Low Share + Decline",
+            f"Classification (top {len(table['rows']):,} of {table['total_rows']:,} products by revenue):" if len(table["rows"]) < table["total_rows"] else "Classification:",
+        ])
+        write_table(table)
+        appendix = write_appendix(bcg, path) if report.get("appendix") else None
+        if appendix:
+            write_lines(f"Full product list: {os.path.basename(appendix)}")
     else:
         write_lines("Classification unavailable due to insufficient product/date columns.")
     pdf.ln(3)
@@ -312,11 +340,7 @@ def build_sales_report(summary, strategies, product_zone_df, customer_analysis,
     pdf.ln(3)
     pdf.set_font("Helvetica", "B", 14)
     pdf.cell(0, 10, _safe_text("Six-Month Forecast"), ln=True)
-    try:
-        from analysis_engine import six_month_forecast, top_bottom_products, uplift_plan_for_bottom
-        smf = six_month_forecast(summary.get("df_source") if isinstance(summary.get("df_source"), pd.DataFrame) else pd.DataFrame(), summary.get("cols_source", {}))
-    except Exception:
-        smf = None
+    smf = report["six_month_forecast"]
     if smf is not None and len(smf) > 0:
         for _, row in smf.iterrows():
             write_lines(f"{row['month'].strftime('%b %Y')}: {float(row['forecast']):,.2f}")
@@ -326,14 +350,8 @@ def build_sales_report(summary, strategies, product_zone_df, customer_analysis,
     pdf.ln(3)
     pdf.set_font("Helvetica", "B", 14)
     pdf.cell(0, 10, _safe_text("Bottom-5 Uplift Plan"), ln=True)
-    try:
-        from analysis_engine import top_bottom_products, uplift_plan_for_bottom
-        if isinstance(summary.get("df_source"), pd.DataFrame):
-            t5, b5 = top_bottom_products(summary["df_source"], summary.get("cols_source", {}))
-            for a in uplift_plan_for_bottom(b5, summary.get("cols_source", {})):
-                write_lines(f"- {a}")
-    except Exception:
-        write_lines("Provide product and revenue columns to compute uplift plan.")
+    for a in report["uplift_plan"]:
+        write_lines(f"- {a}")
 
     pdf.ln(3)
     pdf.set_font("Helvetica", "B", 14)
@@ -0,0 +1,109 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+import pandas as pd
+
+CACHE_MAX_MB = float(os.getenv("SALES_BOT_CACHE_MB", "512"))
+CACHE_TTL_SECONDS = float(os.getenv("SALES_BOT_CACHE_TTL", "3600"))
+
+def fingerprint_bytes(data):
+    return hashlib.sha256(data).hexdigest()[:32]
+
+def fingerprint_upload(file, block=8 * 1024 * 1024):
+    h = hashlib.sha256()
+    view = memoryview(file.getvalue())
+    for i in range(0, len(view), block):
+        h.update(view[i:i + block])
+    return h.hexdigest()[:32]
+
+def fingerprint_file(path, block=8 * 1024 * 1024):
+    # Same digest as fingerprint_upload for the same bytes, so CLI runs and
+    # uploads share cache and snapshot keys.
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(block), b""):
+            h.update(chunk)
+    return h.hexdigest()[:32]
+
+def mapping_key(cols):
+    return json.dumps({k: cols.get(k) for k in sorted(cols)}, sort_keys=True, default=str)
+
+def sizeof(value, _depth=0):
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=True))
+    if _depth < 4 and isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sizeof(v, _depth + 1) for v in value.values())
+    if _depth < 4 and isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(sizeof(v, _depth + 1) for v in value)
+    return sys.getsizeof(value)
+
+class ResultCache:
+    def __init__(self, max_mb=CACHE_MAX_MB, ttl_seconds=CACHE_TTL_SECONDS):
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.ttl = ttl_seconds
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.RLock()
+
+    def _drop(self, key):
+        _, size, _ = self.entries.pop(key)
+        self.bytes -= size
+
+    def _expire(self, now):
+        stale = [k for k, (_, _, t) in self.entries.items() if now - t > self.ttl]
+        for k in stale:
+            self._drop(k)
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self.entries.get(key)
+            if item is None or time.monotonic() - item[2] > self.ttl:
+                if item is not None:
+                    self._drop(key)
+                self.misses += 1
+                return default
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def __contains__(self, key):
+        with self._lock:
+            item = self.entries.get(key)
+            return item is not None and time.monotonic() - item[2] <= self.ttl
+
+    def put(self, key, value):
+        size = sizeof(value)
+        with self._lock:
+            if key in self.entries:
+                self._drop(key)
+            self._expire(time.monotonic())
+            if size > self.max_bytes:
+                return value
+            while self.entries and self.bytes + size > self.max_bytes:
+                self._drop(next(iter(self.entries)))
+            self.entries[key] = (value, size, time.monotonic())
+            self.bytes += size
+        return value
+
+    def get_or_compute(self, key, fn, *args, **kwargs):
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = self.put(key, fn(*args, **kwargs))
+        return value
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        return {"entries": len(self.entries), "mb": round(self.bytes / 1024 / 1024, 2), "hits": self.hits, "misses": self.misses}
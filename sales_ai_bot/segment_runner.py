@@ -2,7 +2,9 @@ from analysis_engine import sales_summary
 from upgrade.forecasting import forecast_sales
 from upgrade.churn import churn_model
 from strategy_engine import generate_strategy
+from perf import instrument
 
+@instrument()
 def run_segments(segments, cols):
     results = {}
     for name, sdf in segments.items():
@@ -0,0 +1,386 @@
+import argparse
+import hashlib
+import json
+import multiprocessing as mp
+import os
+import shutil
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Local analysis service: jobs are queued onto a bounded process pool and
+# clients poll or stream progress. Once workers + queue slots are taken new
+# submissions get 429 instead of piling up.
+SERVICE_HOST = os.getenv("SALES_BOT_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.getenv("SALES_BOT_PORT", "8765"))
+SERVICE_WORKERS = int(os.getenv("SALES_BOT_WORKERS", "2"))
+SERVICE_QUEUE = int(os.getenv("SALES_BOT_QUEUE", "8"))
+SERVICE_MAX_UPLOAD_MB = int(os.getenv("SALES_BOT_MAX_UPLOAD_MB", "8192"))
+SERVICE_DIR = os.getenv("SALES_BOT_SERVICE_DIR", "sales_ai_bot/cache/service")
+JOB_HISTORY = 200
+# Bytes of a rejected upload read and discarded so the client sees the 429
+# instead of a reset connection; larger bodies are cut off.
+REJECT_DRAIN = 64 * 1024 * 1024
+TERMINAL = ("done", "failed")
+
+_progress = None
+
+def _init_worker(q):
+    global _progress
+    _progress = q
+
+def _jsonable(v):
+    if isinstance(v, pd.DataFrame):
+        return json.loads(v.to_json(orient="records", date_format="iso"))
+    if isinstance(v, pd.Series):
+        return json.loads(v.to_json(date_format="iso"))
+    if isinstance(v, dict):
+        return {str(k): _jsonable(x) for k, x in v.items()}
+    if isinstance(v, (list, tuple)):
+        return [_jsonable(x) for x in v]
+    if isinstance(v, np.generic):
+        return v.item()
+    if isinstance(v, pd.Timestamp):
+        return v.isoformat()
+    return v
+
+def run_job(job_id, path, out_dir, pdf=True):
+    from pipeline import load_path, prepare, run_pipeline, metrics
+
+    def step(stage):
+        if _progress is not None:
+            _progress.put((job_id, stage))
+
+    step("load")
+    df = load_path(path)
+    step("columns")
+    cols = prepare(df)
+    r = run_pipeline(df, cols, progress=step, report={"out_dir": out_dir, "name": "report"} if pdf else None)
+    churn = r["churn"]
+    out = {
+        "columns": cols,
+        "metrics": metrics(r),
+        "kpis": r["kpis"],
+        "product_zones": r["product_zones"],
+        "customer_zone": {
+            "top_customers": r["customer_zone"]["by_customer"].sort_values(ascending=False).head(20),
+            "repeat_count": r["customer_zone"]["repeat_count"],
+            "one_time_count": r["customer_zone"]["one_time_count"],
+        },
+        "region_zone": r["region_zone"],
+        "forecast": r["forecast"],
+        "six_month_forecast": r["six_month_forecast"],
+        "churn": {"count": int(len(churn["customers_at_risk"])), "precision": churn["precision"], "recall": churn["recall"]} if churn else None,
+        "strategies": r["strategies"] + r["smart"],
+    }
+    if pdf:
+        out["artifacts"] = r["report"]
+    return _jsonable(out)
+
+def save_upload(stream, length, name, upload_dir, block=1024 * 1024):
+    # Raises ValueError when the body ends before Content-Length bytes.
+    os.makedirs(upload_dir, exist_ok=True)
+    ext = os.path.splitext(name)[1].lower() or ".csv"
+    tmp = os.path.join(upload_dir, f".{uuid.uuid4().hex}{ext}")
+    h = hashlib.sha256()
+    left = length
+    with open(tmp, "wb") as f:
+        while left > 0:
+            data = stream.read(min(block, left))
+            if not data:
+                break
+            h.update(data)
+            f.write(data)
+            left -= len(data)
+    if left > 0:
+        os.remove(tmp)
+        raise ValueError(f"upload truncated: got {length - left} of {length} bytes")
+    path = os.path.join(upload_dir, h.hexdigest()[:24] + ext)
+    os.replace(tmp, path)
+    return path
+
+def remove_upload(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+class JobQueue:
+    def __init__(self, workers=SERVICE_WORKERS, max_queue=SERVICE_QUEUE, out_dir=SERVICE_DIR):
+        ctx = mp.get_context("spawn")
+        self.progress = ctx.Queue()
+        self.pool = ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker, initargs=(self.progress,))
+        self.workers = workers
+        self.limit = workers + max_queue
+        self.out_dir = out_dir
+        self.jobs = {}
+        # slots held by requests whose upload is still being read
+        self.reserved = 0
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._drainer = threading.Thread(target=self._drain, daemon=True)
+        self._drainer.start()
+
+    def _event(self, job, stage):
+        job["stage"] = stage
+        job["events"].append({"stage": stage, "status": job["status"], "t": round(time.time() - job["submitted"], 3)})
+        self._changed.notify_all()
+
+    def _drain(self):
+        while True:
+            item = self.progress.get()
+            if item is None:
+                return
+            job_id, stage = item
+            with self._lock:
+                job = self.jobs.get(job_id)
+                if job is None or job["status"] in TERMINAL:
+                    continue
+                job["status"] = "running"
+                self._event(job, stage)
+
+    def _finish(self, job_id, fut):
+        with self._lock:
+            job = self.jobs[job_id]
+            err = fut.exception()
+            if err is None:
+                job["status"] = "done"
+                job["result"] = fut.result()
+            else:
+                job["status"] = "failed"
+                job["error"] = f"{type(err).__name__}: {err}"
+            self._event(job, job["status"])
+            finished = [k for k, j in self.jobs.items() if j["status"] in TERMINAL]
+            for k in finished[:max(0, len(finished) - JOB_HISTORY)]:
+                self._evict(self.jobs.pop(k))
+
+    def _evict(self, job):
+        # drops the job's reports and, unless another job was given the same
+        # bytes, its upload
+        shutil.rmtree(os.path.join(self.out_dir, job["id"]), ignore_errors=True)
+        if job["upload"] and all(j["upload"] != job["upload"] for j in self.jobs.values()):
+            remove_upload(job["upload"])
+
+    def reserve(self):
+        # Takes a slot before the request body is read; False when full.
+        with self._lock:
+            active = sum(j["status"] not in TERMINAL for j in self.jobs.values())
+            if active + self.reserved >= self.limit:
+                return False
+            self.reserved += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.reserved -= 1
+
+    def submit(self, path, pdf=True, upload=False, reserved=False):
+        # upload: path is a file saved by the service and is removed with
+        # the job. reserved: the caller holds a slot from reserve().
+        with self._lock:
+            if not reserved and sum(j["status"] not in TERMINAL for j in self.jobs.values()) + self.reserved >= self.limit:
+                return None
+            job_id = uuid.uuid4().hex[:12]
+            self.jobs[job_id] = {"id": job_id, "file": os.path.basename(path), "upload": path if upload else None, "status": "queued", "stage": None, "events": [], "submitted": time.time(), "result": None, "error": None}
+        try:
+            fut = self.pool.submit(run_job, job_id, path, os.path.join(self.out_dir, job_id), pdf)
+        except Exception:
+            with self._lock:
+                del self.jobs[job_id]
+            raise
+        if reserved:
+            self.release()
+        fut.add_done_callback(lambda f: self._finish(job_id, f))
+        return job_id
+
+    def get(self, job_id):
+        with self._lock:
+            job = self.jobs.get(job_id)
+            return None if job is None else {k: v for k, v in job.items() if k != "events"}
+
+    def wait_events(self, job_id, since, timeout=15.0):
+        with self._changed:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return [], "failed"
+            self._changed.wait_for(lambda: len(job["events"]) > since or job["status"] in TERMINAL, timeout=timeout)
+            return list(job["events"][since:]), job["status"]
+
+    def stats(self):
+        with self._lock:
+            counts = {s: 0 for s in ("queued", "running", "done", "failed")}
+            for j in self.jobs.values():
+                counts[j["status"]] += 1
+        return {"workers": self.workers, "capacity": self.limit, **counts}
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        self.progress.put(None)
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    server_version = "SalesBot/1.0"
+
+    def _send_json(self, code, payload, headers=None):
+        body = json.dumps(payload, default=str).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _job_view(self, job):
+        view = dict(job)
+        artifacts = (job.get("result") or {}).get("artifacts") or {}
+        view["artifacts"] = {name: f"/jobs/{job['id']}/artifacts/{name}" for name in artifacts}
+        return view
+
+    def do_GET(self):
+        jobs = self.server.jobs
+        parts = [p for p in urlparse(self.path).path.split("/") if p]
+        if parts == ["health"]:
+            return self._send_json(200, jobs.stats())
+        if len(parts) < 2 or parts[0] != "jobs":
+            return self._send_json(404, {"error": "not found"})
+        job = jobs.get(parts[1])
+        if job is None:
+            return self._send_json(404, {"error": "unknown job"})
+        if len(parts) == 2:
+            return self._send_json(200, self._job_view(job))
+        if parts[2] == "events":
+            return self._stream_events(job["id"])
+        if parts[2] == "artifacts" and len(parts) == 4:
+            path = ((job.get("result") or {}).get("artifacts") or {}).get(parts[3])
+            if not path or not os.path.exists(path):
+                return self._send_json(404, {"error": "artifact not ready"})
+            self.send_response(200)
+            self.send_header("Content-Type", "application/pdf")
+            self.send_header("Content-Length", str(os.path.getsize(path)))
+            self.send_header("Content-Disposition", f'attachment; filename="{os.path.basename(path)}"')
+            self.end_headers()
+            with open(path, "rb") as f:
+                while True:
+                    data = f.read(1024 * 1024)
+                    if not data:
+                        break
+                    self.wfile.write(data)
+            return
+        return self._send_json(404, {"error": "not found"})
+
+    def _stream_events(self, job_id):
+        # Newline-delimited JSON, one line per stage, until the job finishes.
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        seen = 0
+        while True:
+            events, status = self.server.jobs.wait_events(job_id, seen)
+            seen += len(events)
+            try:
+                for e in events:
+                    self.wfile.write((json.dumps(e) + "\n").encode("utf-8"))
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                return
+            if status in TERMINAL and not events:
+                return
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path.rstrip("/") != "/jobs":
+            return self._send_json(404, {"error": "not found"})
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > SERVICE_MAX_UPLOAD_MB * 1024 * 1024:
+            return self._send_json(413, {"error": f"upload exceeds {SERVICE_MAX_UPLOAD_MB} MB"})
+        jobs = self.server.jobs
+        # A full queue is answered before the body is read, so rejected
+        # uploads never reach the disk.
+        if not jobs.reserve():
+            self._send_json(429, {"error": "queue full, retry later", **jobs.stats()}, {"Retry-After": "5", "Connection": "close"})
+            return self._discard(min(length, REJECT_DRAIN))
+        try:
+            code, payload = self._submit(url, length)
+        except Exception:
+            jobs.release()
+            raise
+        if code != 202:
+            jobs.release()
+        return self._send_json(code, payload)
+
+    def _submit(self, url, length):
+        # -> (status, payload); a submitted job takes over the reserved slot.
+        qs = parse_qs(url.query)
+        pdf = qs.get("pdf", ["1"])[0] not in ("0", "false", "no")
+        if self.headers.get("Content-Type", "").startswith("application/json"):
+            try:
+                body = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                return 400, {"error": "invalid JSON body"}
+            path = body.get("path")
+            pdf = bool(body.get("pdf", pdf))
+            if not path or not os.path.isfile(path):
+                return 400, {"error": "path must point to an existing CSV or Excel file"}
+            return self._accepted(self.server.jobs.submit(path, pdf, reserved=True))
+        if length == 0:
+            return 400, {"error": "empty upload"}
+        name = qs.get("name", ["upload.csv"])[0]
+        try:
+            path = save_upload(self.rfile, length, name, os.path.join(self.server.jobs.out_dir, "uploads"))
+        except ValueError as e:
+            return 400, {"error": str(e)}
+        try:
+            return self._accepted(self.server.jobs.submit(path, pdf, upload=True, reserved=True))
+        except Exception:
+            remove_upload(path)
+            raise
+
+    def _discard(self, left, block=1024 * 1024):
+        self.close_connection = True
+        try:
+            while left > 0:
+                data = self.rfile.read(min(block, left))
+                if not data:
+                    return
+                left -= len(data)
+        except OSError:
+            pass
+
+    def _accepted(self, job_id):
+        return 202, {"id": job_id, "status": f"/jobs/{job_id}", "events": f"/jobs/{job_id}/events"}
+
+def serve(host=SERVICE_HOST, port=SERVICE_PORT, workers=SERVICE_WORKERS, max_queue=SERVICE_QUEUE, out_dir=SERVICE_DIR):
+    server = ThreadingHTTPServer((host, port), ServiceHandler)
+    server.daemon_threads = True
+    server.jobs = JobQueue(workers, max_queue, out_dir)
+    return server
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local HTTP analysis service.")
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--workers", type=int, default=SERVICE_WORKERS, help="analysis processes")
+    parser.add_argument("--queue", type=int, default=SERVICE_QUEUE, help="jobs allowed to wait for a worker")
+    parser.add_argument("--out-dir", default=SERVICE_DIR)
+    args = parser.parse_args(argv)
+    server = serve(args.host, args.port, args.workers, args.queue, args.out_dir)
+    print(f"Serving on http://{args.host}:{args.port} ({args.workers} workers, {args.queue} queued)", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.jobs.shutdown()
+
+if __name__ == "__main__":
+    main()
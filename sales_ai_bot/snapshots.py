@@ -0,0 +1,305 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+import uuid
+from datetime import date, datetime
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from result_cache import mapping_key
+
+# On-disk analysis snapshots: python sales_ai_bot/snapshots.py list | show ID | diff OLD NEW
+# One folder per dataset hash + column mapping. meta.json indexes the stages
+# saved so far with their DAG cache keys; each stage is a JSON tree (scalars,
+# lists, dicts) whose DataFrames and Series live in Parquet files next to it.
+# Row-level stages (Stage.snapshot=False) and values that have no such
+# encoding are not saved; they are recomputed on reopen.
+# Loading a snapshot seeds the result cache for every stage whose key still
+# matches, so reopening an analysis recomputes nothing.
+SNAPSHOT_DIR = os.getenv("SALES_BOT_SNAPSHOT_DIR", "sales_ai_bot/snapshots")
+# Bumped when the on-disk layout changes; older snapshots are ignored and
+# replaced on the next save.
+SNAPSHOT_FORMAT = 2
+# Stages compared period over period by diff_snapshots.
+DIFF_STAGES = ("kpis", "summary", "forecast", "churn_count", "region_zone", "seasonality")
+DIFF_TOP = 10
+
+_lock = threading.Lock()
+
+def snapshot_id(dataset_key, cols):
+    return f"{str(dataset_key)[:16]}-{hashlib.sha1(mapping_key(cols).encode('utf-8')).hexdigest()[:8]}"
+
+def _write_table(df, path):
+    try:
+        df.to_parquet(path + ".parquet")
+    except Exception as e:
+        # mixed-type object columns etc. that Arrow cannot represent
+        raise TypeError(f"cannot store {os.path.basename(path)} as Parquet: {e}") from e
+    return path + ".parquet"
+
+def _read_table(path):
+    import pyarrow.parquet as pq
+    return pq.read_table(path, memory_map=True).to_pandas()
+
+def _encode(v, base, files):
+    if v is None or isinstance(v, (bool, int, float, str)):
+        return v
+    if isinstance(v, np.generic):
+        return v.item()
+    if isinstance(v, pd.DataFrame):
+        df = v
+        names = list(df.columns)
+        if not all(isinstance(c, str) for c in names):
+            df = df.set_axis([str(c) for c in names], axis=1)
+        files.append(os.path.basename(_write_table(df, f"{base}.{len(files)}")))
+        out = {"__frame__": files[-1]}
+        if df is not v:
+            out["columns"] = [_encode(c, base, files) for c in names]
+        return out
+    if isinstance(v, pd.Series):
+        files.append(os.path.basename(_write_table(v.to_frame("__value__"), f"{base}.{len(files)}")))
+        return {"__series__": files[-1], "name": _encode(v.name, base, files)}
+    if isinstance(v, (pd.Timestamp, datetime, date)):
+        return {"__ts__": v.isoformat()}
+    if isinstance(v, tuple):
+        return {"__tuple__": [_encode(x, base, files) for x in v]}
+    if isinstance(v, list):
+        return [_encode(x, base, files) for x in v]
+    if isinstance(v, dict):
+        if all(isinstance(k, str) and not k.startswith("__") for k in v):
+            return {k: _encode(x, base, files) for k, x in v.items()}
+        return {"__items__": [[_encode(k, base, files), _encode(x, base, files)] for k, x in v.items()]}
+    raise TypeError(f"cannot store {type(v).__name__} in a snapshot")
+
+def _decode(v, folder):
+    if isinstance(v, list):
+        return [_decode(x, folder) for x in v]
+    if not isinstance(v, dict):
+        return v
+    if "__frame__" in v:
+        df = _read_table(os.path.join(folder, v["__frame__"]))
+        if "columns" in v:
+            df.columns = [_decode(c, folder) for c in v["columns"]]
+        return df
+    if "__series__" in v:
+        return _read_table(os.path.join(folder, v["__series__"]))["__value__"].rename(_decode(v["name"], folder))
+    if "__ts__" in v:
+        return pd.Timestamp(v["__ts__"])
+    if "__tuple__" in v:
+        return tuple(_decode(x, folder) for x in v["__tuple__"])
+    if "__items__" in v:
+        return {_decode(k, folder): _decode(x, folder) for k, x in v["__items__"]}
+    return {k: _decode(x, folder) for k, x in v.items()}
+
+def _write_json(path, payload):
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(payload, f, default=str)
+    os.replace(tmp, path)
+
+def read_meta(sid, root=SNAPSHOT_DIR):
+    try:
+        with open(os.path.join(root, sid, "meta.json")) as f:
+            m = json.load(f)
+    except FileNotFoundError:
+        return None
+    return m if m.get("format") == SNAPSHOT_FORMAT else None
+
+def save_snapshot(run, meta=None, stages=None, root=SNAPSHOT_DIR):
+    # Writes the cacheable stages `run` holds (or `stages`) that the snapshot
+    # does not already have under the same key; returns the stages written.
+    sid = snapshot_id(run.dataset_key, run.cols)
+    folder = os.path.join(root, sid)
+    names = [n for n in (stages or list(run.values)) if n in run.values and run.dag.stages[n].cache and run.dag.stages[n].snapshot]
+    with _lock:
+        m = read_meta(sid, root)
+        if m is None:
+            # absent, or written in an older format: start over
+            shutil.rmtree(folder, ignore_errors=True)
+            m = {"id": sid, "format": SNAPSHOT_FORMAT, "dataset_key": run.dataset_key, "columns": run.cols, "created": time.time(), "stages": {}}
+        os.makedirs(folder, exist_ok=True)
+        m.update(meta or {})
+        written = []
+        for name in names:
+            key = run.key(name)[-1]
+            if m["stages"].get(name) == key:
+                continue
+            # new files get a fresh prefix so readers never see a half-written stage
+            base = os.path.join(folder, f"{name}-{uuid.uuid4().hex[:8]}")
+            files = []
+            try:
+                value = _encode(run.values[name], base, files)
+            except TypeError:
+                # not representable as JSON + Parquet; recomputed on reopen
+                _remove_files(folder, os.path.basename(base) + ".")
+                continue
+            _write_json(base + ".json", {"stage": name, "key": key, "value": value, "files": files})
+            old = m.setdefault("files", {}).get(name)
+            m["stages"][name] = key
+            m["files"][name] = os.path.basename(base) + ".json"
+            written.append(name)
+            if old:
+                _remove_stage(folder, old)
+        if written or meta:
+            m["updated"] = time.time()
+            _write_json(os.path.join(folder, "meta.json"), m)
+    return written
+
+def _remove_files(folder, prefix):
+    for name in os.listdir(folder):
+        if name.startswith(prefix):
+            os.remove(os.path.join(folder, name))
+
+def _remove_stage(folder, json_name):
+    path = os.path.join(folder, json_name)
+    try:
+        with open(path) as f:
+            files = json.load(f).get("files", [])
+    except FileNotFoundError:
+        return
+    for name in files + [json_name]:
+        try:
+            os.remove(os.path.join(folder, name))
+        except FileNotFoundError:
+            pass
+
+def load_snapshot(sid, stages=None, root=SNAPSHOT_DIR):
+    # -> {"meta": ..., "stages": {name: {"key": ..., "value": ...}}}; None if absent.
+    m = read_meta(sid, root)
+    if m is None:
+        return None
+    folder = os.path.join(root, sid)
+    out = {}
+    for name, json_name in m.get("files", {}).items():
+        if stages is not None and name not in stages:
+            continue
+        with open(os.path.join(folder, json_name)) as f:
+            payload = json.load(f)
+        out[name] = {"key": payload["key"], "value": _decode(payload["value"], folder)}
+    return {"meta": m, "stages": out}
+
+def seed_cache(run, snapshot):
+    # Puts snapshot values into run.cache under the run's own stage keys,
+    # only where the stored key matches (same mapping, params and upstream).
+    seeded = []
+    if snapshot is None or run.cache is None:
+        return seeded
+    for name, entry in snapshot["stages"].items():
+        if name in run.dag.stages and run.key(name)[-1] == entry["key"]:
+            key = run.key(name)
+            if key not in run.cache:
+                run.cache.put(key, entry["value"])
+            seeded.append(name)
+    return seeded
+
+def list_snapshots(root=SNAPSHOT_DIR):
+    if not os.path.isdir(root):
+        return []
+    metas = [read_meta(sid, root) for sid in os.listdir(root)]
+    return sorted([m for m in metas if m], key=lambda m: m.get("updated", 0), reverse=True)
+
+def resolve(ref, root=SNAPSHOT_DIR):
+    # Snapshot id, unique id prefix or source name (latest match).
+    for m in list_snapshots(root):
+        if m["id"] == ref:
+            return m["id"]
+    hits = [m for m in list_snapshots(root) if m["id"].startswith(ref) or m.get("name") == ref]
+    if not hits:
+        raise KeyError(f"no snapshot matches {ref!r}")
+    return hits[0]["id"]
+
+def _number(v):
+    return isinstance(v, (int, float, np.number)) and not isinstance(v, bool)
+
+def _change(a, b):
+    out = {"before": a, "after": b}
+    if _number(a) and _number(b):
+        out["change"] = b - a
+        out["pct"] = (b - a) / abs(a) if a else None
+    return out
+
+def _diff(a, b, top):
+    if _number(a) or _number(b):
+        return _change(a, b) if a != b else None
+    if isinstance(a, pd.Series) and isinstance(b, pd.Series) and pd.api.types.is_numeric_dtype(a) and pd.api.types.is_numeric_dtype(b):
+        joined = pd.concat([a.rename("before"), b.rename("after")], axis=1)
+        joined = joined[joined.index.notna()].fillna(0.0)
+        joined["change"] = joined["after"] - joined["before"]
+        moved = joined[joined["change"] != 0]
+        if moved.empty:
+            return None
+        moved = moved.reindex(moved["change"].abs().sort_values(ascending=False).index[:top])
+        return {
+            "added": [str(k) for k in b.index.difference(a.index)][:top],
+            "removed": [str(k) for k in a.index.difference(b.index)][:top],
+            "changes": {str(k): _change(float(r.before), float(r.after)) for k, r in moved.iterrows()},
+        }
+    if isinstance(a, pd.DataFrame) and isinstance(b, pd.DataFrame):
+        return _change(len(a), len(b)) if len(a) != len(b) else None
+    if isinstance(a, dict) and isinstance(b, dict):
+        out = {}
+        for k in list(a) + [k for k in b if k not in a]:
+            d = _diff(a.get(k), b.get(k), top)
+            if d:
+                out[str(k)] = d
+        return out or None
+    if isinstance(a, (pd.DataFrame, pd.Series)) or isinstance(b, (pd.DataFrame, pd.Series)):
+        return None if type(a) is type(b) else {"before": type(a).__name__, "after": type(b).__name__}
+    return None if a == b else {"before": a, "after": b}
+
+def diff_snapshots(old, new, stages=DIFF_STAGES, top=DIFF_TOP, root=SNAPSHOT_DIR):
+    # old/new: snapshot ids or loaded snapshots. Numbers get before/after/change/pct,
+    # numeric Series (top products, regions, ...) their largest per-item moves.
+    a = old if isinstance(old, dict) else load_snapshot(old, stages, root)
+    b = new if isinstance(new, dict) else load_snapshot(new, stages, root)
+    out = {"old": a["meta"]["id"], "new": b["meta"]["id"], "stages": {}}
+    for name in stages:
+        va = a["stages"].get(name, {}).get("value")
+        vb = b["stages"].get(name, {}).get("value")
+        d = _diff(va, vb, top)
+        if d:
+            out["stages"][name] = d
+    return out
+
+def _describe(m):
+    when = datetime.fromtimestamp(m.get("updated", m["created"])).strftime("%Y-%m-%d %H:%M")
+    return f"{m['id']}  {when}  {m.get('name', '')}  rows={m.get('rows', '?')}  stages={len(m['stages'])}"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="List, inspect and compare saved analysis snapshots.")
+    parser.add_argument("--dir", default=SNAPSHOT_DIR)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("list")
+    show = sub.add_parser("show")
+    show.add_argument("snapshot")
+    diff = sub.add_parser("diff")
+    diff.add_argument("old")
+    diff.add_argument("new")
+    diff.add_argument("--top", type=int, default=DIFF_TOP)
+    args = parser.parse_args(argv)
+
+    if args.cmd == "list":
+        for m in list_snapshots(args.dir):
+            print(_describe(m))
+        return 0
+    if args.cmd == "show":
+        start = time.perf_counter()
+        snap = load_snapshot(resolve(args.snapshot, args.dir), root=args.dir)
+        print(_describe(snap["meta"]))
+        print(f"loaded {len(snap['stages'])} stages in {(time.perf_counter() - start) * 1000:.0f} ms")
+        kpis = (snap["stages"].get("kpis") or {}).get("value") or {}
+        print(json.dumps(kpis, indent=2, default=str))
+        return 0
+    out = diff_snapshots(resolve(args.old, args.dir), resolve(args.new, args.dir), top=args.top, root=args.dir)
+    print(json.dumps(out, indent=2, default=str))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+import importlib.util
+import os
+import pandas as pd
+from analysis_engine import _recent_growth, _growth_by_group, _product_zones
+from perf import instrument
+
+DUCKDB = importlib.util.find_spec("duckdb") is not None
+
+# SQL execution backend: the file stays on disk and every aggregate is
+# pushed down to an in-process DuckDB query. Results use the same shapes as
+# the pandas functions in analysis_engine so the app can render either.
+
+def _q(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+def _num(col):
+    return f"COALESCE(TRY_CAST({_q(col)} AS DOUBLE), 0)"
+
+def _ts(col):
+    return f"TRY_CAST({_q(col)} AS TIMESTAMP)"
+
+def _reader(path):
+    p = path.replace("'", "''")
+    if path.endswith(".parquet") or os.path.isdir(path):
+        glob = p if not os.path.isdir(path) else os.path.join(p, "**", "*.parquet")
+        return f"read_parquet('{glob}', hive_partitioning = true)"
+    if path.endswith(".csv"):
+        return f"read_csv_auto('{p}')"
+    raise ValueError("SQL backend supports CSV and Parquet files only")
+
+@instrument()
+def open_sales(path, con=None, cols=None):
+    # cols: the confirmed mapping. A revenue column derived in pandas from
+    # quantity x price (see pipeline.prepare) is derived in the view as well.
+    if not DUCKDB:
+        raise RuntimeError("duckdb is not installed; use the pandas backend")
+    import duckdb
+    con = con or duckdb.connect()
+    src = _reader(path)
+    names = [r[0] for r in con.execute(f"DESCRIBE SELECT * FROM {src}").fetchall()]
+    lower = [str(n).lower().strip() for n in names]
+    select = [f"{_q(n)} AS {_q(l)}" for n, l in zip(names, lower)]
+    rev, qty, price = (cols or {}).get("revenue"), (cols or {}).get("quantity"), (cols or {}).get("price")
+    if rev and rev not in lower and qty in lower and price in lower:
+        select.append(f"{_num(names[lower.index(qty)])} * {_num(names[lower.index(price)])} AS {_q(rev)}")
+    con.execute(f"CREATE OR REPLACE VIEW sales AS SELECT {', '.join(select)} FROM {src}")
+    return con
+
+def register_upload(file, cache_dir="sales_ai_bot/cache/uploads"):
+    import hashlib
+    data = file.getvalue()
+    os.makedirs(cache_dir, exist_ok=True)
+    ext = os.path.splitext(file.name)[1].lower()
+    path = os.path.join(cache_dir, hashlib.sha256(data).hexdigest()[:24] + ext)
+    if not os.path.exists(path):
+        with open(path, "wb") as f:
+            f.write(data)
+    return path
+
+def _series(con, sql, index_name, value_name):
+    rows = con.execute(sql).fetchdf()
+    if len(rows) == 0:
+        return pd.Series([], dtype="float64", name=value_name)
+    s = pd.Series(rows["v"].astype("float64").values, index=pd.Index(rows["k"], name=index_name), name=value_name)
+    return s
+
+def _by_key(con, key, rev, limit=None):
+    lim = f" LIMIT {int(limit)}" if limit else ""
+    return _series(con, f"""
+        SELECT {_q(key)} AS k, SUM({_num(rev)}) AS v FROM sales
+        WHERE {_q(key)} IS NOT NULL GROUP BY 1 ORDER BY v DESC, k{lim}
+    """, key, rev)
+
+def _monthly(con, date, rev, group=None):
+    g = f", {_q(group)}" if group else ""
+    m = con.execute(f"""
+        SELECT last_day(date_trunc('month', {_ts(date)})) AS {_q(date)}{g}, SUM({_num(rev)}) AS {_q(rev)}
+        FROM sales WHERE {_ts(date)} IS NOT NULL {f"AND {_q(group)} IS NOT NULL" if group else ""}
+        GROUP BY ALL ORDER BY 1
+    """).fetchdf()
+    m[date] = pd.to_datetime(m[date])
+    if group or len(m) == 0:
+        return m
+    # Match pandas resample: empty months between first and last appear as 0.
+    full = pd.date_range(m[date].min(), m[date].max(), freq="ME")
+    return m.set_index(date).reindex(full, fill_value=0.0).rename_axis(date).reset_index()
+
+@instrument()
+def sales_summary(con, cols):
+    rev = cols.get("revenue")
+    if not rev:
+        raise ValueError("Revenue column not detected")
+    total = con.execute(f"SELECT SUM({_num(rev)}) FROM sales").fetchone()[0] or 0.0
+    out = {"total_revenue": float(total)}
+    for key, name in (("product", "top_products"), ("customer", "top_customers"), ("region", "top_regions")):
+        out[name] = _by_key(con, cols[key], rev, 5) if cols.get(key) else pd.Series([], dtype="float64")
+    return out
+
+@instrument()
+def product_zone_analysis(con, cols):
+    rev = cols.get("revenue")
+    prod = cols.get("product")
+    date = cols.get("date")
+    mar = cols.get("margin")
+    if not rev or not prod:
+        return pd.DataFrame(columns=["product", "revenue", "growth_pct", "revenue_percentile", "margin_value", "category"])
+    by_prod = _by_key(con, prod, rev)
+    growth = pd.Series(0.0, index=by_prod.index)
+    if date:
+        m = _monthly(con, date, rev, prod)
+        if len(m) > 0:
+            growth = _growth_by_group(m, prod, date, rev).reindex(by_prod.index).fillna(0.0)
+    margin_series = None
+    if mar:
+        margin_series = _by_key(con, prod, mar).reindex(by_prod.index).fillna(0.0)
+    return _product_zones(by_prod, growth, margin_series)
+
+@instrument()
+def customer_zone_analysis(con, cols):
+    rev = cols.get("revenue")
+    cust = cols.get("customer")
+    if not rev or not cust:
+        return {"by_customer": pd.Series([], dtype="float64"), "repeat_count": 0, "one_time_count": 0}
+    by_customer = _by_key(con, cust, rev)
+    repeat_count, one_time_count = con.execute(f"""
+        SELECT COUNT(*) FILTER (WHERE n > 1), COUNT(*) FILTER (WHERE n = 1)
+        FROM (SELECT COUNT(*) AS n FROM sales WHERE {_q(cust)} IS NOT NULL GROUP BY {_q(cust)})
+    """).fetchone()
+    return {"by_customer": by_customer, "repeat_count": int(repeat_count), "one_time_count": int(one_time_count)}
+
+@instrument()
+def region_zone_analysis(con, cols):
+    rev = cols.get("revenue")
+    reg = cols.get("region")
+    date = cols.get("date")
+    if not rev or not reg:
+        return {"by_region": pd.Series([], dtype="float64"), "growth": pd.Series([], dtype="float64")}
+    by_region = _by_key(con, reg, rev)
+    growth = pd.Series(0.0, index=by_region.index)
+    if date:
+        m = _monthly(con, date, rev, reg)
+        if len(m) > 0:
+            growth = _growth_by_group(m, reg, date, rev).reindex(by_region.index).fillna(0.0)
+    return {"by_region": by_region, "growth": growth}
+
+def top5_customer_pct(con, customer_col, revenue_col):
+    by = _by_key(con, customer_col, revenue_col)
+    total = float(by.sum())
+    if total == 0 or len(by) < 5:
+        return 0.0
+    return float(by.head(5).sum() / total * 100.0)
+
+@instrument()
+def compute_kpis(con, summary, cols):
+    rev = cols.get("revenue")
+    prod = cols.get("product")
+    cust = cols.get("customer")
+    date = cols.get("date")
+    total = float(summary.get("total_revenue", 0) or 0)
+    top5p = float(summary.get("top_products", pd.Series([], dtype="float64")).sum()) if prod else 0.0
+    top5c_pct = top5_customer_pct(con, cust, rev) if cust and rev else 0.0
+    kpis = {"total_revenue": total}
+    kpis["growth_pct"] = _recent_growth(_monthly(con, date, rev)[rev]) if date and rev else 0.0
+    kpis["top5_products_pct"] = (top5p / total) if total > 0 else 0.0
+    kpis["top5_customers_pct"] = (top5c_pct / 100.0) if total > 0 else 0.0
+    kpis["churn_rate"] = None
+    kpis["forecast_accuracy"] = None
+    return kpis
+
+@instrument()
+def churn_recency(con, customer_col, date_col):
+    # Same columns as upgrade.rfm.rfm_table, so it can be passed to churn_model(rfm=...).
+    out = con.execute(f"""
+        WITH last AS (
+            SELECT {_q(customer_col)} AS customer, MAX({_ts(date_col)}) AS last_purchase
+            FROM sales WHERE {_ts(date_col)} IS NOT NULL AND {_q(customer_col)} IS NOT NULL
+            GROUP BY 1
+        )
+        SELECT customer, last_purchase,
+               date_diff('day', last_purchase, (SELECT MAX(last_purchase) FROM last)) AS recency_days
+        FROM last
+    """).fetchdf()
+    out["last_purchase"] = pd.to_datetime(out["last_purchase"])
+    return out.rename(columns={"customer": customer_col})
@@ -1,8 +1,19 @@
+import threading
 import pandas as pd
 import numpy as np
-from sklearn.linear_model import LogisticRegression
-from sklearn.metrics import precision_score, recall_score
+from perf import instrument
 
+CHURN_DAYS = 90
+RECENCY_BIN_DAYS = 7
+HOLDOUT_PCT = 25
+SCORE_CHUNK = 1_000_000
+PRIOR_COEF = (-CHURN_DAYS / 15.0, 1 / 15.0)
+
+_SCORER_CACHE = {}
+_SCORER_CACHE_MAX = 32
+_SCORER_LOCK = threading.Lock()
+
+@instrument()
 def churn_risk(df, customer_col, date_col):
     df = df.copy()
     df[date_col] = pd.to_datetime(df[date_col], errors='coerce')
@@ -14,6 +25,7 @@ def churn_risk(df, customer_col, date_col):
     risky = last_purchase[last_purchase["days_inactive"] > 60]
     return risky
 
+@instrument()
 def churn_proba(df, customer_col, date_col):
     d = df.copy()
     d[date_col] = pd.to_datetime(d[date_col], errors='coerce')
@@ -26,26 +38,155 @@ def churn_proba(df, customer_col, date_col):
     out["p_churn"] = p
     return out
 
-def churn_model(df, customer_col, date_col):
+def _recency_table(df, customer_col, date_col):
     data = df[[customer_col, date_col]].copy()
     data[date_col] = pd.to_datetime(data[date_col], errors='coerce')
     data = data.dropna(subset=[date_col])
     last_date = data[date_col].max()
     churn_df = data.groupby(customer_col)[date_col].max().reset_index()
     churn_df["recency_days"] = (last_date - churn_df[date_col]).dt.days
-    churn_df["churn"] = (churn_df["recency_days"] > 90).astype(int)
-    X = churn_df[["recency_days"]]
-    y = churn_df["churn"]
-    model = LogisticRegression()
-    model.fit(X, y)
-    churn_df["p_churn"] = model.predict_proba(X)[:, 1]
-    threshold = 0.7
+    return churn_df
+
+def _holdout_mask(customers, holdout_pct=HOLDOUT_PCT):
+    h = pd.util.hash_pandas_object(customers, index=False).to_numpy()
+    return (h % 100) < holdout_pct
+
+def _fingerprint(churn_df, customer_col):
+    h = pd.util.hash_pandas_object(churn_df[[customer_col, "recency_days"]], index=False)
+    return (len(churn_df), int(h.sum()))
+
+def fit_churn_scorer(recency_days, labels, bin_days=RECENCY_BIN_DAYS, l2=1.0, iters=25):
+    # Logistic regression fitted by IRLS on binned recency counts, so the
+    # cost depends on the number of bins rather than the number of customers.
+    r = np.asarray(recency_days, dtype="float64")
+    y = np.asarray(labels, dtype="float64")
+    if len(r) == 0:
+        return PRIOR_COEF
+    bins = np.floor(r / bin_days).astype("int64")
+    bins -= bins.min()
+    n = np.bincount(bins)
+    k = np.bincount(bins, weights=y)
+    s = np.bincount(bins, weights=r)
+    keep = n > 0
+    n, k, x = n[keep], k[keep], s[keep] / n[keep]
+    if len(x) < 2 or k.sum() in (0, n.sum()):
+        return PRIOR_COEF
+    a, b = 0.0, 0.0
+    for _ in range(iters):
+        p = 1.0 / (1.0 + np.exp(-np.clip(a + b * x, -500, 500)))
+        w = n * p * (1.0 - p)
+        ga = float(np.sum(k - n * p))
+        gb = float(np.sum((k - n * p) * x)) - l2 * b
+        haa = float(np.sum(w)) + 1e-9
+        hab = float(np.sum(w * x))
+        hbb = float(np.sum(w * x * x)) + l2
+        det = haa * hbb - hab * hab
+        if det <= 0:
+            break
+        da = (hbb * ga - hab * gb) / det
+        db = (haa * gb - hab * ga) / det
+        a, b = a + da, b + db
+        if abs(da) < 1e-8 and abs(db) < 1e-10:
+            break
+    return (float(a), float(b))
+
+def score_churn(recency_days, coef, chunk_size=SCORE_CHUNK):
+    r = np.asarray(recency_days, dtype="float64")
+    out = np.empty(len(r), dtype="float64")
+    a, b = coef
+    for i in range(0, len(r), chunk_size):
+        z = a + b * r[i:i + chunk_size]
+        out[i:i + chunk_size] = 1.0 / (1.0 + np.exp(-np.clip(z, -500, 500)))
+    return out
+
+def _precision_recall(y, flagged):
+    tp = int(np.sum(flagged & y))
+    fp = int(np.sum(flagged & ~y))
+    fn = int(np.sum(~flagged & y))
+    precision = tp / (tp + fp) if tp + fp > 0 else 0.0
+    recall = tp / (tp + fn) if tp + fn > 0 else 0.0
+    return precision, recall
+
+def cached_churn_scorer(churn_df, customer_col):
+    key = _fingerprint(churn_df, customer_col)
+    hit = _SCORER_CACHE.get(key)
+    if hit is not None:
+        return hit
+    y = (churn_df["recency_days"] > CHURN_DAYS).to_numpy()
+    hold = _holdout_mask(churn_df[customer_col])
+    if hold.all() or not hold.any():
+        hold = np.zeros(len(churn_df), dtype=bool)
+    train = ~hold
+    coef = fit_churn_scorer(churn_df["recency_days"].to_numpy()[train], y[train])
+    entry = {"coef": coef, "holdout": hold}
+    with _SCORER_LOCK:
+        if len(_SCORER_CACHE) >= _SCORER_CACHE_MAX:
+            _SCORER_CACHE.pop(next(iter(_SCORER_CACHE)))
+        _SCORER_CACHE[key] = entry
+    return entry
+
+@instrument()
+def churn_model(df, customer_col, date_col, threshold=0.7, chunk_size=SCORE_CHUNK, rfm=None):
+    if rfm is not None:
+        churn_df = rfm[[customer_col, "last_purchase", "recency_days"]].rename(columns={"last_purchase": date_col})
+    else:
+        churn_df = _recency_table(df, customer_col, date_col)
+    churn_df["churn"] = (churn_df["recency_days"] > CHURN_DAYS).astype(int)
+    scorer = cached_churn_scorer(churn_df, customer_col)
+    churn_df["p_churn"] = score_churn(churn_df["recency_days"].to_numpy(), scorer["coef"], chunk_size)
     churn_df["flagged"] = churn_df["p_churn"] > threshold
-    precision = precision_score(y, churn_df["flagged"])
-    recall = recall_score(y, churn_df["flagged"])
+    hold = scorer["holdout"]
+    y = churn_df["churn"].to_numpy().astype(bool)
+    flagged = churn_df["flagged"].to_numpy()
+    if hold.any():
+        precision, recall = _precision_recall(y[hold], flagged[hold])
+    else:
+        precision, recall = _precision_recall(y, flagged)
     return {
         "threshold": threshold,
         "customers_at_risk": churn_df[churn_df["flagged"]],
         "precision": round(float(precision), 2),
-        "recall": round(float(recall), 2)
+        "recall": round(float(recall), 2),
+        "coefficients": scorer["coef"],
+        "holdout_customers": int(hold.sum())
     }
+
+def stream_churn_scores(chunks, customer_col, date_col, coef=None, threshold=0.7):
+    # Updates the customer-state table (last purchase per customer) chunk by
+    # chunk and yields scores for the customers touched by each chunk. Only
+    # those customers' entries are looked up and written; the table is never
+    # regrouped, so a chunk no longer costs a sort of every customer seen.
+    # Recency is measured against the latest date seen so far: scores yielded
+    # for earlier chunks are not revised when a later chunk moves that date
+    # on, so a customer's final score is the last one yielded for them (or
+    # rescore all customers once the stream ends).
+    coef = coef or PRIOR_COEF
+    # state: customer index + last purchase (int64 ns) in the same order;
+    # new customers are appended, so existing positions never move.
+    known, state = None, None
+    last_date = None
+    for chunk in chunks:
+        d = chunk[[customer_col, date_col]].copy()
+        d[date_col] = pd.to_datetime(d[date_col], errors='coerce')
+        d = d.dropna(subset=[date_col])
+        if len(d) == 0:
+            continue
+        latest = d.groupby(customer_col)[date_col].max()
+        merged = latest.to_numpy(dtype="datetime64[ns]").view("int64").copy()
+        if known is None:
+            known, state = latest.index, merged.copy()
+        else:
+            pos = known.get_indexer(latest.index)
+            old = pos >= 0
+            merged[old] = np.maximum(state[pos[old]], merged[old])
+            state[pos[old]] = merged[old]
+            if not old.all():
+                known = known.append(latest.index[~old])
+                state = np.concatenate([state, merged[~old]])
+        chunk_max = latest.max()
+        last_date = chunk_max if last_date is None else max(last_date, chunk_max)
+        out = pd.DataFrame({customer_col: latest.index, date_col: merged.view("datetime64[ns]")})
+        out["recency_days"] = (last_date - out[date_col]).dt.days
+        out["p_churn"] = score_churn(out["recency_days"].to_numpy(), coef)
+        out["flagged"] = out["p_churn"] > threshold
+        yield out
@@ -1,18 +1,23 @@
+import importlib.util
 import pandas as pd
 import numpy as np
-from sklearn.metrics import mean_absolute_percentage_error, mean_squared_error
-from sklearn.linear_model import LinearRegression
+from perf import instrument
 
-try:
-    from prophet import Prophet
-    PROPHET = True
-except Exception:
-    PROPHET = False
+# scikit-learn and prophet are imported on first forecast, not at app start.
+PROPHET = importlib.util.find_spec("prophet") is not None
+
+def _prophet():
+    try:
+        from prophet import Prophet
+        return Prophet
+    except Exception:
+        return None
 
 def naive_forecast(series, h):
     return np.repeat(series.iloc[-1], h)
 
 def linear_forecast(series, h):
+    from sklearn.linear_model import LinearRegression
     X = np.arange(len(series)).reshape(-1, 1)
     y = series.values
     model = LinearRegression()
@@ -20,23 +25,26 @@ def linear_forecast(series, h):
     future_X = np.arange(len(series), len(series) + h).reshape(-1, 1)
     return model.predict(future_X)
 
+@instrument()
 def forecast_sales(df, date_col, revenue_col, model="linear", val_months=3):
+    from sklearn.metrics import mean_absolute_percentage_error, mean_squared_error
     data = df[[date_col, revenue_col]].copy()
     data[date_col] = pd.to_datetime(data[date_col])
     data[revenue_col] = pd.to_numeric(data[revenue_col], errors="coerce")
     data = data.dropna()
-    monthly = data.resample("M", on=date_col)[revenue_col].sum()
+    monthly = data.resample("ME", on=date_col)[revenue_col].sum()
     if len(monthly) < val_months + 3:
         raise ValueError("Insufficient data for forecasting")
     train = monthly[:-val_months]
     valid = monthly[-val_months:]
-    if model == "prophet" and PROPHET:
+    Prophet = _prophet() if model == "prophet" and PROPHET else None
+    if Prophet is not None:
         pdf = train.reset_index().rename(columns={date_col: "ds", revenue_col: "y"})
         m = Prophet()
         m.fit(pdf)
-        future = m.make_future_dataframe(periods=val_months, freq="M")
+        future = m.make_future_dataframe(periods=val_months, freq="ME")
         pred = m.predict(future).tail(val_months)["yhat"].values
-        next_fc = m.predict(m.make_future_dataframe(periods=1, freq="M")).tail(1)["yhat"].iloc[0]
+        next_fc = m.predict(m.make_future_dataframe(periods=1, freq="ME")).tail(1)["yhat"].iloc[0]
         used_model = "PROPHET"
     else:
         pred = linear_forecast(train, val_months)
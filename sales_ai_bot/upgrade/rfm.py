@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+from perf import instrument
+
+RFM_BINS = 5
+RFM_CHUNK_ROWS = 2_000_000
+
+def _partial_rfm(df, customer_col, date_col, revenue_col, order_col=None):
+    # Returns (per-customer aggregates, distinct (customer, order) pairs or None).
+    use = [customer_col, date_col, revenue_col] + ([order_col] if order_col else [])
+    d = df[use].copy()
+    d[date_col] = pd.to_datetime(d[date_col], errors="coerce")
+    d[revenue_col] = pd.to_numeric(d[revenue_col], errors="coerce").fillna(0)
+    d = d.dropna(subset=[customer_col, date_col])
+    g = d.groupby(customer_col, sort=False)
+    aggs = {
+        "last_purchase": (date_col, "max"),
+        "monetary": (revenue_col, "sum"),
+    }
+    if not order_col:
+        return g.agg(frequency=(date_col, "size"), **aggs), None
+    pairs = d[[customer_col, order_col]].dropna().drop_duplicates()
+    return g.agg(**aggs), pairs
+
+def _merge_partials(parts):
+    # Order frequency stays as distinct (customer, order) pairs until the end,
+    # so an order split across two chunks is still counted once.
+    states = [state for state, _ in parts]
+    pairs = [p for _, p in parts if p is not None]
+    if len(states) == 1:
+        state = states[0]
+    else:
+        both = pd.concat(states)
+        g = both.groupby(level=0, sort=False)
+        state = pd.DataFrame({
+            "last_purchase": g["last_purchase"].max(),
+            "monetary": g["monetary"].sum(),
+        })
+        if "frequency" in both.columns:
+            state["frequency"] = g["frequency"].sum()
+    if not pairs:
+        return state, None
+    return state, pairs[0] if len(pairs) == 1 else pd.concat(pairs).drop_duplicates()
+
+def _frequency(state, pairs):
+    if pairs is None:
+        return state
+    orders = pairs.groupby(pairs.columns[0], sort=False).size()
+    return state.assign(frequency=orders.reindex(state.index, fill_value=0))
+
+def _score(values, bins=RFM_BINS, higher_is_better=True):
+    v = values if higher_is_better else -values
+    pct = v.rank(method="average", pct=True).to_numpy()
+    return np.clip(np.ceil(pct * bins), 1, bins).astype("int8")
+
+def _finish(state, customer_col, bins=RFM_BINS, as_of=None):
+    as_of = as_of if as_of is not None else state["last_purchase"].max()
+    out = state.rename_axis(customer_col).reset_index()
+    out["recency_days"] = (as_of - out["last_purchase"]).dt.days.astype("int32")
+    out["frequency"] = out["frequency"].astype("int32")
+    out["r_score"] = _score(out["recency_days"], bins, higher_is_better=False)
+    out["f_score"] = _score(out["frequency"], bins)
+    out["m_score"] = _score(out["monetary"], bins)
+    out["rfm_score"] = (out["r_score"].astype("int16") * 100 + out["f_score"].astype("int16") * 10 + out["m_score"]).astype("int16")
+    return out[[customer_col, "last_purchase", "recency_days", "frequency", "monetary", "r_score", "f_score", "m_score", "rfm_score"]]
+
+@instrument()
+def rfm_table(df, customer_col, date_col, revenue_col, order_col=None, bins=RFM_BINS, chunk_rows=RFM_CHUNK_ROWS):
+    cols = [customer_col, "last_purchase", "recency_days", "frequency", "monetary", "r_score", "f_score", "m_score", "rfm_score"]
+    if not customer_col or not date_col or not revenue_col or len(df) == 0:
+        return pd.DataFrame(columns=cols)
+    parts = [
+        _partial_rfm(df.iloc[i:i + chunk_rows], customer_col, date_col, revenue_col, order_col)
+        for i in range(0, len(df), chunk_rows)
+    ]
+    state, pairs = _merge_partials(parts)
+    if len(state) == 0:
+        return pd.DataFrame(columns=cols)
+    return _finish(_frequency(state, pairs), customer_col, bins)
+
+def rfm_from_chunks(chunks, customer_col, date_col, revenue_col, order_col=None, bins=RFM_BINS):
+    # Folds each chunk into the running per-customer state so only one chunk
+    # plus the customer table (and its distinct orders) is held in memory.
+    state = None
+    for chunk in chunks:
+        part = _partial_rfm(chunk, customer_col, date_col, revenue_col, order_col)
+        state = part if state is None else _merge_partials([state, part])
+    if state is None or len(state[0]) == 0:
+        return rfm_table(pd.DataFrame(), customer_col, date_col, revenue_col)
+    return _finish(_frequency(*state), customer_col, bins)
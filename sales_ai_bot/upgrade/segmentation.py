@@ -1,10 +1,141 @@
-from sklearn.cluster import KMeans
+import numpy as np
+from perf import instrument
 
-def customer_segmentation(df, customer_col, revenue_col):
-    customer_sales = df.groupby(customer_col)[revenue_col].sum().reset_index()
+SEGMENT_METHODS = ("breaks", "minibatch", "sampled")
+SAMPLE_SIZE = 200_000
+ASSIGN_CHUNK = 500_000
+RFM_FEATURES = ["recency_days", "frequency", "monetary"]
+
+def _segment_cost(W, S, Q, i, j):
+    n = W[j] - W[i]
+    s = S[j] - S[i]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        c = (Q[j] - Q[i]) - s * s / n
+    return np.where(n > 0, c, np.inf)
+
+def _dp_layer(prev, W, S, Q, k, m):
+    # One layer of the 1-D k-means DP. The optimal split point is monotone in
+    # j, so each divide-and-conquer level is evaluated as one vectorized pass.
+    cur = np.full(m + 1, np.inf)
+    arg = np.zeros(m + 1, dtype="int64")
+    jlo = np.array([k]); jhi = np.array([m])
+    olo = np.array([k - 1]); ohi = np.array([m - 1])
+    while len(jlo):
+        mid = (jlo + jhi) // 2
+        hi = np.minimum(ohi, mid - 1)
+        span = hi - olo + 1
+        task = np.repeat(np.arange(len(mid)), span)
+        starts = np.repeat(np.cumsum(span) - span, span)
+        i = np.repeat(olo, span) + (np.arange(len(task)) - starts)
+        j = mid[task]
+        val = prev[i] + _segment_cost(W, S, Q, i, j)
+        best = np.minimum.reduceat(val, np.cumsum(span) - span)
+        hit = np.flatnonzero(val == best[task])
+        first = np.flatnonzero(np.diff(task[hit], prepend=-1))
+        opt = i[hit[first]]
+        cur[mid] = best
+        arg[mid] = opt
+        left = jlo <= mid - 1
+        right = mid + 1 <= jhi
+        jlo, jhi, olo, ohi = (
+            np.concatenate([jlo[left], mid[right] + 1]),
+            np.concatenate([mid[left] - 1, jhi[right]]),
+            np.concatenate([olo[left], opt[right]]),
+            np.concatenate([opt[left], ohi[right]]),
+        )
+    return cur, arg
+
+def optimal_breaks(values, n_segments=3):
+    v = np.asarray(values, dtype="float64")
+    v = v[np.isfinite(v)]
+    if len(v) == 0 or n_segments < 2:
+        return np.array([], dtype="float64")
+    x, w = np.unique(v, return_counts=True)
+    m = len(x)
+    if m <= n_segments:
+        return x[1:]
+    W = np.concatenate([[0.0], np.cumsum(w)])
+    S = np.concatenate([[0.0], np.cumsum(w * x)])
+    Q = np.concatenate([[0.0], np.cumsum(w * x * x)])
+    prev = _segment_cost(W, S, Q, np.zeros(m + 1, dtype="int64"), np.arange(m + 1))
+    args = []
+    for k in range(2, n_segments):
+        prev, arg = _dp_layer(prev, W, S, Q, k, m)
+        args.append(arg)
+    # The last layer is only needed at j == m, a single linear scan.
+    i = np.arange(n_segments - 1, m)
+    j = n_segments - 1 + int(np.argmin(prev[i] + _segment_cost(W, S, Q, i, m)))
+    cuts = [j]
+    for arg in reversed(args):
+        j = int(arg[j])
+        cuts.append(j)
+    return x[sorted(cuts)]
+
+def _standardize(X):
+    mu = X.mean(axis=0)
+    sd = X.std(axis=0)
+    sd[sd == 0] = 1.0
+    return (X - mu) / sd, mu, sd
+
+def _assign(X, centers, chunk_size=ASSIGN_CHUNK):
+    out = np.empty(len(X), dtype="int64")
+    cc = (centers ** 2).sum(axis=1)
+    for i in range(0, len(X), chunk_size):
+        part = X[i:i + chunk_size]
+        d = cc[None, :] - 2.0 * part @ centers.T
+        out[i:i + chunk_size] = d.argmin(axis=1)
+    return out
+
+def _order_by_value(labels, value, n_segments):
+    means = np.full(n_segments, -np.inf)
+    sums = np.bincount(labels, weights=value, minlength=n_segments)
+    counts = np.bincount(labels, minlength=n_segments)
+    seen = counts > 0
+    means[seen] = sums[seen] / counts[seen]
+    rank = np.empty(n_segments, dtype="int64")
+    rank[np.argsort(means, kind="stable")] = np.arange(n_segments)
+    return rank[labels]
+
+def segment_values(features, value, n_segments=3, method="breaks", sample_size=SAMPLE_SIZE, chunk_size=ASSIGN_CHUNK, random_state=42):
+    # Labels run from 0 (lowest mean value) to n_segments - 1 (highest); in
+    # "breaks" mode missing values are left unsegmented (-1).
+    value = np.asarray(value, dtype="float64")
+    if method not in SEGMENT_METHODS:
+        raise ValueError(f"Unknown segmentation method: {method}")
+    if method == "breaks":
+        breaks = optimal_breaks(value, n_segments)
+        labels = np.searchsorted(breaks, value, side="right")
+        labels[np.isnan(value)] = -1
+        return labels
+    X = np.asarray(features, dtype="float64")
+    if X.ndim == 1:
+        X = X.reshape(-1, 1)
+    X, _, _ = _standardize(X)
+    k = min(n_segments, len(X))
+    if method == "minibatch":
+        from sklearn.cluster import MiniBatchKMeans
+        model = MiniBatchKMeans(n_clusters=k, random_state=random_state, batch_size=min(len(X), 4096), n_init=3)
+        labels = model.fit_predict(X)
+    else:
+        from sklearn.cluster import KMeans
+        rng = np.random.default_rng(random_state)
+        fit_rows = X if len(X) <= sample_size else X[rng.choice(len(X), sample_size, replace=False)]
+        model = KMeans(n_clusters=k, random_state=random_state, n_init="auto").fit(fit_rows)
+        labels = _assign(X, model.cluster_centers_, chunk_size)
+    return _order_by_value(labels, value, n_segments)
+
+@instrument()
+def customer_segmentation(df, customer_col, revenue_col, rfm=None, method="breaks", n_segments=3, features=None):
+    if rfm is not None:
+        customer_sales = rfm[[customer_col, "monetary"]].rename(columns={"monetary": revenue_col})
+    else:
+        customer_sales = df.groupby(customer_col)[revenue_col].sum().reset_index()
     if len(customer_sales) == 0:
         customer_sales["segment"] = []
         return customer_sales
-    kmeans = KMeans(n_clusters=3, random_state=42, n_init='auto')
-    customer_sales["segment"] = kmeans.fit_predict(customer_sales[[revenue_col]])
+    value = customer_sales[revenue_col].to_numpy()
+    if features is None:
+        features = RFM_FEATURES if rfm is not None else [revenue_col]
+    source = rfm if rfm is not None else customer_sales
+    customer_sales["segment"] = segment_values(source[features].to_numpy(), value, n_segments, method)
     return customer_sales
@@ -0,0 +1,97 @@
+import socket
+import time
+from email import message_from_bytes, policy
+import pytest
+
+pytest.importorskip("aiosmtpd")
+from aiosmtpd.controller import Controller
+
+import emailer
+
+class Handler:
+    # bad*: permanently refused; tmp*: refused with 451 `soft` times, then accepted.
+    def __init__(self, soft=1):
+        self.soft = soft
+        self.refusals = 0
+        self.messages = []
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith("bad"):
+            return "550 no such user"
+        if address.startswith("tmp") and self.refusals < self.soft:
+            self.refusals += 1
+            return "451 try again later"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append((list(envelope.rcpt_tos), message_from_bytes(envelope.content, policy=policy.default)))
+        return "250 OK"
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+@pytest.fixture
+def smtp(request):
+    handler = Handler(getattr(request, "param", 1))
+    controller = Controller(handler, hostname="127.0.0.1", port=_free_port())
+    controller.start()
+    yield handler, controller.port
+    controller.stop()
+
+@pytest.fixture
+def pdf(tmp_path):
+    path = tmp_path / "report.pdf"
+    path.write_bytes(b"%PDF-1.4 test")
+    return str(path)
+
+def _mailer(port, **kw):
+    return emailer.Mailer("reports@example.com", host="127.0.0.1", port=port, security="none", **dict(dict(batch_size=2, rate=0, backoff=0.05), **kw))
+
+def test_batches_retries_and_statuses(smtp, pdf):
+    handler, port = smtp
+    mailer = _mailer(port)
+    try:
+        job = emailer.queue_report(pdf, ["a@x.test", "b@x.test", "bad@x.test", "tmp@x.test", "c@x.test"], mailer=mailer).wait(10)
+    finally:
+        mailer.close()
+    assert job.status == "partial"
+    assert job.counts() == {"sent": 4, "failed": 1}
+    assert job.failed()["bad@x.test"].startswith("550")
+    assert job.recipients["tmp@x.test"]["attempts"] == 2
+    delivered = sorted(r for rcpts, _ in handler.messages for r in rcpts)
+    assert delivered == ["a@x.test", "b@x.test", "c@x.test", "tmp@x.test"]
+    for rcpts, msg in handler.messages:
+        assert len(rcpts) <= 2
+        assert msg["Subject"] == "AI Sales Strategy Report"
+        assert set(rcpts) <= {a.strip() for a in msg["To"].split(",")}
+        assert [p.get_filename() for p in msg.iter_attachments()] == ["report.pdf"]
+
+def test_send_report_raises_on_failed_recipients(smtp, pdf):
+    _, port = smtp
+    mailer = _mailer(port)
+    try:
+        with pytest.raises(RuntimeError, match="1 of 2"):
+            emailer.send_report(pdf, ["a@x.test", "bad@x.test"], mailer=mailer)
+    finally:
+        mailer.close()
+
+@pytest.mark.parametrize("smtp", [100], indirect=True)
+def test_close_fails_pending_retries(smtp, pdf):
+    _, port = smtp
+    mailer = _mailer(port, backoff=60)
+    job = emailer.queue_report(pdf, ["a@x.test", "tmp@x.test"], mailer=mailer)
+    deadline = time.monotonic() + 10
+    while job.recipients["tmp@x.test"]["status"] != "retrying" and time.monotonic() < deadline:
+        time.sleep(0.01)
+    start = time.monotonic()
+    mailer.close()
+    assert job.wait(5).done()
+    assert time.monotonic() - start < 5
+    assert job.status == "partial"
+    assert "mailer closed before retry" in job.failed()["tmp@x.test"]
+    assert job.recipients["tmp@x.test"]["attempts"] == 1
+    with pytest.raises(RuntimeError):
+        mailer.submit(["a@x.test"], "late", b"")
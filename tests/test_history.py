@@ -0,0 +1,45 @@
+import pandas as pd
+import pytest
+
+import history
+
+def _cube(rows):
+    # rows: (month, dimension, member, revenue)
+    return pd.DataFrame(rows, columns=["month", "dimension", "member", "revenue"])
+
+def _run(cube):
+    return {"kpis": {"total_revenue": float(cube[cube["dimension"] == "total"]["revenue"].sum())}, "monthly_cube": cube, "rows": 10}
+
+@pytest.fixture
+def db(tmp_path):
+    return str(tmp_path / "history.sqlite")
+
+def test_newer_upload_replaces_the_months_it_covers(db):
+    history.record_run("acme", _run(_cube([
+        ("2024-01", "total", "", 100.0), ("2024-01", "region", "East", 60.0), ("2024-01", "region", "West", 40.0),
+        ("2024-02", "total", "", 200.0), ("2024-02", "region", "East", 120.0), ("2024-02", "region", "West", 80.0),
+    ])), "file-1", db=db)
+    # February is re-sent: West drops into "(other)" and a new member appears
+    history.record_run("acme", _run(_cube([
+        ("2024-02", "total", "", 150.0), ("2024-02", "region", "East", 90.0), ("2024-02", "region", "(other)", 50.0), ("2024-02", "region", "North", 10.0),
+        ("2024-03", "total", "", 120.0), ("2024-03", "region", "East", 120.0),
+    ])), "file-2", db=db)
+    total = history.monthly_series("acme", db=db)["revenue"]
+    regions = history.monthly_series("acme", "region", db=db)
+    assert list(total.index) == ["2024-01", "2024-02", "2024-03"]
+    assert total["2024-02"] == 150.0
+    pd.testing.assert_series_equal(regions.sum(axis=1), total, check_names=False)
+    assert pd.isna(regions.loc["2024-02", "West"])
+
+def test_rerecording_a_file_drops_months_it_no_longer_has(db):
+    history.record_run("acme", _run(_cube([("2024-01", "total", "", 1.0), ("2024-02", "total", "", 1.0)])), "file-1", db=db)
+    history.record_run("acme", _run(_cube([("2024-01", "total", "", 2.0)])), "file-1", db=db)
+    assert history.monthly_series("acme", db=db)["revenue"].to_dict() == {"2024-01": 2.0}
+    assert len(history.kpi_history("acme", db=db)) == 1
+
+def test_monthly_series_without_monthly_rows(db):
+    # a file without a date column records KPIs but no cube
+    history.record_run("acme", {"kpis": {"total_revenue": 5.0}, "monthly_cube": None, "rows": 3}, "file-1", db=db)
+    assert list(history.monthly_series("acme", db=db).columns) == ["revenue"]
+    assert history.monthly_series("acme", db=db).empty
+    assert history.monthly_series("acme", "region", db=db).empty
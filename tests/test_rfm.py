@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from upgrade.rfm import rfm_table, rfm_from_chunks
+
+@pytest.fixture
+def sales():
+    rng = np.random.default_rng(7)
+    n = 5_000
+    # several lines per order, so orders straddle the chunk boundaries
+    order = np.sort(rng.integers(0, 1_200, n))
+    return pd.DataFrame({
+        "customer": (order % 300).astype(str),
+        "order": order,
+        "date": pd.Timestamp("2024-01-01") + pd.to_timedelta(order // 4, unit="D"),
+        "revenue": rng.gamma(2.0, 50.0, n).round(2),
+    })
+
+@pytest.mark.parametrize("order_col", [None, "order"])
+def test_chunked_rfm_matches_single_pass(sales, order_col):
+    args = ("customer", "date", "revenue", order_col)
+    single = rfm_table(sales, *args).set_index("customer").sort_index()
+    chunked = rfm_table(sales, *args, chunk_rows=333).set_index("customer").sort_index()
+    streamed = rfm_from_chunks((sales.iloc[i:i + 333] for i in range(0, len(sales), 333)), *args).set_index("customer").sort_index()
+    for other in (chunked, streamed):
+        pd.testing.assert_series_equal(other["frequency"], single["frequency"])
+        pd.testing.assert_series_equal(other["monetary"], single["monetary"], rtol=1e-9)
+        pd.testing.assert_series_equal(other["recency_days"], single["recency_days"])
+    if order_col:
+        assert (single["frequency"] == sales.groupby("customer")["order"].nunique().sort_index()).all()
@@ -0,0 +1,138 @@
+import http.client
+import json
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+import pytest
+
+import service
+
+def _sales_csv(rows=600):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "order_date": (pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 360, rows), unit="D")).strftime("%Y-%m-%d"),
+        "customer_id": rng.integers(1, 80, rows),
+        "product_name": rng.choice(["Widget", "Gadget", "Gizmo", "Doohickey", "Sprocket", "Flange"], rows),
+        "region": rng.choice(["North", "South", "East", "West"], rows),
+        "revenue": rng.gamma(2.0, 50.0, rows).round(2),
+    })
+    return df.to_csv(index=False).encode("utf-8")
+
+@pytest.fixture
+def server(tmp_path, monkeypatch, request):
+    # Workers are spawned into the same working directory, so reports and
+    # chart caches land in tmp_path.
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("SALES_BOT_CHART_CACHE", str(tmp_path / "charts"))
+    workers, queue = getattr(request, "param", (1, 2))
+    srv = service.serve("127.0.0.1", 0, workers=workers, max_queue=queue, out_dir=str(tmp_path / "service"))
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+    srv.jobs.shutdown()
+
+def _conn(srv):
+    return http.client.HTTPConnection(*srv.server_address, timeout=120)
+
+def _post(srv, body, query="?name=sales.csv"):
+    c = _conn(srv)
+    c.request("POST", "/jobs" + query, body=body, headers={"Content-Type": "text/csv"})
+    r = c.getresponse()
+    return r, json.loads(r.read())
+
+def test_submit_stream_and_download(server):
+    r, body = _post(server, _sales_csv())
+    assert r.status == 202
+    c = _conn(server)
+    c.request("GET", body["events"])
+    r = c.getresponse()
+    assert r.getheader("Content-Type") == "application/x-ndjson"
+    events = [json.loads(line) for line in r.read().splitlines()]
+    stages = [e["stage"] for e in events]
+    assert stages[0] == "load" and stages[-1] == "done"
+    assert "columns" in stages
+
+    c = _conn(server)
+    c.request("GET", body["status"])
+    job = json.loads(c.getresponse().read())
+    assert job["status"] == "done"
+    assert job["result"]["metrics"]["rows"] == 600
+    assert job["artifacts"]
+
+    c = _conn(server)
+    c.request("GET", next(iter(job["artifacts"].values())))
+    r = c.getresponse()
+    assert r.status == 200
+    assert r.getheader("Content-Type") == "application/pdf"
+    assert r.read().startswith(b"%PDF")
+
+@pytest.fixture
+def gate(server, monkeypatch):
+    # Jobs run on a thread in this process and block until the gate opens,
+    # so the test decides when a slot frees up.
+    opened = threading.Event()
+
+    def run_job(job_id, path, out_dir, pdf=True):
+        os.makedirs(out_dir, exist_ok=True)
+        open(os.path.join(out_dir, "report.pdf"), "wb").close()
+        opened.wait(60)
+        return {}
+    monkeypatch.setattr(service, "run_job", run_job)
+    server.jobs.pool.shutdown()
+    server.jobs.pool = ThreadPoolExecutor(server.jobs.workers)
+    yield opened
+    opened.set()
+
+def _wait_done(srv, job_id):
+    deadline = time.time() + 60
+    while srv.jobs.get(job_id)["status"] not in service.TERMINAL:
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+def _uploads(srv):
+    return sorted(os.listdir(os.path.join(srv.jobs.out_dir, "uploads")))
+
+@pytest.mark.parametrize("server", [(1, 0)], indirect=True)
+def test_queue_full_returns_429(server, gate):
+    # one worker, no queue: the first job holds the only slot until the gate opens
+    first, body = _post(server, _sales_csv(), "?name=a.csv&pdf=0")
+    assert first.status == 202
+    r, rejected = _post(server, _sales_csv(rows=700), "?name=b.csv&pdf=0")
+    assert r.status == 429
+    assert r.getheader("Retry-After") == "5"
+    assert rejected["capacity"] == 1
+    # the rejected body was never written
+    assert len(_uploads(server)) == 1
+    gate.set()
+    _wait_done(server, body["id"])
+    r, _ = _post(server, _sales_csv(rows=700), "?name=b.csv&pdf=0")
+    assert r.status == 202
+
+def test_evicted_jobs_remove_their_files(server, gate, monkeypatch):
+    monkeypatch.setattr(service, "JOB_HISTORY", 1)
+    gate.set()
+    ids = []
+    for rows in (600, 700):
+        r, body = _post(server, _sales_csv(rows), "?name=a.csv&pdf=0")
+        assert r.status == 202
+        _wait_done(server, body["id"])
+        ids.append(body["id"])
+    assert server.jobs.get(ids[0]) is None
+    assert not os.path.exists(os.path.join(server.jobs.out_dir, ids[0]))
+    assert os.path.exists(os.path.join(server.jobs.out_dir, ids[1], "report.pdf"))
+    assert _uploads(server) == [server.jobs.get(ids[1])["file"]]
+
+def test_truncated_upload_is_rejected(server):
+    with socket.create_connection(server.server_address, timeout=30) as s:
+        s.sendall(b"POST /jobs?name=sales.csv HTTP/1.1\r\nHost: x\r\nContent-Type: text/csv\r\nContent-Length: 1000\r\n\r\norder_date,revenue\n")
+        s.shutdown(socket.SHUT_WR)
+        reply = s.makefile("rb").read()
+    assert reply.startswith(b"HTTP/1.0 400")
+    assert b"truncated" in reply
+    assert server.jobs.stats()["queued"] == 0
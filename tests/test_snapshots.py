@@ -0,0 +1,42 @@
+import os
+
+import pandas as pd
+
+from dag import Stage, AnalysisDAG
+from result_cache import ResultCache
+import snapshots
+
+DAG = AnalysisDAG([
+    Stage("rows", lambda c: c.df.copy(), snapshot=False),
+    Stage("by_region", lambda c, rows: rows.groupby("region")["revenue"].sum(), deps=("rows",)),
+    Stage("totals", lambda c, by_region: {"revenue": float(by_region.sum()), "top": by_region.idxmax()}, deps=("by_region",)),
+    Stage("model", lambda c: object()),
+])
+
+def _run():
+    df = pd.DataFrame({"region": ["East", "West", "East"], "revenue": [1.0, 2.0, 4.0]})
+    run = DAG.bind(df, {"region": "region", "revenue": "revenue"}, "abc123", cache=ResultCache())
+    run.run(["totals", "model"], workers=1)
+    return run
+
+def test_snapshot_keeps_aggregates_only(tmp_path):
+    root = str(tmp_path)
+    written = snapshots.save_snapshot(_run(), root=root)
+    assert sorted(written) == ["by_region", "totals"]
+    sid = snapshots.snapshot_id("abc123", {"region": "region", "revenue": "revenue"})
+    assert all(name.endswith((".json", ".parquet")) for name in os.listdir(os.path.join(root, sid)))
+
+    run = DAG.bind(pd.DataFrame({"region": [], "revenue": []}), {"region": "region", "revenue": "revenue"}, "abc123", cache=ResultCache())
+    assert sorted(snapshots.seed_cache(run, snapshots.load_snapshot(sid, root=root))) == ["by_region", "totals"]
+    assert run.get("totals") == {"revenue": 7.0, "top": "East"}
+
+def test_older_snapshot_format_is_replaced(tmp_path):
+    root = str(tmp_path)
+    sid = snapshots.snapshot_id("abc123", {"region": "region", "revenue": "revenue"})
+    os.makedirs(os.path.join(root, sid))
+    snapshots._write_json(os.path.join(root, sid, "meta.json"), {"id": sid, "stages": {"totals": "x"}, "files": {"totals": "totals-old.json"}})
+    open(os.path.join(root, sid, "model-old.0.pkl"), "wb").close()
+    assert snapshots.load_snapshot(sid, root=root) is None
+    snapshots.save_snapshot(_run(), root=root)
+    assert not any(name.endswith(".pkl") for name in os.listdir(os.path.join(root, sid)))
+    assert snapshots.read_meta(sid, root)["format"] == snapshots.SNAPSHOT_FORMAT